@@ -0,0 +1,155 @@
+import threading
+from array import array
+
+
+# Histograma de latências no estilo HDR: faixas logarítmicas (potências de 2),
+# cada uma dividida em 2**SUB_BUCKET_BITS sub-faixas lineares. O erro relativo
+# de qualquer percentil fica abaixo de 1 / 2**SUB_BUCKET_BITS (~0,8%) e a memória
+# é fixa, não importa quantos valores sejam registrados.
+
+SUB_BUCKET_BITS = 7
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+
+PERCENTILES = (50.0, 90.0, 95.0, 99.0, 99.9)
+
+
+def _bucket_index(value):
+    if value < SUB_BUCKET_COUNT:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return shift * SUB_BUCKET_COUNT + (value >> shift)
+
+
+def _highest_equivalent_value(index):
+    shift = max(0, index // SUB_BUCKET_COUNT - 1)
+    mantissa = index - shift * SUB_BUCKET_COUNT
+    return ((mantissa + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """Contagens de latências em nanossegundos, com memória constante.
+
+    Valores acima de max_value_ns são contados na última faixa; o máximo exato
+    continua guardado à parte.
+    """
+
+    def __init__(self, max_value_ns=3600 * 10**9):
+        self.max_value_ns = max_value_ns
+        self.counts = array('q', [0]) * (_bucket_index(max_value_ns) + 1)
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = 0
+
+    def __getstate__(self):
+        # Só as faixas ocupadas: histogramas viajam entre processos a cada intervalo.
+        state = self.__dict__.copy()
+        state["counts"] = {index: count for index, count in enumerate(self.counts) if count}
+        return state
+
+    def __setstate__(self, state):
+        sparse_counts = state.pop("counts")
+        self.__dict__.update(state)
+        self.counts = array('q', [0]) * (_bucket_index(self.max_value_ns) + 1)
+        for index, count in sparse_counts.items():
+            self.counts[index] = count
+
+    def record(self, value_ns):
+        value_ns = max(0, int(value_ns))
+        self.counts[_bucket_index(min(value_ns, self.max_value_ns))] += 1
+        self.count += 1
+        self.total_ns += value_ns
+        if self.min_ns is None or value_ns < self.min_ns:
+            self.min_ns = value_ns
+        if value_ns > self.max_ns:
+            self.max_ns = value_ns
+
+    def merge(self, other):
+        if len(other.counts) != len(self.counts):
+            raise ValueError("Histogramas com limites diferentes não podem ser unidos.")
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.count += other.count
+        self.total_ns += other.total_ns
+        if other.min_ns is not None and (self.min_ns is None or other.min_ns < self.min_ns):
+            self.min_ns = other.min_ns
+        self.max_ns = max(self.max_ns, other.max_ns)
+
+    def mean_ns(self):
+        return self.total_ns / self.count if self.count else 0.0
+
+    def percentile_ns(self, percentile):
+        """Maior valor equivalente da faixa que contém o percentil pedido (0-100)."""
+        if self.count == 0:
+            return 0
+        target = max(1, round(self.count * percentile / 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(_highest_equivalent_value(index), self.max_ns)
+        return self.max_ns
+
+    def percentiles_ms(self, percentiles=PERCENTILES):
+        return {p: self.percentile_ns(p) / 1e6 for p in percentiles}
+
+
+class HistogramGroup:
+    """Um LatencyHistogram por nome (tipo de transação, query), seguro entre threads.
+
+    Pode ser enviado entre processos (o lock não é serializado) e unido com merge().
+    """
+
+    def __init__(self, max_value_ns=3600 * 10**9):
+        self.max_value_ns = max_value_ns
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def record(self, name, value_ns):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = LatencyHistogram(self.max_value_ns)
+            histogram.record(value_ns)
+
+    def merge(self, other):
+        with self._lock:
+            for name, histogram in other.items():
+                own = self._histograms.get(name)
+                if own is None:
+                    own = self._histograms[name] = LatencyHistogram(self.max_value_ns)
+                own.merge(histogram)
+
+    def get(self, name):
+        """Histograma do nome; vazio se nada foi registrado para ele."""
+        with self._lock:
+            histogram = self._histograms.get(name)
+        return histogram if histogram is not None else LatencyHistogram(self.max_value_ns)
+
+    def items(self):
+        with self._lock:
+            return sorted(self._histograms.items())
+
+    def total(self):
+        """Todos os nomes somados em um único histograma."""
+        combined = LatencyHistogram(self.max_value_ns)
+        for _, histogram in self.items():
+            combined.merge(histogram)
+        return combined
+
+
+def format_percentiles(histogram, percentiles=PERCENTILES):
+    values = histogram.percentiles_ms(percentiles)
+    parts = [f"p{p:g}: {values[p]:.2f}" for p in percentiles]
+    parts.append(f"máx: {histogram.max_ns / 1e6:.2f}")
+    return " | ".join(parts) + " ms"
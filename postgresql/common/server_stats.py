@@ -0,0 +1,144 @@
+import time
+
+import psycopg2
+
+
+# Custo do lado do servidor durante uma execução: fotografias de pg_stat_database
+# (banco corrente) e, quando a extensão está instalada e carregada, de
+# pg_stat_statements, tiradas antes e depois da medição. O relatório mostra as
+# diferenças, para casar a latência vista pelo cliente com CPU, E/S e spill no
+# servidor.
+#
+# As estatísticas acumuladas são enviadas pelos backends com algum atraso (até
+# ~1 s no PostgreSQL 15+), então deltas de execuções muito curtas são aproximados.
+
+DATABASE_COUNTERS = (
+    "xact_commit", "xact_rollback", "deadlocks", "conflicts",
+    "blks_hit", "blks_read", "temp_files", "temp_bytes",
+)
+
+STATEMENT_COUNTERS = (
+    "calls", "total_exec_time", "rows",
+    "shared_blks_hit", "shared_blks_read", "shared_blks_dirtied", "shared_blks_written",
+    "temp_blks_read", "temp_blks_written", "blk_read_time", "blk_write_time",
+)
+
+
+def _statement_columns(server_version):
+    # Nomes que mudaram entre versões, sempre devolvidos com o nome de STATEMENT_COUNTERS.
+    exec_time = "total_exec_time" if server_version >= 130000 else "total_time"
+    io_prefix = "shared_" if server_version >= 170000 else ""
+    columns = []
+    for counter in STATEMENT_COUNTERS:
+        if counter == "total_exec_time":
+            columns.append(f"{exec_time} AS total_exec_time")
+        elif counter in ("blk_read_time", "blk_write_time"):
+            columns.append(f"{io_prefix}{counter} AS {counter}")
+        else:
+            columns.append(counter)
+    return ", ".join(columns)
+
+
+class ServerSnapshot:
+    """Contadores acumulados do servidor em um instante."""
+
+    def __init__(self, taken_at, block_size, database, statements):
+        self.taken_at = taken_at
+        self.block_size = block_size
+        self.database = database
+        # (userid, dbid, queryid, toplevel) -> (texto da query, {contador: valor});
+        # None se pg_stat_statements não está disponível.
+        self.statements = statements
+
+
+def _statements_available(cur):
+    cur.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_stat_statements'")
+    return cur.fetchone() is not None
+
+
+def take_snapshot(conn):
+    """Lê pg_stat_database e pg_stat_statements; conn deve estar em autocommit,
+    para que cada leitura veja estatísticas novas."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT current_setting('block_size')::int")
+        block_size = cur.fetchone()[0]
+        cur.execute(
+            f"SELECT {', '.join(DATABASE_COUNTERS)} FROM pg_stat_database WHERE datname = current_database()"
+        )
+        database = dict(zip(DATABASE_COUNTERS, cur.fetchone()))
+
+        statements = None
+        if _statements_available(cur):
+            # Uma linha de pg_stat_statements é identificada por usuário, banco,
+            # queryid e (PostgreSQL 14+) toplevel; queryid NULL (sem texto
+            # normalizado visível) não identifica nada e fica de fora.
+            toplevel = "toplevel" if conn.server_version >= 140000 else "NULL"
+            try:
+                cur.execute(
+                    f"SELECT userid, dbid, queryid, {toplevel}, query, {_statement_columns(conn.server_version)} "
+                    "FROM pg_stat_statements "
+                    "WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database()) "
+                    "AND queryid IS NOT NULL"
+                )
+            except psycopg2.Error:
+                # Extensão criada, mas fora de shared_preload_libraries.
+                statements = None
+            else:
+                statements = {
+                    tuple(row[:4]): (row[4], dict(zip(STATEMENT_COUNTERS, row[5:]))) for row in cur.fetchall()
+                }
+
+    return ServerSnapshot(time.time(), block_size, database, statements)
+
+
+class ServerStatsDelta:
+    """Diferença entre duas fotografias: o custo do servidor no período."""
+
+    def __init__(self, before, after):
+        self.elapsed_secs = after.taken_at - before.taken_at
+        self.block_size = after.block_size
+        self.database = {
+            counter: after.database[counter] - before.database[counter] for counter in DATABASE_COUNTERS
+        }
+
+        self.statements = None
+        if before.statements is not None and after.statements is not None:
+            self.statements = []
+            for key, (query, counters) in after.statements.items():
+                previous = before.statements.get(key, (query, dict.fromkeys(STATEMENT_COUNTERS, 0)))[1]
+                delta = {counter: counters[counter] - previous[counter] for counter in STATEMENT_COUNTERS}
+                if delta["calls"] > 0:
+                    self.statements.append((query, delta))
+            self.statements.sort(key=lambda item: item[1]["total_exec_time"], reverse=True)
+
+
+def connect(db_settings):
+    conn = psycopg2.connect(**db_settings)
+    conn.autocommit = True
+    return conn
+
+
+def print_server_report(delta, limit=15):
+    database = delta.database
+    blocks = database["blks_hit"] + database["blks_read"]
+    hit_ratio = database["blks_hit"] / blocks * 100 if blocks > 0 else 0
+    print(f"\n--- Servidor: pg_stat_database ({delta.elapsed_secs:.1f} s) ---")
+    print(f"Commits: {database['xact_commit']} | Rollbacks: {database['xact_rollback']} | "
+          f"Deadlocks: {database['deadlocks']} | Conflitos: {database['conflicts']}")
+    print(f"Blocos: {database['blks_hit']} do cache, {database['blks_read']} lidos (acerto: {hit_ratio:.2f}%)")
+    print(f"Arquivos temporários: {database['temp_files']} ({database['temp_bytes'] / 2**20:.2f} MiB)")
+
+    if delta.statements is None:
+        print("pg_stat_statements não disponível: sem custo por statement "
+              "(requer shared_preload_libraries e CREATE EXTENSION pg_stat_statements).")
+        return
+
+    print(f"\n--- Servidor: pg_stat_statements ({len(delta.statements)} statements executados) ---")
+    for query, counters in delta.statements[:limit]:
+        calls = counters["calls"]
+        temp_mib = (counters["temp_blks_read"] + counters["temp_blks_written"]) * delta.block_size / 2**20
+        query = " ".join(query.split())
+        print(f"- Chamadas: {calls:<7} | Tempo Médio: {counters['total_exec_time'] / calls:.3f} ms | "
+              f"Total: {counters['total_exec_time']:.1f} ms | Blocos: {counters['shared_blks_hit']} cache / "
+              f"{counters['shared_blks_read']} lidos | E/S: {counters['blk_read_time'] + counters['blk_write_time']:.1f} ms | "
+              f"Temp: {temp_mib:.2f} MiB | {query[:60]}")
@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import Counter
+
+import psycopg2
+
+
+# Amostragem de eventos de espera: uma thread consulta pg_stat_activity (e, para
+# esperas por lock, pg_locks) a cada interval_secs e conta, para cada backend do
+# benchmark que não está ocioso, em que ele estava esperando. Os drivers marcam
+# cada backend com application_name = prefixo + tipo da transação (ou query), e
+# a contagem sai separada por esse tipo.
+
+CPU = "CPU"
+
+SAMPLE_QUERY = """
+SELECT a.application_name, a.state, a.wait_event_type, a.wait_event, l.locktype, l.mode
+FROM pg_stat_activity a
+LEFT JOIN LATERAL (
+    SELECT locktype, mode FROM pg_locks WHERE pid = a.pid AND NOT granted LIMIT 1
+) l ON true
+WHERE a.datname = current_database()
+  AND a.pid <> pg_backend_pid()
+  AND a.state <> 'idle'
+  AND a.application_name LIKE %s
+"""
+
+
+def wait_key(state, wait_event_type, wait_event, locktype, mode):
+    """Nome do evento de uma amostra: CPU, Tipo:Evento ou Lock:tipo (modo pedido)."""
+    if wait_event_type is None:
+        # Backend ativo sem evento de espera: executando (ou na fila da CPU).
+        return CPU
+    if wait_event_type == "Lock" and mode is not None:
+        return f"Lock:{locktype} ({mode})"
+    return f"{wait_event_type}:{wait_event}"
+
+
+class WaitSampler:
+    """Thread de amostragem com conexão própria, ativa entre start_time e end_time
+    (relógio de parede; None: desde start() / até stop())."""
+
+    def __init__(self, db_settings, interval_secs, application_prefix, start_time=None, end_time=None):
+        self.db_settings = db_settings
+        self.interval_secs = interval_secs
+        self.application_prefix = application_prefix
+        self.start_time = start_time
+        self.end_time = end_time
+        self.rounds = 0
+        self.error = None
+        self._profile = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _sample(self, cur):
+        cur.execute(SAMPLE_QUERY, (self.application_prefix + "%",))
+        rows = cur.fetchall()
+        with self._lock:
+            self.rounds += 1
+            for application_name, state, wait_event_type, wait_event, locktype, mode in rows:
+                tag = application_name[len(self.application_prefix):]
+                counts = self._profile.setdefault(tag, Counter())
+                counts[wait_key(state, wait_event_type, wait_event, locktype, mode)] += 1
+
+    def _run(self):
+        if self.start_time is not None and self._stopped.wait(max(0.0, self.start_time - time.time())):
+            return
+        try:
+            conn = psycopg2.connect(**self.db_settings)
+        except psycopg2.Error as e:
+            self.error = str(e).strip()
+            return
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                next_sample = time.time()
+                while self.end_time is None or next_sample < self.end_time:
+                    self._sample(cur)
+                    next_sample += self.interval_secs
+                    if self._stopped.wait(max(0.0, next_sample - time.time())):
+                        break
+        except psycopg2.Error as e:
+            self.error = str(e).strip()
+        finally:
+            conn.close()
+
+    def profile(self):
+        """{tipo: Counter(evento -> amostras)}, ordenado pelo tipo."""
+        with self._lock:
+            return {tag: Counter(counts) for tag, counts in sorted(self._profile.items())}
+
+
+def print_wait_profile(sampler, top=5):
+    profile = sampler.profile()
+    print(f"\n--- Eventos de Espera ({sampler.rounds} amostras a cada {sampler.interval_secs * 1000:.0f} ms, backends não ociosos) ---")
+    if sampler.error is not None:
+        print(f"!!! Amostragem interrompida: {sampler.error}")
+    if not profile:
+        print("Nenhuma amostra de backend do benchmark.")
+        return
+
+    total = Counter()
+    for counts in profile.values():
+        total.update(counts)
+    for tag, counts in list(profile.items()) + [("total", total)]:
+        samples = sum(counts.values())
+        events = " | ".join(f"{event}: {count / samples * 100:.1f}%" for event, count in counts.most_common(top))
+        print(f"- {tag:<20} | Amostras: {samples:<6} | {events}")
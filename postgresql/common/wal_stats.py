@@ -0,0 +1,180 @@
+import psycopg2
+
+
+# WAL, checkpoints e escritas de buffers por intervalo: a cada fechamento de
+# intervalo, uma conexão própria lê o LSN corrente, pg_stat_wal e
+# pg_stat_bgwriter (pg_stat_checkpointer no PostgreSQL 17+) e devolve as
+# diferenças desde a leitura anterior. Contadores que não existem na versão do
+# servidor ficam como None.
+#
+# O WAL é do servidor inteiro, não de uma transação; os bytes por commit de cada
+# tipo de transação são estimados por mínimos quadrados sobre os intervalos
+# (WAL do intervalo ~ soma dos commits de cada tipo x bytes por commit + fundo).
+
+WAL_COUNTERS = (
+    "wal_bytes", "wal_records", "wal_fpi",
+    "checkpoints", "buffers_checkpoint", "buffers_clean", "buffers_backend",
+)
+
+
+def _snapshot_query(server_version):
+    wal = "(SELECT {} FROM pg_stat_wal)" if server_version >= 140000 else "NULL"
+    if server_version >= 170000:
+        checkpoints = "(SELECT num_timed + num_requested FROM pg_stat_checkpointer)"
+        buffers_checkpoint = "(SELECT buffers_written FROM pg_stat_checkpointer)"
+        buffers_backend = "NULL"
+    else:
+        checkpoints = "(SELECT checkpoints_timed + checkpoints_req FROM pg_stat_bgwriter)"
+        buffers_checkpoint = "(SELECT buffers_checkpoint FROM pg_stat_bgwriter)"
+        buffers_backend = "(SELECT buffers_backend FROM pg_stat_bgwriter)"
+    columns = (
+        # Bytes de WAL pelo LSN: exato, enquanto pg_stat_wal depende do envio das estatísticas.
+        "pg_wal_lsn_diff(pg_current_wal_lsn(), '0/0')::bigint",
+        wal.format("wal_records"),
+        wal.format("wal_fpi"),
+        checkpoints,
+        buffers_checkpoint,
+        "(SELECT buffers_clean FROM pg_stat_bgwriter)",
+        buffers_backend,
+    )
+    return "SELECT " + ", ".join(f"{column} AS {name}" for column, name in zip(columns, WAL_COUNTERS))
+
+
+def take_wal_snapshot(conn):
+    with conn.cursor() as cur:
+        cur.execute(_snapshot_query(conn.server_version))
+        return dict(zip(WAL_COUNTERS, cur.fetchone()))
+
+
+def wal_delta(before, after):
+    return {
+        counter: None if before[counter] is None or after[counter] is None else after[counter] - before[counter]
+        for counter in WAL_COUNTERS
+    }
+
+
+class WalProbe:
+    """Conexão dedicada que devolve, a cada delta(), o WAL e as escritas desde a chamada anterior."""
+
+    def __init__(self, db_settings):
+        self._conn = psycopg2.connect(**db_settings)
+        self._conn.autocommit = True
+        self._last = take_wal_snapshot(self._conn)
+
+    def delta(self):
+        if self._conn.closed:
+            return None
+        try:
+            snapshot = take_wal_snapshot(self._conn)
+        except psycopg2.Error:
+            # Sem servidor, o intervalo sai sem as colunas de WAL; o teste continua.
+            self._conn.close()
+            return None
+        delta, self._last = wal_delta(self._last, snapshot), snapshot
+        return delta
+
+    def close(self):
+        self._conn.close()
+
+
+def _solve(matrix, vector):
+    """Eliminação de Gauss-Jordan com pivoteamento parcial; variáveis sem pivô (colineares) ficam 0."""
+    size = len(vector)
+    rows = [list(matrix[i]) + [vector[i]] for i in range(size)]
+    pivot_columns = []
+    row = 0
+    for column in range(size):
+        pivot = max(range(row, size), key=lambda r: abs(rows[r][column]), default=None)
+        if pivot is None or abs(rows[pivot][column]) < 1e-9:
+            continue
+        rows[row], rows[pivot] = rows[pivot], rows[row]
+        factor = rows[row][column]
+        rows[row] = [value / factor for value in rows[row]]
+        for other in range(size):
+            if other != row and rows[other][column] != 0:
+                scale = rows[other][column]
+                rows[other] = [value - scale * pivot_value for value, pivot_value in zip(rows[other], rows[row])]
+        pivot_columns.append(column)
+        row += 1
+    solution = [0.0] * size
+    for pivot_row, column in enumerate(pivot_columns):
+        solution[column] = rows[pivot_row][size]
+    return solution
+
+
+class WalAttribution:
+    """Soma o WAL dos intervalos medidos e estima os bytes de WAL por commit de cada tipo."""
+
+    def __init__(self):
+        self.intervals = []
+        self.totals = dict.fromkeys(WAL_COUNTERS, 0)
+
+    def add(self, commits_by_type, delta):
+        for counter in WAL_COUNTERS:
+            if self.totals[counter] is not None:
+                self.totals[counter] = None if delta[counter] is None else self.totals[counter] + delta[counter]
+        self.intervals.append((commits_by_type, delta["wal_bytes"]))
+
+    def _fit(self, types):
+        # Equações normais (X'X) b = X'y, com uma coluna constante para o WAL de fundo.
+        columns = len(types) + 1
+        xtx = [[0.0] * columns for _ in range(columns)]
+        xty = [0.0] * columns
+        for commits, wal_bytes in self.intervals:
+            x = [commits.get(name, 0) for name in types] + [1.0]
+            for i in range(columns):
+                xty[i] += x[i] * wal_bytes
+                for j in range(columns):
+                    xtx[i][j] += x[i] * x[j]
+        coefficients = _solve(xtx, xty)
+        return dict(zip(types, coefficients)), coefficients[-1]
+
+    def estimate(self):
+        """(bytes por commit de cada tipo, bytes de fundo por intervalo, R²), ou None se
+        há menos intervalos do que incógnitas."""
+        all_types = sorted({name for commits, _ in self.intervals for name in commits})
+        if len(self.intervals) <= len(all_types) + 1:
+            return None
+
+        # Um tipo não gera WAL negativo: quem sai negativo (tipicamente os só de
+        # leitura, com ruído) fica com 0 e o ajuste é refeito com os demais.
+        types = all_types
+        while True:
+            per_commit, background = self._fit(types)
+            negative = [name for name, value in per_commit.items() if value < 0]
+            if not negative:
+                break
+            types = [name for name in types if name not in negative]
+
+        mean = sum(wal_bytes for _, wal_bytes in self.intervals) / len(self.intervals)
+        residual = total = 0.0
+        for commits, wal_bytes in self.intervals:
+            predicted = background + sum(value * commits.get(name, 0) for name, value in per_commit.items())
+            residual += (wal_bytes - predicted) ** 2
+            total += (wal_bytes - mean) ** 2
+        r_squared = 1 - residual / total if total > 0 else 0.0
+        return {name: per_commit.get(name, 0.0) for name in all_types}, background, r_squared
+
+
+def print_wal_report(attribution, interval_secs):
+    totals = attribution.totals
+    print(f"\n--- WAL na Medição ({len(attribution.intervals)} intervalos de {interval_secs} s) ---")
+    if not attribution.intervals:
+        print("Sem leituras de WAL na fase de medição.")
+        return
+
+    def value(counter):
+        return "n/d" if totals[counter] is None else totals[counter]
+
+    print(f"WAL: {totals['wal_bytes'] / 2**20:.2f} MiB | Registros: {value('wal_records')} | FPIs: {value('wal_fpi')}")
+    print(f"Checkpoints: {value('checkpoints')} | Buffers escritos: checkpoint {value('buffers_checkpoint')}, "
+          f"bgwriter {value('buffers_clean')}, backends {value('buffers_backend')}")
+
+    estimate = attribution.estimate()
+    if estimate is None:
+        print("Intervalos insuficientes para estimar o WAL por tipo de transação.")
+        return
+    per_commit, background, r_squared = estimate
+    print(f"WAL por commit (mínimos quadrados não negativos, R² = {r_squared:.3f}; fundo: {background / interval_secs / 1024:.1f} KiB/s):")
+    for name, bytes_per_commit in per_commit.items():
+        print(f"- {name:<20} | {bytes_per_commit:>10.0f} bytes/commit")
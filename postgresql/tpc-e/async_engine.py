@@ -0,0 +1,248 @@
+import asyncio
+import sys
+import time
+
+import aiopg
+import greenlet
+import psycopg2
+from psycopg2 import sql
+
+from statements import REGISTRY, is_preparable
+
+
+# As funções execute_* e generate_* são síncronas (conn.cursor(), cur.execute()).
+# Para executá-las sem alterações sobre um cliente assíncrono, cada chamada roda
+# dentro de um greenlet: quando a função bloquearia no banco, o greenlet devolve
+# a corrotina ao event loop, que a aguarda e retoma o greenlet com o resultado.
+
+class _BridgeGreenlet(greenlet.greenlet):
+    pass
+
+
+def await_only(awaitable):
+    current = greenlet.getcurrent()
+    if not isinstance(current, _BridgeGreenlet):
+        raise RuntimeError("await_only() chamado fora de greenlet_spawn().")
+    return current.parent.switch(awaitable)
+
+
+async def greenlet_spawn(fn, *args, **kwargs):
+    context = _BridgeGreenlet(fn, greenlet.getcurrent())
+    result = context.switch(*args, **kwargs)
+    while not context.dead:
+        try:
+            value = await result
+        except BaseException:
+            result = context.throw(*sys.exc_info())
+        else:
+            result = context.switch(value)
+    return result
+
+
+class AsyncCursorAdapter:
+
+    def __init__(self, connection):
+        self._connection = connection
+        self._cur = await_only(connection.raw.cursor())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def rowcount(self):
+        return self._cur.rowcount
+
+    def execute(self, query, params=None):
+        connection = self._connection
+        if isinstance(query, sql.Composable):
+            query = query.as_string(self._cur.raw)
+        statement = REGISTRY.get(query)
+        prepare = connection.prepare_statements and is_preparable(params)
+
+        # Como no psycopg2 síncrono, o BEGIN implícito conta no tempo do statement.
+        prepare_start = time.perf_counter_ns()
+        try:
+            connection.begin_if_needed(self._cur)
+
+            prepared_now = False
+            if prepare and statement.name not in connection.prepared_names:
+                await_only(self._cur.execute(statement.prepare_sql))
+                connection.prepared_names.add(statement.name)
+                prepared_now = True
+
+            start_time = time.perf_counter_ns()
+            if prepare:
+                await_only(self._cur.execute(statement.execute_sql, params))
+            else:
+                await_only(self._cur.execute(query, params))
+            REGISTRY.record(statement, (time.perf_counter_ns() - start_time) / 1e6, prepared=prepared_now)
+        finally:
+            end_time = time.perf_counter_ns()
+            connection.statement_ns += end_time - prepare_start
+            if connection.trace is not None:
+                connection.trace.statement(statement, prepare_start, end_time, self._cur.rowcount)
+
+    def fetchone(self):
+        return await_only(self._cur.fetchone())
+
+    def fetchall(self):
+        return await_only(self._cur.fetchall())
+
+    def close(self):
+        self._cur.close()
+
+
+class AsyncConnectionAdapter:
+    """Expõe uma conexão aiopg com a interface síncrona de uma conexão psycopg2.
+
+    Conexões assíncronas do psycopg2 operam sempre em autocommit, então o BEGIN
+    é emitido no primeiro comando de cada transação, como o psycopg2 faz.
+    """
+
+    def __init__(self, raw, isolation_level, prepare_statements=False, session_parameters=None):
+        self.raw = raw
+        self.isolation_level = isolation_level
+        self.in_transaction = False
+        self.prepare_statements = prepare_statements
+        self.prepared_names = set()
+        self.session_parameters = session_parameters or {}
+        self.application_name = None
+        self.statement_ns = 0
+        self.trace = None
+        self.trace_lane = None
+
+    @property
+    def closed(self):
+        return self.raw.closed
+
+    def cursor(self):
+        return AsyncCursorAdapter(self)
+
+    def begin_if_needed(self, raw_cur):
+        if self.in_transaction or self.isolation_level is None:
+            return
+        await_only(raw_cur.execute(f"BEGIN ISOLATION LEVEL {self.isolation_level}"))
+        self.in_transaction = True
+
+    def _end_transaction(self, command):
+        if not self.in_transaction:
+            return
+        self.in_transaction = False
+        cur = await_only(self.raw.cursor())
+        try:
+            await_only(cur.execute(command))
+        finally:
+            cur.close()
+
+    def commit(self):
+        self._end_transaction("COMMIT")
+
+    def rollback(self):
+        self._end_transaction("ROLLBACK")
+
+    def configure(self):
+        cur = await_only(self.raw.cursor())
+        try:
+            for name, value in self.session_parameters.items():
+                await_only(cur.execute(f"SET {name} = %s", (value,)))
+        finally:
+            cur.close()
+
+    def set_application_name(self, name):
+        # Em autocommit, fora de qualquer transação: vale para a sessão.
+        if name == self.application_name:
+            return
+        cur = await_only(self.raw.cursor())
+        try:
+            await_only(cur.execute("SET application_name = %s", (name,)))
+        finally:
+            cur.close()
+        self.application_name = name
+
+    def reset(self):
+        self.application_name = None
+        self.rollback()
+        cur = await_only(self.raw.cursor())
+        try:
+            await_only(cur.execute("RESET ALL"))
+        finally:
+            cur.close()
+        self.configure()
+
+    def close(self):
+        self.raw.close()
+
+
+class AsyncConnectionPool:
+    """Versão assíncrona do ConnectionPool, compartilhada pelas corrotinas-terminal."""
+
+    def __init__(self, db_settings, size, isolation_level, prepare_statements=False, session_parameters=None):
+        self.db_settings = db_settings
+        self.isolation_level = isolation_level
+        self.size = size
+        self.prepare_statements = prepare_statements
+        self.session_parameters = session_parameters
+
+        self._idle = asyncio.LifoQueue()
+
+        self.connects = 0
+        self.reconnects = 0
+        self.connect_time_ms = 0.0
+
+    async def open(self):
+        for _ in range(self.size):
+            self._idle.put_nowait(await self._connect())
+
+    async def _connect(self, is_reconnect=False):
+        start_time = time.perf_counter()
+        raw = await aiopg.connect(**self.db_settings)
+        conn = AsyncConnectionAdapter(raw, self.isolation_level, self.prepare_statements, self.session_parameters)
+        await greenlet_spawn(conn.configure)
+        self.connects += 1
+        self.connect_time_ms += (time.perf_counter() - start_time) * 1000
+        if is_reconnect:
+            self.reconnects += 1
+        return conn
+
+    def stats(self):
+        return {
+            "connects": self.connects,
+            "reconnects": self.reconnects,
+            "connect_time_ms": self.connect_time_ms,
+        }
+
+    async def acquire(self):
+        conn = await self._idle.get()
+        if conn is None or conn.closed:
+            try:
+                conn = await self._connect(is_reconnect=True)
+            except psycopg2.Error:
+                self._idle.put_nowait(None)
+                raise
+        return conn
+
+    async def release(self, conn, failed=False):
+        if conn.closed:
+            self._idle.put_nowait(None)
+            return
+
+        try:
+            if failed:
+                await greenlet_spawn(conn.reset)
+            elif conn.in_transaction:
+                await greenlet_spawn(conn.rollback)
+        except psycopg2.Error:
+            conn.close()
+            self._idle.put_nowait(None)
+            return
+
+        self._idle.put_nowait(conn)
+
+    def close(self):
+        while not self._idle.empty():
+            conn = self._idle.get_nowait()
+            if conn is not None and not conn.closed:
+                conn.close()
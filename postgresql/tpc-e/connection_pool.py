@@ -0,0 +1,100 @@
+import queue
+import threading
+import time
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class ConnectionPool:
+    """Pool de conexões persistentes, já configuradas, reutilizadas entre transações."""
+
+    def __init__(self, db_settings, size, isolation_level, readonly=False,
+                 connection_factory=None, session_parameters=None):
+        self.db_settings = db_settings
+        self.isolation_level = isolation_level
+        self.readonly = readonly
+        self.size = size
+        self.connection_factory = connection_factory
+        self.session_parameters = session_parameters or {}
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+
+        self.connects = 0
+        self.reconnects = 0
+        self.connect_time_ms = 0.0
+
+        for _ in range(size):
+            self._idle.put(self._connect())
+
+    def _configure(self, conn):
+        if self.session_parameters:
+            with conn.cursor(cursor_factory=extensions.cursor) as cur:
+                for name, value in self.session_parameters.items():
+                    cur.execute(f"SET {name} = %s", (value,))
+            conn.commit()
+        conn.set_session(isolation_level=self.isolation_level, readonly=self.readonly)
+
+    def _connect(self, is_reconnect=False):
+        start_time = time.perf_counter()
+        if self.connection_factory is not None:
+            conn = psycopg2.connect(**self.db_settings, connection_factory=self.connection_factory)
+        else:
+            conn = psycopg2.connect(**self.db_settings)
+        self._configure(conn)
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+
+        with self._lock:
+            self.connects += 1
+            self.connect_time_ms += elapsed_ms
+            if is_reconnect:
+                self.reconnects += 1
+        return conn
+
+    def stats(self):
+        return {
+            "connects": self.connects,
+            "reconnects": self.reconnects,
+            "connect_time_ms": self.connect_time_ms,
+        }
+
+    def acquire(self):
+        conn = self._idle.get()
+        if conn is None or conn.closed:
+            try:
+                conn = self._connect(is_reconnect=True)
+            except psycopg2.Error:
+                # Devolve a vaga ao pool para que outro terminal tente reconectar.
+                self._idle.put(None)
+                raise
+        return conn
+
+    def release(self, conn, failed=False):
+        if conn.closed:
+            self._idle.put(None)
+            return
+
+        try:
+            if failed:
+                # Desfaz a transação e qualquer SET feito na sessão; o RESET
+                # também limpa as características da sessão, que são reaplicadas.
+                conn.reset()
+                self._configure(conn)
+            elif conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except psycopg2.Error:
+            conn.close()
+            self._idle.put(None)
+            return
+
+        self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if conn is not None and not conn.closed:
+                conn.close()
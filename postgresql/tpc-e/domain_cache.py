@@ -0,0 +1,97 @@
+import random
+import threading
+import time
+from array import array
+
+
+class DomainCache:
+    """Domínios de chaves da base TPC-E, carregados uma única vez em memória.
+
+    Os geradores de entrada sorteiam chaves destes arrays em O(1), em vez de
+    executar SELECT ... ORDER BY RANDOM() LIMIT n sobre a tabela inteira.
+    """
+
+    def __init__(self, refresh_secs=10):
+        self.refresh_secs = refresh_secs
+        self._refresh_lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_refresh_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._refresh_lock = threading.Lock()
+
+    @staticmethod
+    def _load_ids(cur, query):
+        cur.execute(query)
+        return array('q', (row[0] for row in cur.fetchall()))
+
+    @staticmethod
+    def _load_values(cur, query):
+        cur.execute(query)
+        return [row[0] for row in cur.fetchall()]
+
+    def load(self, cur):
+        self.customer_ids = self._load_ids(cur, "SELECT c_id FROM CUSTOMER")
+        self.customer_tax_ids = self._load_values(cur, "SELECT c_tax_id FROM CUSTOMER")
+        self.account_ids = self._load_ids(cur, "SELECT ca_id FROM CUSTOMER_ACCOUNT")
+        self.holding_account_ids = self._load_ids(cur, "SELECT DISTINCT hs_ca_id FROM HOLDING_SUMMARY")
+        self.watch_list_customer_ids = self._load_ids(cur, "SELECT DISTINCT wl_c_id FROM WATCH_LIST")
+        self.symbols = self._load_values(cur, "SELECT s_symb FROM SECURITY")
+        self.company_ids = self._load_ids(cur, "SELECT co_id FROM COMPANY")
+        self.broker_names = self._load_values(cur, "SELECT b_name FROM BROKER")
+        self.sector_names = self._load_values(cur, "SELECT sc_name FROM SECTOR")
+        self.industry_names = self._load_values(cur, "SELECT in_name FROM INDUSTRY")
+
+        cur.execute("SELECT C.co_name, S.s_issue FROM SECURITY S JOIN COMPANY C ON S.s_co_id = C.co_id")
+        self.company_issues = cur.fetchall()
+
+        self._load_trade_id_range(cur)
+
+    def _load_trade_id_range(self, cur):
+        # TRADE é o único domínio que cresce durante a execução (Trade-Order).
+        cur.execute("SELECT min(t_id), max(t_id) FROM TRADE")
+        self.trade_id_range = cur.fetchone()
+        self.trade_id_range_loaded_at = time.monotonic()
+
+    def refresh_if_stale(self, cur):
+        if time.monotonic() - self.trade_id_range_loaded_at < self.refresh_secs:
+            return
+        if not self._refresh_lock.acquire(blocking=False):
+            # Outro terminal já está atualizando; o intervalo atual ainda é válido.
+            return
+        try:
+            self._load_trade_id_range(cur)
+        finally:
+            self._refresh_lock.release()
+
+    def sample_trade_ids(self, count):
+        min_id, max_id = self.trade_id_range
+        if min_id is None:
+            return []
+        population = range(min_id, max_id + 1)
+        return random.sample(population, min(count, len(population)))
+
+    def sizes(self):
+        return {
+            "customer_ids": len(self.customer_ids),
+            "account_ids": len(self.account_ids),
+            "symbols": len(self.symbols),
+            "broker_names": len(self.broker_names),
+            "company_issues": len(self.company_issues),
+        }
+
+
+_installed_cache = None
+
+
+def install(cache):
+    global _installed_cache
+    _installed_cache = cache
+
+
+def get():
+    return _installed_cache
@@ -1,25 +1,23 @@
 import psycopg2
+import asyncio
+import multiprocessing
+import os
+import sys
 import time
 import random
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from collections import defaultdict
-
-from transactions import (
-    execute_broker_volume,
-    execute_customer_position,
-    execute_market_feed,
-    execute_market_watch,
-    execute_security_detail,
-    execute_trade_lookup,
-    execute_trade_order,
-    execute_trade_result,
-    execute_trade_status,
-    execute_trade_update,
-)
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+
+import procedures
+import transactions
+from transactions import RollbackException
 
 from input_generator import (
     generate_broker_volume_inputs,
     generate_customer_position_inputs,
+    generate_data_maintenance_inputs,
     generate_market_feed_inputs,
     generate_market_watch_inputs,
     generate_security_detail_inputs,
@@ -30,6 +28,33 @@ from input_generator import (
     generate_trade_update_inputs,
 )
 
+import domain_cache
+import interval_reporter
+import market_exchange
+import reference_cache
+import server_stats
+import tracing
+from connection_pool import ConnectionPool
+from domain_cache import DomainCache
+from interval_reporter import IntervalCollector, IntervalReporter, IntervalWriter, QueueSink
+from market_exchange import MarketExchange
+from reference_cache import ReferenceCache
+from retry_policy import DEADLOCK_DETECTED, RetryPolicy, sqlstate_class_label, sqlstate_label, sqlstate_of
+from run_phases import MEASURE, RunPhases, SteadyStateDetector
+from statements import REGISTRY, PreparedStatementConnection, StatementConnection
+from tracing import Tracer
+from trade_cleanup import trade_cleanup
+from transaction_stats import PHASES, TransactionStats
+from latency_histogram import format_percentiles
+from wait_sampler import WaitSampler, print_wait_profile
+from wal_stats import WalAttribution, WalProbe, print_wal_report
+
+try:
+    from async_engine import AsyncConnectionPool, await_only, greenlet_spawn
+except ImportError:
+    # O modo ASYNC depende de aiopg e greenlet; o modo THREADS funciona sem eles.
+    AsyncConnectionPool = None
+
 
 
 DB_SETTINGS = {
@@ -44,133 +69,811 @@ ISOLATION_LEVEL = "SERIALIZABLE"
 NUM_WORKERS = 4
 TEST_DURATION_SECS = 120 
 
+# "THREADS": um pool de threads com psycopg2 bloqueante (NUM_WORKERS workers).
+# "ASYNC": uma corrotina por terminal (NUM_ASYNC_TERMINALS) sobre o aiopg,
+#          compartilhando ASYNC_POOL_SIZE conexões.
+# "PROCESSES": NUM_PROCESSES processos, cada um com NUM_WORKERS workers e seu
+#              próprio pool de conexões; os resultados são unidos no relatório.
+EXECUTION_MODE = "THREADS"
+NUM_ASYNC_TERMINALS = 1000
+ASYNC_POOL_SIZE = 100
+NUM_PROCESSES = 4
 
+# Carrega as chaves (clientes, contas, símbolos, trades...) uma vez na partida,
+# para que os geradores de entrada não façam ORDER BY RANDOM() sobre as tabelas.
+USE_DOMAIN_CACHE = True
+DOMAIN_REFRESH_SECS = 10
 
-class RollbackException(Exception):
-    pass
+# Mantém em memória TRADE_TYPE, STATUS_TYPE, CHARGE, COMMISSION_RATE, EXCHANGE e
+# TAXRATE, usadas pelas transações e pelos geradores. False consulta o banco, como antes.
+USE_REFERENCE_CACHE = True
 
-def worker_task(transaction_function, transaction_inputs):
+# Prepara cada statement das transações uma vez por conexão e depois só envia
+# EXECUTE. PLAN_CACHE_MODE: "auto", "force_generic_plan" ou "force_custom_plan".
+USE_PREPARED_STATEMENTS = True
+PLAN_CACHE_MODE = "auto"
 
-    conn = None
-    status = "success"
-    error_detail = None
-    start_time = time.time()
-    
+# "CLIENT": cada frame é uma sequência de comandos enviados pelo Python (transactions.py).
+# "SERVER": cada transação é uma única chamada a uma função PL/pgSQL (procedures.py),
+#           instalada no banco antes do teste.
+TRANSACTION_MODE = "CLIENT"
+TRANSACTION_MODULE = procedures if TRANSACTION_MODE == "SERVER" else transactions
+
+# No modo CLIENT, envia as consultas independentes de um frame (Security-Detail,
+# Trade-Status, Customer-Position) juntas, em uma única ida e volta ao banco.
+# Compensa com o banco em outra máquina; em localhost o custo do json_agg supera
+# o RTT economizado.
+BATCH_INDEPENDENT_STATEMENTS = False
+transactions.BATCH_INDEPENDENT_STATEMENTS = BATCH_INDEPENDENT_STATEMENTS
+
+# Market-Watch em uma consulta agregada sobre o array de símbolos, em vez de três
+# consultas por símbolo da lista. False mantém o caminho original.
+SET_BASED_MARKET_WATCH = True
+transactions.SET_BASED_MARKET_WATCH = SET_BASED_MARKET_WATCH
+
+# Trade-Update com um UPDATE em lote por frame (respeitando max_updates na ordem
+# das trades). False mantém a leitura e atualização linha a linha.
+BULK_TRADE_UPDATE = True
+transactions.BULK_TRADE_UPDATE = BULK_TRADE_UPDATE
+
+# Market Exchange Emulator: as trades submetidas pelo Trade-Order e pelo Market-Feed
+# vão para uma fila em memória, cada uma é entregue a um único Trade-Result, e os
+# preços executados formam a fita do Market-Feed. False volta a sortear trades
+# 'SBMT' com ORDER BY RANDOM() e a fita com preços aleatórios.
+USE_MARKET_EXCHANGE = True
+
+# Trade-Cleanup antes do intervalo medido: cancela as ordens pendentes e submetidas
+# deixadas por execuções anteriores, em lotes de TRADE_CLEANUP_CHUNK_SIZE trades.
+RUN_TRADE_CLEANUP = True
+TRADE_CLEANUP_CHUNK_SIZE = 10000
+
+# Data-Maintenance fora do mix ponderado: uma thread própria, com uma conexão
+# própria, executa a transação a cada DATA_MAINTENANCE_INTERVAL_SECS segundos
+# (60 na especificação) em qualquer EXECUTION_MODE. A latência sai em separado.
+RUN_DATA_MAINTENANCE = True
+DATA_MAINTENANCE_INTERVAL_SECS = 60
+
+# Série temporal: a cada INTERVAL_SECS, commits, aborts e percentis de latência
+# por tipo de transação vão para INTERVAL_OUTPUT_PATH (None: só o resumo no
+# console). INTERVAL_OUTPUT_FORMAT: "CSV" ou "JSONL".
+INTERVAL_SECS = 1
+INTERVAL_OUTPUT_PATH = "intervals.csv"
+INTERVAL_OUTPUT_FORMAT = "CSV"
+# WAL gerado (LSN), registros e full-page images, checkpoints e buffers escritos
+# em cada intervalo, na linha "total" da série; no relatório, o WAL por commit
+# de cada tipo de transação é estimado a partir dos intervalos da medição.
+CAPTURE_WAL_STATS = True
+
+# Custo do servidor na fase de medição: fotografias de pg_stat_database e (se
+# instalada) pg_stat_statements no início e no fim da medição, em uma conexão
+# própria; as diferenças entram no relatório final.
+CAPTURE_SERVER_STATS = True
+
+# Amostragem opcional de eventos de espera (pg_stat_activity e pg_locks) a cada
+# WAIT_SAMPLE_INTERVAL_MS durante a medição, separada por tipo de transação: os
+# backends recebem application_name = WAIT_SAMPLER_APPLICATION_PREFIX + tipo na
+# geração das entradas, fora do tempo medido.
+RUN_WAIT_SAMPLER = False
+WAIT_SAMPLE_INTERVAL_MS = 100
+WAIT_SAMPLER_APPLICATION_PREFIX = "tpce:"
+
+# Rastreamento opcional de transações, frames e statements (conexão, id da
+# transação, statement, linhas e duração), com os últimos TRACE_BUFFER_SIZE spans
+# gravados ao final em TRACE_OUTPUT_PATH no formato de trace events do Chrome
+# (ui.perfetto.dev ou chrome://tracing). None desliga.
+TRACE_OUTPUT_PATH = None
+TRACE_BUFFER_SIZE = 200000
+
+# Transações abortadas por falha de serialização (40001) ou deadlock (40P01) são
+# repetidas com as mesmas entradas, como faria uma aplicação real: até
+# RETRY_MAX_ATTEMPTS tentativas (1 desliga a repetição), com backoff exponencial
+# e jitter a partir de RETRY_BACKOFF_BASE_MS, limitado a RETRY_BACKOFF_MAX_MS.
+# A latência registrada inclui as tentativas anteriores e as esperas.
+RETRY_MAX_ATTEMPTS = 5
+RETRY_BACKOFF_BASE_MS = 2
+RETRY_BACKOFF_MAX_MS = 100
+
+# Fases da execução: WARMUP_SECS de aquecimento, TEST_DURATION_SECS de medição e
+# COOLDOWN_SECS de resfriamento. Os terminais rodam em todas as fases, mas só as
+# transações concluídas na medição entram no relatório final (a série temporal
+# traz todas, com a fase de cada intervalo). O estado estacionário é detectado
+# quando o coeficiente de variação da vazão nos últimos STEADY_STATE_WINDOW
+# intervalos fica abaixo de STEADY_STATE_MAX_CV.
+WARMUP_SECS = 30
+COOLDOWN_SECS = 10
+STEADY_STATE_WINDOW = 10
+STEADY_STATE_MAX_CV = 0.10
+
+
+TRANSACTION_MIX = {
+    TRANSACTION_MODULE.execute_broker_volume: {"gen": generate_broker_volume_inputs, "weight": 4.9},
+    TRANSACTION_MODULE.execute_customer_position: {"gen": generate_customer_position_inputs, "weight": 13.0},
+    TRANSACTION_MODULE.execute_market_feed: {"gen": generate_market_feed_inputs, "weight": 1.0},
+    TRANSACTION_MODULE.execute_market_watch: {"gen": generate_market_watch_inputs, "weight": 18.0},
+    TRANSACTION_MODULE.execute_security_detail: {"gen": generate_security_detail_inputs, "weight": 14.0},
+    TRANSACTION_MODULE.execute_trade_lookup: {"gen": generate_trade_lookup_inputs, "weight": 8.0},
+    TRANSACTION_MODULE.execute_trade_order: {"gen": generate_trade_order_inputs, "weight": 10.1},
+    TRANSACTION_MODULE.execute_trade_result: {"gen": generate_trade_result_inputs, "weight": 10.0},
+    TRANSACTION_MODULE.execute_trade_status: {"gen": generate_trade_status_inputs, "weight": 19.0},
+    TRANSACTION_MODULE.execute_trade_update: {"gen": generate_trade_update_inputs, "weight": 2.0},
+}
+
+TRANSACTION_POOL = []
+for func, props in TRANSACTION_MIX.items():
+    TRANSACTION_POOL.extend([func] * int(props['weight'] * 10))
+
+RETRY_POLICY = RetryPolicy(RETRY_MAX_ATTEMPTS, RETRY_BACKOFF_BASE_MS, RETRY_BACKOFF_MAX_MS)
+
+
+
+def application_tag(transaction_function):
+    if not RUN_WAIT_SAMPLER:
+        return None
+    return WAIT_SAMPLER_APPLICATION_PREFIX + transaction_function.__name__.replace('execute_', '')
+
+
+def generate_inputs(conn, input_generator, application_name=None):
+    if application_name is not None:
+        conn.set_application_name(application_name)
+    with conn.cursor() as cur:
+        return input_generator(cur)
+
+
+def notify_market_exchange(transaction_function, status, transaction_inputs, outcome):
+    exchange = market_exchange.get()
+    if exchange is not None:
+        transaction = transaction_function.__name__.replace('execute_', '')
+        exchange.transaction_finished(transaction, status, transaction_inputs, outcome)
+
+
+def rollback_for_retry(conn):
+    # Uma conexão que não consegue nem desfazer a transação não serve para repetir.
     try:
-        conn = psycopg2.connect(**DB_SETTINGS)
-        conn.set_session(isolation_level=ISOLATION_LEVEL)
-        
-        transaction_function(conn, **transaction_inputs)
-        conn.commit()
-
-    except RollbackException:
-        status = "rollback_ok"
-        if conn:
-            conn.rollback()
-    except psycopg2.Error as e:
-        status = "abort"
-        error_detail = str(e).strip()
-        if conn:
-            conn.rollback()
-    finally:
-        if conn:
-            conn.close()
-            
-    end_time = time.time()
-    return {
+        conn.rollback()
+    except psycopg2.Error:
+        return False
+    return True
+
+
+def transaction_result(transaction_function, status, duration_ns=None, attempts=1, sqlstates=(), error=None, **phases):
+    """Resultado de uma transação, como TransactionStats e o IntervalReporter o
+    esperam; fases não informadas valem 0."""
+    result = {
         "transaction": transaction_function.__name__.replace('execute_', ''),
         "status": status,
-        "duration_ms": (end_time - start_time) * 1000,
-        "error": error_detail
+        "duration_ns": duration_ns,
     }
+    for phase in PHASES:
+        result[phase] = phases.get(phase, 0)
+    result["attempts"] = attempts
+    result["sqlstates"] = list(sqlstates)
+    result["error"] = error
+    return result
 
 
+def error_result(transaction_function, error):
+    """Resultado de uma transação interrompida por uma exceção que não é do banco
+    (as do psycopg2 são tratadas em run_worker): sem duração, só contada."""
+    result = transaction_result(transaction_function, "error", error=str(error).strip())
+    result["exception"] = type(error).__name__
+    return result
 
-if __name__ == "__main__":
 
-    TRANSACTION_MIX = {
-        execute_broker_volume: {"gen": generate_broker_volume_inputs, "weight": 4.9},
-        execute_customer_position: {"gen": generate_customer_position_inputs, "weight": 13.0},
-        execute_market_feed: {"gen": generate_market_feed_inputs, "weight": 1.0},
-        execute_market_watch: {"gen": generate_market_watch_inputs, "weight": 18.0},
-        execute_security_detail: {"gen": generate_security_detail_inputs, "weight": 14.0},
-        execute_trade_lookup: {"gen": generate_trade_lookup_inputs, "weight": 8.0},
-        execute_trade_order: {"gen": generate_trade_order_inputs, "weight": 10.1},
-        execute_trade_result: {"gen": generate_trade_result_inputs, "weight": 10.0},
-        execute_trade_status: {"gen": generate_trade_status_inputs, "weight": 19.0},
-        execute_trade_update: {"gen": generate_trade_update_inputs, "weight": 2.0},
-    }
-    
-    transaction_pool = []
-    for func, props in TRANSACTION_MIX.items():
-        transaction_pool.extend([func] * int(props['weight'] * 10))
+def run_worker(transaction_function, input_generator, acquire, release, sleep):
+    """Uma transação completa: conexão, geração das entradas, tentativas com
+    repetição e o resultado com o tempo de cada fase.
 
-    results = []
-    
-    print(f"🚀 Iniciando benchmark com {NUM_WORKERS} workers por {TEST_DURATION_SECS} segundos...")
-    print(f"Nível de Isolamento: {ISOLATION_LEVEL}")
+    Código síncrono compartilhado pelos modos: acquire(), release(conn, failed)
+    e sleep(secs) são os únicos pontos que bloqueiam fora das conexões; o
+    worker_task os liga ao ConnectionPool e o async_worker_task, que roda esta
+    função em um greenlet, às corrotinas do AsyncConnectionPool.
+    """
+    failed = False
+    # Até a transação terminar, uma exceção que escapa deixa o status "error".
+    status = "error"
+    error_detail = None
+
+    acquire_start = time.perf_counter_ns()
+    try:
+        conn = acquire()
+    except psycopg2.Error as e:
+        # Sem conexão não há transação medida: só a espera pelo pool é registrada.
+        return transaction_result(transaction_function, "abort", sqlstates=[sqlstate_of(e)], error=str(e).strip(),
+                                  acquire_ns=time.perf_counter_ns() - acquire_start)
+    generation_start = time.perf_counter_ns()
+    transaction_inputs = outcome = None
+
+    # Com entradas geradas, o Market Exchange sempre fica sabendo do fim da
+    # transação, mesmo por exceção: um Trade-Result que não liquidou a sua trade
+    # (status diferente de "success") a devolve à fila.
+    try:
+        try:
+            transaction_inputs = generate_inputs(conn, input_generator, application_tag(transaction_function))
+            # Encerra a transação de leitura da geração antes da transação medida.
+            conn.commit()
+        except Exception:
+            release(conn, True)
+            raise
+        tracer = tracing.get()
+        attempts = 0
+        sqlstates = []
+        # Statements e commit são os da última tentativa; as tentativas abortadas
+        # (com rollback e espera) e o rollback de um RollbackException ficam em
+        # rollback_retry_ns. O restante de duration_ns é tempo do cliente.
+        commit_ns = rollback_retry_ns = 0
+
+        start_time = time.perf_counter_ns()
+        try:
+            if tracer is not None:
+                tracer.begin(conn, transaction_function.__name__.replace('execute_', ''))
+            while True:
+                attempts += 1
+                attempt_start = time.perf_counter_ns()
+                # Conexões psycopg2 comuns não somam o tempo em statements.
+                if hasattr(conn, "statement_ns"):
+                    conn.statement_ns = 0
+                try:
+                    outcome = transaction_function(conn, **transaction_inputs)
+                    commit_start = time.perf_counter_ns()
+                    conn.commit()
+                    commit_ns = time.perf_counter_ns() - commit_start
+                    status = "success"
+                    break
+                except RollbackException:
+                    status = "rollback_ok"
+                    rollback_start = time.perf_counter_ns()
+                    conn.rollback()
+                    rollback_retry_ns += time.perf_counter_ns() - rollback_start
+                    break
+                except psycopg2.Error as e:
+                    tracing.close_frame(conn)
+                    sqlstates.append(sqlstate_of(e))
+                    if not RETRY_POLICY.should_retry(sqlstates[-1], attempts) or not rollback_for_retry(conn):
+                        status = "abort"
+                        failed = True
+                        error_detail = str(e).strip()
+                        break
+                sleep(RETRY_POLICY.backoff_secs(attempts))
+                rollback_retry_ns += time.perf_counter_ns() - attempt_start
+        finally:
+            end_time = time.perf_counter_ns()
+            statement_ns = getattr(conn, "statement_ns", 0)
+            if tracer is not None:
+                tracer.end(conn, status, attempts)
+            release(conn, failed)
+    finally:
+        if transaction_inputs is not None:
+            notify_market_exchange(transaction_function, status, transaction_inputs, outcome)
+
+    return transaction_result(
+        transaction_function, status, end_time - start_time, attempts, sqlstates, error_detail,
+        acquire_ns=generation_start - acquire_start,
+        generation_ns=start_time - generation_start,
+        statement_ns=statement_ns,
+        commit_ns=commit_ns,
+        rollback_retry_ns=rollback_retry_ns,
+    )
+
+
+def worker_task(pool, transaction_function, input_generator):
+    return run_worker(transaction_function, input_generator, pool.acquire,
+                      lambda conn, failed: pool.release(conn, failed=failed), time.sleep)
+
+
+def record_result(stats, result, phases):
+    # Só agregação em memória: o console e o arquivo ficam com a thread do IntervalReporter.
+    if phases.phase(time.time()) == MEASURE:
+        stats.add(result)
+    reporter = interval_reporter.get()
+    if reporter is not None:
+        reporter.record(result)
+
+
+def run_terminal(pool, phases, stats):
+
+    while time.time() < phases.end_time:
+        selected_function = random.choice(TRANSACTION_POOL)
+        input_generator = TRANSACTION_MIX[selected_function]["gen"]
+        try:
+            result = worker_task(pool, selected_function, input_generator)
+        except Exception as e:
+            result = error_result(selected_function, e)
+        record_result(stats, result, phases)
+
+
+def run_data_maintenance(phases, stats):
+
+    pool = ConnectionPool(
+        DB_SETTINGS, 1, ISOLATION_LEVEL,
+        connection_factory=PreparedStatementConnection if USE_PREPARED_STATEMENTS else StatementConnection,
+        session_parameters={"plan_cache_mode": PLAN_CACHE_MODE},
+    )
+
+    next_run = time.time() + DATA_MAINTENANCE_INTERVAL_SECS
+    while next_run < phases.end_time:
+        time.sleep(max(0.0, next_run - time.time()))
+        next_run += DATA_MAINTENANCE_INTERVAL_SECS
+        try:
+            result = worker_task(pool, TRANSACTION_MODULE.execute_data_maintenance, generate_data_maintenance_inputs)
+        except Exception as e:
+            result = error_result(TRANSACTION_MODULE.execute_data_maintenance, e)
+        record_result(stats, result, phases)
+
+    pool.close()
+
+
+def start_data_maintenance(phases):
+    stats = TransactionStats()
+    thread = threading.Thread(target=run_data_maintenance, args=(phases, stats), daemon=True)
+    thread.start()
+    return thread, stats
+
+
+def capture_server_stats(phases, deltas):
+    conn = server_stats.connect(DB_SETTINGS)
+    try:
+        time.sleep(max(0.0, phases.measure_start - time.time()))
+        before = server_stats.take_snapshot(conn)
+        time.sleep(max(0.0, phases.measure_end - time.time()))
+        deltas.append(server_stats.ServerStatsDelta(before, server_stats.take_snapshot(conn)))
+    finally:
+        conn.close()
+
+
+def start_server_stats(phases):
+    deltas = []
+    thread = threading.Thread(target=capture_server_stats, args=(phases, deltas), daemon=True)
+    thread.start()
+    return thread, deltas
+
+
+def run_thread_benchmark(phases):
+
+    stats = TransactionStats()
+
+    pool = ConnectionPool(
+        DB_SETTINGS, NUM_WORKERS, ISOLATION_LEVEL,
+        connection_factory=PreparedStatementConnection if USE_PREPARED_STATEMENTS else StatementConnection,
+        session_parameters={"plan_cache_mode": PLAN_CACHE_MODE},
+    )
+    print(f"Pool de conexões: {pool.connects} conexões abertas em {pool.connect_time_ms:.2f} ms")
     print("-" * 50)
-    
-    driver_conn = psycopg2.connect(**DB_SETTINGS)
-    driver_cur = driver_conn.cursor()
 
+    # Cada worker é um terminal: gera as próprias entradas com a sua conexão.
     with ThreadPoolExecutor(max_workers=NUM_WORKERS) as executor:
-        start_test_time = time.time()
-        futures = []
-        
-        for _ in range(NUM_WORKERS):
-            selected_function = random.choice(transaction_pool)
-            input_generator = TRANSACTION_MIX[selected_function]["gen"]
-            inputs = input_generator(driver_cur)
-            futures.append(executor.submit(worker_task, selected_function, inputs))
-
-        while time.time() - start_test_time < TEST_DURATION_SECS:
-            try:
-                for future in as_completed(futures, timeout=1.0):
-                    futures.remove(future)
-                    result = future.result()
-                    results.append(result)
-                    print(f"  {result['transaction']:<20} | {result['status']:<12} | {result['duration_ms']:.2f} ms")
-                    
-                    selected_function = random.choice(transaction_pool)
-                    input_generator = TRANSACTION_MIX[selected_function]["gen"]
-                    inputs = input_generator(driver_cur)
-                    futures.append(executor.submit(worker_task, selected_function, inputs))
-            except Exception:
-                continue
-    
-    driver_conn.close()
+        futures = [executor.submit(run_terminal, pool, phases, stats) for _ in range(NUM_WORKERS)]
+        for future in as_completed(futures):
+            future.result()
+
+    pool.close()
+
+    return stats, pool.stats()
+
+
+# Os filhos são criados com spawn: um fork no meio do teste copiaria locks mantidos
+# por outras threads do pai (Data-Maintenance, IntervalReporter) e travaria o filho.
+PROCESS_CONTEXT = multiprocessing.get_context("spawn")
+
+
+def init_process_benchmark_worker(shared_queue, start_time, trace_capacity):
+    # A fila só pode chegar aos filhos na criação do processo, não como argumento da tarefa.
+    reporter = None
+    if shared_queue is not None:
+        reporter = IntervalReporter(start_time, INTERVAL_SECS, QueueSink(shared_queue))
+    interval_reporter.install(reporter)
+    tracing.install(Tracer(trace_capacity) if trace_capacity is not None else None)
+
+
+def run_process_benchmark_worker(process_id, phases, domains, reference, exchange):
+    # Processos criados por fork herdam o estado do gerador aleatório do pai.
+    random.seed()
+    domain_cache.install(domains)
+    reference_cache.install(reference)
+    market_exchange.install(exchange)
+    reporter = interval_reporter.get()
+    if reporter is not None:
+        reporter.start()
+    print(f"Processo {process_id}: iniciando {NUM_WORKERS} workers...")
+    stats, pool_stats = run_thread_benchmark(phases)
+    if reporter is not None:
+        reporter.stop()
+    tracer = tracing.get()
+    return stats, pool_stats, REGISTRY.snapshot(), tracer.snapshot() if tracer is not None else None
+
+
+def run_process_benchmark(phases):
+
+    stats = TransactionStats()
+    pool_stats = {"connects": 0, "reconnects": 0, "connect_time_ms": 0.0}
+
+    # Cada processo recebe a sua parte das trades submetidas; as que ele mesmo
+    # submeter durante o teste são liquidadas pelos seus próprios Trade-Results.
+    exchange = market_exchange.get()
+    exchanges = exchange.split(NUM_PROCESSES) if exchange is not None else [None] * NUM_PROCESSES
+
+    # Os filhos enviam os intervalos pela mesma fila do reporter do pai.
+    reporter = interval_reporter.get()
+    shared_queue = reporter.sink.shared_queue if reporter is not None else None
+    tracer = tracing.get()
+
+    with ProcessPoolExecutor(max_workers=NUM_PROCESSES, mp_context=PROCESS_CONTEXT,
+                             initializer=init_process_benchmark_worker,
+                             initargs=(shared_queue, phases.start_time,
+                                       tracer.capacity if tracer is not None else None)) as executor:
+        futures = [executor.submit(run_process_benchmark_worker, i + 1, phases, domain_cache.get(), reference_cache.get(), exchanges[i]) for i in range(NUM_PROCESSES)]
+        for future in as_completed(futures):
+            process_stats, process_pool_stats, statement_stats, trace = future.result()
+            stats.merge(process_stats)
+            REGISTRY.merge(statement_stats)
+            if trace is not None:
+                tracer.merge(trace)
+            for key in pool_stats:
+                pool_stats[key] += process_pool_stats[key]
+
+    return stats, pool_stats
+
+
+async def async_worker_task(pool, transaction_function, input_generator):
+    # A transação inteira roda em um greenlet; só o pool e a espera entre
+    # tentativas voltam ao event loop, além dos comandos das conexões.
+    return await greenlet_spawn(
+        run_worker, transaction_function, input_generator,
+        lambda: await_only(pool.acquire()),
+        lambda conn, failed: await_only(pool.release(conn, failed=failed)),
+        lambda secs: await_only(asyncio.sleep(secs)),
+    )
+
+
+async def async_terminal(pool, phases, stats):
+
+    while time.time() < phases.end_time:
+        selected_function = random.choice(TRANSACTION_POOL)
+        input_generator = TRANSACTION_MIX[selected_function]["gen"]
+        try:
+            result = await async_worker_task(pool, selected_function, input_generator)
+        except Exception as e:
+            result = error_result(selected_function, e)
+        record_result(stats, result, phases)
+
+
+async def run_async_benchmark_loop(phases):
+
+    stats = TransactionStats()
+
+    pool = AsyncConnectionPool(
+        DB_SETTINGS, ASYNC_POOL_SIZE, ISOLATION_LEVEL,
+        prepare_statements=USE_PREPARED_STATEMENTS,
+        session_parameters={"plan_cache_mode": PLAN_CACHE_MODE},
+    )
+    await pool.open()
+    print(f"Pool de conexões: {pool.connects} conexões abertas em {pool.connect_time_ms:.2f} ms")
+    print("-" * 50)
+
+    terminals = [async_terminal(pool, phases, stats) for _ in range(NUM_ASYNC_TERMINALS)]
+    await asyncio.gather(*terminals)
+
+    pool.close()
+
+    return stats, pool.stats()
+
+
+def run_async_benchmark(phases):
+    return asyncio.run(run_async_benchmark_loop(phases))
+
+
+def install_procedures():
+    conn = psycopg2.connect(**DB_SETTINGS)
+    try:
+        start_time = time.perf_counter()
+        procedures.install(conn)
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        print(f"Funções PL/pgSQL das transações instaladas em {elapsed_ms:.2f} ms")
+    finally:
+        conn.close()
+
+
+def run_trade_cleanup():
+    conn = psycopg2.connect(**DB_SETTINGS)
+    try:
+        start_time = time.perf_counter()
+        canceled_pending, canceled_submitted = trade_cleanup(conn, chunk_size=TRADE_CLEANUP_CHUNK_SIZE)
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        print(f"Trade-Cleanup: {canceled_pending} pendentes e {canceled_submitted} submetidas canceladas em {elapsed_ms:.2f} ms")
+    finally:
+        conn.close()
+
+
+def load_caches():
+    conn = psycopg2.connect(**DB_SETTINGS)
+    try:
+        with conn.cursor() as cur:
+            if USE_DOMAIN_CACHE:
+                start_time = time.perf_counter()
+                domains = DomainCache(refresh_secs=DOMAIN_REFRESH_SECS)
+                domains.load(cur)
+                domain_cache.install(domains)
+
+                elapsed_ms = (time.perf_counter() - start_time) * 1000
+                sizes = ", ".join(f"{name}={size}" for name, size in domains.sizes().items())
+                print(f"Cache de domínios carregado em {elapsed_ms:.2f} ms ({sizes})")
+
+            if USE_REFERENCE_CACHE:
+                start_time = time.perf_counter()
+                reference = ReferenceCache()
+                reference.load(cur)
+                reference_cache.install(reference)
+
+                elapsed_ms = (time.perf_counter() - start_time) * 1000
+                print(f"Cache de tabelas de referência carregado em {elapsed_ms:.2f} ms")
+
+            if USE_MARKET_EXCHANGE:
+                start_time = time.perf_counter()
+                exchange = MarketExchange()
+                exchange.seed(cur)
+                market_exchange.install(exchange)
+
+                elapsed_ms = (time.perf_counter() - start_time) * 1000
+                print(f"Market Exchange Emulator iniciado em {elapsed_ms:.2f} ms ({exchange.stats()['pending_trades']} trades submetidas)")
+    finally:
+        conn.close()
+
+
+def start_interval_reporting(phases, detector, wal_attribution):
+    writer = IntervalWriter(INTERVAL_OUTPUT_PATH, INTERVAL_OUTPUT_FORMAT, phases, INTERVAL_SECS, detector, wal_attribution)
+
+    # No modo PROCESSES, o pai (Data-Maintenance) e cada filho produzem intervalos
+    # parciais; o IntervalCollector une e grava cada intervalo uma única vez.
+    collector = None
+    if EXECUTION_MODE == "PROCESSES":
+        shared_queue = PROCESS_CONTEXT.Queue()
+        collector = IntervalCollector(shared_queue, NUM_PROCESSES + 1, writer).start()
+        sink = QueueSink(shared_queue)
+    else:
+        sink = writer
+
+    # O probe fica no reporter do pai: o WAL é do servidor, lido uma vez por intervalo.
+    probe = WalProbe(DB_SETTINGS) if wal_attribution is not None else None
+    reporter = IntervalReporter(phases.start_time, INTERVAL_SECS, sink, probe).start()
+    interval_reporter.install(reporter)
+    return reporter, collector
+
+
+def stop_interval_reporting(reporter, collector):
+    reporter.stop()
+    if reporter.probe is not None:
+        reporter.probe.close()
+    if collector is not None:
+        collector.stop()
+    interval_reporter.install(None)
+
+
+def print_report(stats, pool_stats, phases, detector, maintenance_stats=None, server_delta=None, wait_sampler=None,
+                 wal_attribution=None):
     
     print("\n" + "="*50)
     print("📊 RESULTADOS FINAIS DO BENCHMARK")
     print("="*50)
     
-    total_transacoes = len(results)
-    sucessos = sum(1 for r in results if r['status'] in ['success', 'rollback_ok'])
-    aborts = total_transacoes - sucessos
+    totals = stats.totals()
+    sucessos = totals['success'] + totals['rollback_ok']
+    aborts = totals['abort']
+    total_transacoes = sucessos + aborts
     
     vazao_tps = sucessos / TEST_DURATION_SECS
     taxa_abort = (aborts / total_transacoes) * 100 if total_transacoes > 0 else 0
     
-    print(f"Tempo Total do Teste:       {TEST_DURATION_SECS} segundos")
+    print(f"Tempo Total do Teste:       {WARMUP_SECS + TEST_DURATION_SECS + COOLDOWN_SECS} segundos "
+          f"(aquecimento: {WARMUP_SECS} s, medição: {TEST_DURATION_SECS} s, resfriamento: {COOLDOWN_SECS} s)")
+    print(f"Tempo de Medição:           {TEST_DURATION_SECS} segundos (só as transações desta fase são contadas)")
+    print_steady_state(phases, detector)
     print(f"Total de Transações Tentadas: {total_transacoes}")
     print(f"  - Sucesso (Commit+Rollback OK): {sucessos}")
     print(f"  - Aborts (Erros):               {aborts}")
+    if totals['error']:
+        print(f"  - Exceções fora do banco:       {totals['error']} (sem duração; ver erros abaixo)")
     print("-" * 25)
     print(f"VAZÃO (Throughput):           {vazao_tps:.2f} transações/segundo")
-    print(f"TAXA DE ABORTS:               {taxa_abort:.2f}%")
-    
-    print("\n**Lembre-se de recolher a métrica de DEADLOCKS diretamente da base de dados!**")
+    print(f"TAXA DE ABORTS:               {taxa_abort:.2f}% (depois das repetições)")
+    print(f"REPETIÇÕES:                   {totals['retries']} ({totals['retried']} transações repetidas, até {RETRY_MAX_ATTEMPTS} tentativas)")
+    print(f"LATÊNCIA:                     {format_percentiles(stats.latency.total())}")
+    print(f"  - 1ª tentativa:             {format_percentiles(stats.first_try_latency.total())}")
+    print(f"  - repetidas:                {format_percentiles(stats.retried_latency.total())}")
+    print(f"FASES (média):                {format_phases(totals, stats.latency.total())}")
+
+    avg_acquire_ms = totals['acquire_ns'] / total_transacoes / 1e6 if total_transacoes > 0 else 0
+    print("-" * 25)
+    print(f"Conexões Abertas:             {pool_stats['connects']} ({pool_stats['reconnects']} reconexões)")
+    print(f"Tempo Total de Conexão:       {pool_stats['connect_time_ms']:.2f} ms (fora do tempo das transações)")
+    print(f"Espera Média pelo Pool:       {avg_acquire_ms:.3f} ms")
+
+    avg_generation_ms = totals['generation_ns'] / total_transacoes / 1e6 if total_transacoes > 0 else 0
+    print(f"Geração Média de Entradas:    {avg_generation_ms:.3f} ms (fora do tempo das transações)")
+
+    # No modo PROCESSES cada processo tem o seu emulador; o do pai não é usado.
+    exchange = market_exchange.get()
+    if exchange is not None and EXECUTION_MODE != "PROCESSES":
+        exchange_stats = exchange.stats()
+        print(f"Market Exchange:              {exchange_stats['submitted']} submetidas, {exchange_stats['settled']} liquidadas, "
+              f"{exchange_stats['requeued']} devolvidas à fila, {exchange_stats['pending_trades']} pendentes")
+
+    print_error_report(stats, maintenance_stats)
 
     print("\n--- Detalhes por Transação ---")
-    by_type = defaultdict(lambda: {'count': 0, 'aborts': 0, 'total_time': 0})
-    for r in results:
-        stats = by_type[r['transaction']]
-        stats['count'] += 1
-        stats['total_time'] += r['duration_ms']
-        if r['status'] == 'abort':
-            stats['aborts'] += 1
-            
-    for name, stats in sorted(by_type.items()):
-        avg_time = stats['total_time'] / stats['count'] if stats['count'] > 0 else 0
-        print(f"- {name:<20} | Execuções: {stats['count']:<5} | Aborts: {stats['aborts']:<4} | Tempo Médio: {avg_time:.2f} ms")
\ No newline at end of file
+    print_transaction_details(stats)
+
+    if maintenance_stats is not None and maintenance_stats.items():
+        print(f"\n--- Data-Maintenance (a cada {DATA_MAINTENANCE_INTERVAL_SECS} s, fora do mix) ---")
+        print_transaction_details(maintenance_stats)
+
+    print_statement_report()
+
+    if server_delta is not None:
+        server_stats.print_server_report(server_delta)
+
+    if wal_attribution is not None:
+        print_wal_report(wal_attribution, INTERVAL_SECS)
+
+    if wait_sampler is not None:
+        print_wait_profile(wait_sampler)
+
+
+def print_error_report(stats, maintenance_stats=None):
+    errors = dict(stats.errors)
+    if maintenance_stats is not None:
+        for sqlstate, count in maintenance_stats.errors.items():
+            errors[sqlstate] = errors.get(sqlstate, 0) + count
+
+    # Cada tentativa que falhou conta, inclusive as que foram repetidas com sucesso.
+    print(f"\n--- Erros por SQLSTATE (todas as tentativas: {sum(errors.values())}) ---")
+    print(f"Deadlocks (40P01):            {errors.get(DEADLOCK_DETECTED, 0)} detectados pelo driver")
+    by_class = {}
+    for sqlstate, count in sorted(errors.items()):
+        by_class.setdefault(sqlstate[:2], []).append((sqlstate, count))
+    for sqlstates in by_class.values():
+        print(f"- {sqlstate_class_label(sqlstates[0][0]):<38} | {sum(count for _, count in sqlstates)}")
+        for sqlstate, count in sqlstates:
+            retry = " (repetido)" if sqlstate in RETRY_POLICY.retryable_sqlstates else ""
+            print(f"    {sqlstate} {sqlstate_label(sqlstate):<30} | {count}{retry}")
+
+    exceptions = dict(stats.exceptions)
+    if maintenance_stats is not None:
+        for key, (count, message) in maintenance_stats.exceptions.items():
+            exceptions[key] = (exceptions.get(key, (0, message))[0] + count, message)
+    if exceptions:
+        print(f"\n--- Exceções fora do banco ({sum(count for count, _ in exceptions.values())}) ---")
+        for (transaction, exception), (count, message) in sorted(exceptions.items()):
+            print(f"- {transaction:<20} | {exception:<20} | {count:<6} | {message[:80]}")
+
+
+def print_steady_state(phases, detector):
+    if detector.reached_at_secs is None:
+        last_cv = f"{detector.last_cv * 100:.1f}%" if detector.last_cv is not None else "n/d"
+        print(f"Estado Estacionário:        não detectado (último CV da vazão: {last_cv}, limite: {STEADY_STATE_MAX_CV * 100:.1f}%)")
+        return
+    print(f"Estado Estacionário:        atingido em {detector.reached_at_secs:.1f} s "
+          f"(CV da vazão em {STEADY_STATE_WINDOW} intervalos: {detector.reached_cv * 100:.1f}%)")
+    if detector.reached_at_secs > phases.warmup_secs:
+        print(f"  ⚠️  Atingido depois do fim do aquecimento ({phases.warmup_secs} s): aumente WARMUP_SECS.")
+
+
+def format_phases(counters, histogram):
+    """Média por transação de cada fase; "cliente" é o resto da duração (código Python
+    das transações entre os statements). A espera pelo pool é média sobre todas as
+    transações tentadas; as demais fases, só sobre as que obtiveram conexão e
+    têm duração no histograma."""
+    count = counters['success'] + counters['rollback_ok'] + counters['abort']
+    if count == 0:
+        return "sem transações"
+    measured = max(histogram.count, 1)
+    client_ns = histogram.total_ns - counters['statement_ns'] - counters['commit_ns'] - counters['rollback_retry_ns']
+    phases = (
+        ("pool", counters['acquire_ns'] / count),
+        ("geração", counters['generation_ns'] / measured),
+        ("statements", counters['statement_ns'] / measured),
+        ("commit", counters['commit_ns'] / measured),
+        ("rollback/repetição", counters['rollback_retry_ns'] / measured),
+        ("cliente", client_ns / measured),
+    )
+    return " | ".join(f"{name}: {mean_ns / 1e6:.2f}" for name, mean_ns in phases) + " ms"
+
+
+def print_transaction_details(stats):
+    for name, counters in stats.items():
+        count = counters['success'] + counters['rollback_ok'] + counters['abort']
+        histogram = stats.latency.get(name)
+        errors = f" | Exceções: {counters['error']}" if counters['error'] else ""
+        print(f"- {name:<20} | Execuções: {count:<5} | Aborts: {counters['abort']:<4}{errors} | Repetições: {counters['retries']:<4} | Tempo Médio: {histogram.mean_ns() / 1e6:.2f} ms")
+        print(f"  {'':<20} | {format_percentiles(histogram)}")
+        print(f"  {'':<20} | {format_phases(counters, histogram)}")
+
+
+def print_statement_report(limit=15):
+    statements = sorted(REGISTRY.statements(), key=lambda st: st.executions, reverse=True)
+    total_executions = sum(st.executions for st in statements)
+    total_prepares = sum(st.prepares for st in statements)
+
+    mode = f"preparados, plan_cache_mode={PLAN_CACHE_MODE}" if USE_PREPARED_STATEMENTS else "SQL simples"
+    print(f"\n--- Statements ({mode}) ---")
+    print(f"Statements distintos: {len(statements)} | Execuções: {total_executions} | PREPAREs: {total_prepares}")
+    for st in statements[:limit]:
+        avg_ms = st.total_ms / st.executions if st.executions > 0 else 0
+        query = " ".join(st.query.split())
+        print(f"- {st.name:<9} | Execuções: {st.executions:<6} | PREPAREs: {st.prepares:<3} | Tempo Médio: {avg_ms:.3f} ms | {query[:60]}")
+
+
+if __name__ == "__main__":
+
+    duration = f"{WARMUP_SECS} + {TEST_DURATION_SECS} + {COOLDOWN_SECS} segundos (aquecimento + medição + resfriamento)"
+    if EXECUTION_MODE == "THREADS":
+        print(f"🚀 Iniciando benchmark com {NUM_WORKERS} workers por {duration}...")
+    elif EXECUTION_MODE == "ASYNC":
+        print(f"🚀 Iniciando benchmark assíncrono com {NUM_ASYNC_TERMINALS} terminais por {duration}...")
+    elif EXECUTION_MODE == "PROCESSES":
+        print(f"🚀 Iniciando benchmark com {NUM_PROCESSES} processos x {NUM_WORKERS} workers por {duration}...")
+    else:
+        raise SystemExit("Modo de execução inválido. Escolha 'THREADS', 'ASYNC' ou 'PROCESSES'.")
+
+    if EXECUTION_MODE == "ASYNC" and AsyncConnectionPool is None:
+        raise SystemExit("O modo ASYNC requer os pacotes 'aiopg' e 'greenlet' (ver requirements.txt).")
+    if TRANSACTION_MODE not in ("CLIENT", "SERVER"):
+        raise SystemExit("Modo de transação inválido. Escolha 'CLIENT' ou 'SERVER'.")
+    print(f"Nível de Isolamento: {ISOLATION_LEVEL}")
+    print(f"Execução das Transações: {TRANSACTION_MODE}")
+    print("-" * 50)
+
+    if TRANSACTION_MODE == "SERVER":
+        install_procedures()
+
+    if RUN_TRADE_CLEANUP:
+        run_trade_cleanup()
+
+    load_caches()
+
+    if INTERVAL_OUTPUT_FORMAT not in ("CSV", "JSONL"):
+        raise SystemExit("Formato de saída inválido. Escolha 'CSV' ou 'JSONL'.")
+    phases = RunPhases(time.time(), WARMUP_SECS, TEST_DURATION_SECS, COOLDOWN_SECS)
+    detector = SteadyStateDetector(STEADY_STATE_WINDOW, STEADY_STATE_MAX_CV)
+    wal_attribution = WalAttribution() if CAPTURE_WAL_STATS else None
+    tracer = Tracer(TRACE_BUFFER_SIZE) if TRACE_OUTPUT_PATH else None
+    tracing.install(tracer)
+    reporter, collector = start_interval_reporting(phases, detector, wal_attribution)
+
+    if RUN_DATA_MAINTENANCE:
+        maintenance_thread, maintenance_stats = start_data_maintenance(phases)
+    if CAPTURE_SERVER_STATS:
+        server_stats_thread, server_deltas = start_server_stats(phases)
+    wait_sampler = None
+    if RUN_WAIT_SAMPLER:
+        wait_sampler = WaitSampler(DB_SETTINGS, WAIT_SAMPLE_INTERVAL_MS / 1000, WAIT_SAMPLER_APPLICATION_PREFIX,
+                                   phases.measure_start, phases.measure_end).start()
+
+    if EXECUTION_MODE == "THREADS":
+        stats, pool_stats = run_thread_benchmark(phases)
+    elif EXECUTION_MODE == "ASYNC":
+        stats, pool_stats = run_async_benchmark(phases)
+    else:
+        stats, pool_stats = run_process_benchmark(phases)
+
+    if RUN_DATA_MAINTENANCE:
+        maintenance_thread.join()
+    else:
+        maintenance_stats = None
+
+    server_delta = None
+    if CAPTURE_SERVER_STATS:
+        server_stats_thread.join()
+        server_delta = server_deltas[0] if server_deltas else None
+    if wait_sampler is not None:
+        wait_sampler.stop()
+
+    stop_interval_reporting(reporter, collector)
+    if INTERVAL_OUTPUT_PATH:
+        print(f"Série temporal ({INTERVAL_SECS} s por intervalo) gravada em {INTERVAL_OUTPUT_PATH}")
+    if tracer is not None:
+        spans = tracer.export(TRACE_OUTPUT_PATH)
+        print(f"Trace com {spans} spans (últimos {tracer.capacity}) gravado em {TRACE_OUTPUT_PATH}")
+
+    print_report(stats, pool_stats, phases, detector, maintenance_stats, server_delta, wait_sampler, wal_attribution)
+
+
+
@@ -1,18 +1,59 @@
 import random
 import decimal
+import itertools
 from datetime import date, timedelta
 
+import domain_cache
+import market_exchange
+import reference_cache
+
+
+# Sorteio de chaves: usa o DomainCache quando instalado e, caso contrário,
+# recorre ao ORDER BY RANDOM() original.
+
+def _random_value(cur, domain_name, fallback_query):
+    domains = domain_cache.get()
+    if domains is not None:
+        return random.choice(getattr(domains, domain_name))
+    cur.execute(fallback_query)
+    return cur.fetchone()[0]
+
+
+def _random_values(cur, domain_name, fallback_query, count):
+    domains = domain_cache.get()
+    if domains is not None:
+        population = getattr(domains, domain_name)
+        return random.sample(population, min(count, len(population)))
+    cur.execute(fallback_query, (count,))
+    return [row[0] for row in cur.fetchall()]
+
+
+def _random_account_id(cur):
+    return _random_value(cur, "account_ids", "SELECT ca_id FROM CUSTOMER_ACCOUNT ORDER BY RANDOM() LIMIT 1")
+
+
+def _random_symbol(cur):
+    return _random_value(cur, "symbols", "SELECT s_symb FROM SECURITY ORDER BY RANDOM() LIMIT 1")
+
+
+def _random_trade_ids(cur, count):
+    domains = domain_cache.get()
+    if domains is not None:
+        domains.refresh_if_stale(cur)
+        return domains.sample_trade_ids(count)
+    cur.execute("SELECT t_id FROM TRADE ORDER BY RANDOM() LIMIT %s", (count,))
+    return [row[0] for row in cur.fetchall()]
+
+
 def generate_customer_position_inputs(cur):
 
     use_tax_id = random.choice([True, False])
     
     if use_tax_id:
-        cur.execute("SELECT c_tax_id FROM CUSTOMER ORDER BY RANDOM() LIMIT 1")
-        tax_id = cur.fetchone()[0]
+        tax_id = _random_value(cur, "customer_tax_ids", "SELECT c_tax_id FROM CUSTOMER ORDER BY RANDOM() LIMIT 1")
         cust_id = 0 
     else:
-        cur.execute("SELECT c_id FROM CUSTOMER ORDER BY RANDOM() LIMIT 1")
-        cust_id = cur.fetchone()[0]
+        cust_id = _random_value(cur, "customer_ids", "SELECT c_id FROM CUSTOMER ORDER BY RANDOM() LIMIT 1")
         tax_id = "" 
 
     get_history = random.choice([True, False])
@@ -28,19 +69,48 @@ def generate_customer_position_inputs(cur):
 
 def generate_market_feed_inputs(cur):
 
-    cur.execute("SELECT st_id FROM STATUS_TYPE WHERE st_id = 'SBMT'")
-    status_submitted = cur.fetchone()[0]
-    
-    cur.execute("SELECT tt_id FROM TRADE_TYPE WHERE tt_id IN ('TSL', 'TLS', 'TLB')")
-    trade_types = {row[0]: row[0] for row in cur.fetchall()}
+    reference = reference_cache.get()
+    if reference is not None:
+        status_submitted = reference.status_id('SBMT')
+        trade_types = {tt_id: tt_id for tt_id in reference.trade_type_ids if tt_id in ('TSL', 'TLS', 'TLB')}
+    else:
+        cur.execute("SELECT st_id FROM STATUS_TYPE WHERE st_id = 'SBMT'")
+        status_submitted = cur.fetchone()[0]
+
+        cur.execute("SELECT tt_id FROM TRADE_TYPE WHERE tt_id IN ('TSL', 'TLS', 'TLB')")
+        trade_types = {row[0]: row[0] for row in cur.fetchall()}
     type_stop_loss = trade_types.get('TSL')
     type_limit_sell = trade_types.get('TLS')
     type_limit_buy = trade_types.get('TLB')
 
     max_feed_len = 20
     feed = []
-    
-    cur.execute("SELECT lt_s_symb, lt_price FROM LAST_TRADE ORDER BY RANDOM() LIMIT %s", (max_feed_len,))
+
+    # Com o Market Exchange Emulator, a fita é feita dos preços executados pelos
+    # Trade-Results; uma fita vazia faz do Market-Feed uma transação vazia.
+    exchange = market_exchange.get()
+    if exchange is not None:
+        for symbol, price_quote, trade_qty in exchange.take_ticks(max_feed_len):
+            feed.append({
+                "symbol": symbol,
+                "price_quote": price_quote,
+                "trade_qty": trade_qty
+            })
+        return {
+            "ticker_tape": feed,
+            "status_submitted": status_submitted,
+            "type_stop_loss": type_stop_loss,
+            "type_limit_sell": type_limit_sell,
+            "type_limit_buy": type_limit_buy
+        }
+
+    domains = domain_cache.get()
+    if domains is not None:
+        symbols = random.sample(domains.symbols, min(max_feed_len, len(domains.symbols)))
+        # s_symb é CHAR(15): o array precisa ser bpchar[] para comparar sem o padding e usar o índice.
+        cur.execute("SELECT lt_s_symb, lt_price FROM LAST_TRADE WHERE lt_s_symb = ANY(%s::bpchar[])", (symbols,))
+    else:
+        cur.execute("SELECT lt_s_symb, lt_price FROM LAST_TRADE ORDER BY RANDOM() LIMIT %s", (max_feed_len,))
     securities = cur.fetchall()
 
     for symbol, current_price in securities:
@@ -76,17 +146,14 @@ def generate_market_watch_inputs(cur):
     }
     
     if scenario == 'cust_id':
-        cur.execute("SELECT wl_c_id FROM WATCH_LIST ORDER BY RANDOM() LIMIT 1")
-        inputs['cust_id'] = cur.fetchone()[0]
+        inputs['cust_id'] = _random_value(cur, "watch_list_customer_ids", "SELECT wl_c_id FROM WATCH_LIST ORDER BY RANDOM() LIMIT 1")
     
     elif scenario == 'industry_name':
-        cur.execute("SELECT in_name FROM INDUSTRY ORDER BY RANDOM() LIMIT 1")
-        inputs['industry_name'] = cur.fetchone()[0]
+        inputs['industry_name'] = _random_value(cur, "industry_names", "SELECT in_name FROM INDUSTRY ORDER BY RANDOM() LIMIT 1")
 
     
     elif scenario == 'acct_id':
-        cur.execute("SELECT hs_ca_id FROM HOLDING_SUMMARY ORDER BY RANDOM() LIMIT 1")
-        inputs['acct_id'] = cur.fetchone()[0]
+        inputs['acct_id'] = _random_value(cur, "holding_account_ids", "SELECT hs_ca_id FROM HOLDING_SUMMARY ORDER BY RANDOM() LIMIT 1")
 
 
     start_day = date.today() - timedelta(days=random.randint(1, 365))
@@ -99,8 +166,7 @@ def generate_market_watch_inputs(cur):
 
 def generate_security_detail_inputs(cur):
 
-    cur.execute("SELECT s_symb FROM SECURITY ORDER BY RANDOM() LIMIT 1")
-    symbol = cur.fetchone()[0]
+    symbol = _random_symbol(cur)
 
 
     access_lob_flag = (random.randint(1, 100) == 1)
@@ -138,27 +204,23 @@ def generate_trade_lookup_inputs(cur):
     end_trade_dts = start_trade_dts + timedelta(days=random.randint(1, 5))
 
     if frame_to_execute == 1:
-        cur.execute("SELECT t_id FROM TRADE ORDER BY RANDOM() LIMIT %s", (max_trades,))
-        inputs["trade_id_list"] = [row[0] for row in cur.fetchall()]
+        inputs["trade_id_list"] = _random_trade_ids(cur, max_trades)
         inputs["max_trades"] = max_trades
 
     elif frame_to_execute == 2:
-        cur.execute("SELECT ca_id FROM CUSTOMER_ACCOUNT ORDER BY RANDOM() LIMIT 1")
-        inputs["acct_id"] = cur.fetchone()[0]
+        inputs["acct_id"] = _random_account_id(cur)
         inputs["start_trade_dts"] = start_trade_dts.strftime('%Y-%m-%d %H:%M:%S')
         inputs["end_trade_dts"] = end_trade_dts.strftime('%Y-%m-%d %H:%M:%S')
         inputs["max_trades"] = max_trades
 
     elif frame_to_execute == 3:
-        cur.execute("SELECT s_symb FROM SECURITY ORDER BY RANDOM() LIMIT 1")
-        inputs["symbol"] = cur.fetchone()[0]
+        inputs["symbol"] = _random_symbol(cur)
         inputs["start_trade_dts"] = start_trade_dts.strftime('%Y-%m-%d %H:%M:%S')
         inputs["end_trade_dts"] = end_trade_dts.strftime('%Y-%m-%d %H:%M:%S')
         inputs["max_trades"] = max_trades
 
     elif frame_to_execute == 4:
-        cur.execute("SELECT ca_id FROM CUSTOMER_ACCOUNT ORDER BY RANDOM() LIMIT 1")
-        inputs["acct_id"] = cur.fetchone()[0]
+        inputs["acct_id"] = _random_account_id(cur)
         inputs["start_trade_dts"] = start_trade_dts.strftime('%Y-%m-%d %H:%M:%S')
 
     return inputs
@@ -167,16 +229,21 @@ def generate_trade_lookup_inputs(cur):
 
 def generate_trade_order_inputs(cur):
 
-    cur.execute("SELECT ca_id FROM CUSTOMER_ACCOUNT ORDER BY RANDOM() LIMIT 1")
-    acct_id = cur.fetchone()[0]
+    acct_id = _random_account_id(cur)
 
-    cur.execute("SELECT st_id FROM STATUS_TYPE WHERE st_id IN ('PNDG', 'SBMT')")
-    statuses = {row[0]: row[0] for row in cur.fetchall()}
-    st_pending_id = statuses.get('PNDG')
-    st_submitted_id = statuses.get('SBMT')
+    reference = reference_cache.get()
+    if reference is not None:
+        st_pending_id = reference.status_id('PNDG')
+        st_submitted_id = reference.status_id('SBMT')
+        trade_type_id = random.choice(reference.trade_type_ids)
+    else:
+        cur.execute("SELECT st_id FROM STATUS_TYPE WHERE st_id IN ('PNDG', 'SBMT')")
+        statuses = {row[0]: row[0] for row in cur.fetchall()}
+        st_pending_id = statuses.get('PNDG')
+        st_submitted_id = statuses.get('SBMT')
 
-    cur.execute("SELECT tt_id FROM TRADE_TYPE ORDER BY RANDOM() LIMIT 1")
-    trade_type_id = cur.fetchone()[0]
+        cur.execute("SELECT tt_id FROM TRADE_TYPE ORDER BY RANDOM() LIMIT 1")
+        trade_type_id = cur.fetchone()[0]
 
     cur.execute("""
         SELECT C.c_f_name, C.c_l_name, C.c_tax_id
@@ -197,14 +264,17 @@ def generate_trade_order_inputs(cur):
     use_co_name = random.randint(1, 100) <= 40
     symbol, co_name, issue = "", "", ""
     if use_co_name:
-        cur.execute("""
-            SELECT C.co_name, S.s_issue FROM SECURITY S JOIN COMPANY C ON S.s_co_id = C.co_id
-            ORDER BY RANDOM() LIMIT 1
-        """)
-        co_name, issue = cur.fetchone()
+        domains = domain_cache.get()
+        if domains is not None:
+            co_name, issue = random.choice(domains.company_issues)
+        else:
+            cur.execute("""
+                SELECT C.co_name, S.s_issue FROM SECURITY S JOIN COMPANY C ON S.s_co_id = C.co_id
+                ORDER BY RANDOM() LIMIT 1
+            """)
+            co_name, issue = cur.fetchone()
     else:
-        cur.execute("SELECT s_symb FROM SECURITY ORDER BY RANDOM() LIMIT 1")
-        symbol = cur.fetchone()[0]
+        symbol = _random_symbol(cur)
 
     return {
         "acct_id": acct_id,
@@ -228,8 +298,14 @@ def generate_trade_order_inputs(cur):
 
 def generate_trade_result_inputs(cur):
 
-    cur.execute("SELECT t_id, t_bid_price FROM TRADE WHERE t_st_id = 'SBMT' ORDER BY RANDOM() LIMIT 1")
-    trade_result = cur.fetchone()
+    # O Market Exchange Emulator entrega cada trade submetida a um único Trade-Result.
+    exchange = market_exchange.get()
+    if exchange is not None:
+        trade = exchange.take_trade()
+        trade_result = (trade[0], trade[3]) if trade else None
+    else:
+        cur.execute("SELECT t_id, t_bid_price FROM TRADE WHERE t_st_id = 'SBMT' ORDER BY RANDOM() LIMIT 1")
+        trade_result = cur.fetchone()
 
     if not trade_result:
 
@@ -249,8 +325,7 @@ def generate_trade_result_inputs(cur):
 
 def generate_trade_status_inputs(cur):
 
-    cur.execute("SELECT ca_id FROM CUSTOMER_ACCOUNT ORDER BY RANDOM() LIMIT 1")
-    acct_id = cur.fetchone()[0]
+    acct_id = _random_account_id(cur)
     
     return {
         "acct_id": acct_id
@@ -275,22 +350,19 @@ def generate_trade_update_inputs(cur):
     end_trade_dts = start_trade_dts + timedelta(days=random.randint(1, 5))
 
     if frame_to_execute == 1:
-        cur.execute("SELECT t_id FROM TRADE ORDER BY RANDOM() LIMIT %s", (max_trades,))
-        inputs["trade_id_list"] = [row[0] for row in cur.fetchall()]
+        inputs["trade_id_list"] = _random_trade_ids(cur, max_trades)
         inputs["max_trades"] = max_trades
         inputs["max_updates"] = max_updates
 
     elif frame_to_execute == 2:
-        cur.execute("SELECT ca_id FROM CUSTOMER_ACCOUNT ORDER BY RANDOM() LIMIT 1")
-        inputs["acct_id"] = cur.fetchone()[0]
+        inputs["acct_id"] = _random_account_id(cur)
         inputs["start_trade_dts"] = start_trade_dts.strftime('%Y-%m-%d %H:%M:%S')
         inputs["end_trade_dts"] = end_trade_dts.strftime('%Y-%m-%d %H:%M:%S')
         inputs["max_trades"] = max_trades
         inputs["max_updates"] = max_updates
 
     elif frame_to_execute == 3:
-        cur.execute("SELECT s_symb FROM SECURITY ORDER BY RANDOM() LIMIT 1")
-        inputs["symbol"] = cur.fetchone()[0]
+        inputs["symbol"] = _random_symbol(cur)
         inputs["start_trade_dts"] = start_trade_dts.strftime('%Y-%m-%d %H:%M:%S')
         inputs["end_trade_dts"] = end_trade_dts.strftime('%Y-%m-%d %H:%M:%S')
         inputs["max_trades"] = max_trades
@@ -304,14 +376,47 @@ def generate_broker_volume_inputs(cur):
     
     num_brokers_to_select = random.randint(20, 40)
 
-    cur.execute("SELECT b_name FROM BROKER ORDER BY RANDOM() LIMIT %s", (num_brokers_to_select,))
-    
-    broker_list = [row[0] for row in cur.fetchall()]
+    broker_list = _random_values(cur, "broker_names", "SELECT b_name FROM BROKER ORDER BY RANDOM() LIMIT %s", num_brokers_to_select)
     
-    cur.execute("SELECT sc_name FROM SECTOR ORDER BY RANDOM() LIMIT 1")
-    sector_name = cur.fetchone()[0]
+    sector_name = _random_value(cur, "sector_names", "SELECT sc_name FROM SECTOR ORDER BY RANDOM() LIMIT 1")
     
     return {
         "broker_list": broker_list,
         "sector_name": sector_name
-    }
\ No newline at end of file
+    }
+
+
+
+# O Data-Maintenance percorre as tabelas em rodízio, uma por execução.
+DATA_MAINTENANCE_TABLES = itertools.cycle([
+    "ACCOUNT_PERMISSION", "ADDRESS", "COMPANY", "CUSTOMER", "CUSTOMER_TAXRATE", "DAILY_MARKET",
+    "EXCHANGE", "FINANCIAL", "NEWS_ITEM", "SECURITY", "TAXRATE", "WATCH_ITEM",
+])
+
+
+def generate_data_maintenance_inputs(cur):
+
+    reference = reference_cache.get()
+    if reference is not None:
+        tx_id = random.choice(list(reference.tax_rates))
+    else:
+        cur.execute("SELECT tx_id FROM TAXRATE ORDER BY RANDOM() LIMIT 1")
+        tx_id = cur.fetchone()[0]
+
+    table_name = next(DATA_MAINTENANCE_TABLES)
+
+    # Em ADDRESS, c_id = 0 faz a transação alterar o endereço da empresa co_id.
+    c_id = _random_value(cur, "customer_ids", "SELECT c_id FROM CUSTOMER ORDER BY RANDOM() LIMIT 1")
+    if table_name == "ADDRESS" and random.choice([True, False]):
+        c_id = 0
+
+    return {
+        "table_name": table_name,
+        "acct_id": _random_account_id(cur),
+        "c_id": c_id,
+        "co_id": _random_value(cur, "company_ids", "SELECT co_id FROM COMPANY ORDER BY RANDOM() LIMIT 1"),
+        "symbol": _random_symbol(cur),
+        "tx_id": tx_id,
+        "day_of_month": random.randint(1, 31),
+        "vol_incr": random.choice([-2, -1, 1, 2])
+    }
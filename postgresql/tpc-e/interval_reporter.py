@@ -0,0 +1,235 @@
+import csv
+import json
+import queue
+import threading
+import time
+
+from latency_histogram import PERCENTILES
+from run_phases import MEASURE
+from transaction_stats import TransactionStats
+from wal_stats import WAL_COUNTERS
+
+
+# Série temporal do benchmark: os workers só somam cada resultado ao intervalo
+# corrente (em memória); uma thread fecha o intervalo a cada interval_secs e o
+# entrega a um destino: o arquivo CSV/JSONL mais uma linha no console, ou, nos
+# processos filhos, uma fila lida pelo processo pai. O reporter do processo pai
+# também lê o WAL e as escritas do servidor no intervalo (WalProbe), que saem
+# na linha "total".
+
+FIELDS = (
+    ["interval", "time", "elapsed_secs", "phase", "transaction", "commits", "rollbacks", "aborts", "errors", "retries", "tps", "mean_ms"]
+    + [f"p{p:g}_ms" for p in PERCENTILES]
+    + ["max_ms"]
+    + list(WAL_COUNTERS)
+)
+
+
+def interval_rows(index, phases, interval_secs, stats, server=None):
+    """Uma linha por tipo de transação e uma linha "total" para o intervalo;
+    as colunas de WAL (do servidor inteiro) só são preenchidas na linha "total"."""
+    rows = []
+    end_time = phases.start_time + (index + 1) * interval_secs
+    # A fase do intervalo é a do seu ponto médio.
+    phase = phases.phase(end_time - interval_secs / 2)
+    entries = [(name, counters, stats.latency.get(name)) for name, counters in stats.items()]
+    if entries or server is not None:
+        entries.append(("total", stats.totals(), stats.latency.total()))
+
+    for name, counters, histogram in entries:
+        percentiles = histogram.percentiles_ms()
+        row = {
+            "interval": index,
+            "time": round(end_time, 3),
+            "elapsed_secs": round((index + 1) * interval_secs, 3),
+            "phase": phase,
+            "transaction": name,
+            "commits": counters["success"],
+            "rollbacks": counters["rollback_ok"],
+            "aborts": counters["abort"],
+            "errors": counters["error"],
+            "retries": counters["retries"],
+            "tps": round((counters["success"] + counters["rollback_ok"]) / interval_secs, 2),
+            "mean_ms": round(histogram.mean_ns() / 1e6, 3),
+        }
+        for p in PERCENTILES:
+            row[f"p{p:g}_ms"] = round(percentiles[p], 3)
+        row["max_ms"] = round(histogram.max_ns / 1e6, 3)
+        for counter in WAL_COUNTERS:
+            row[counter] = server[counter] if name == "total" and server is not None else None
+        rows.append(row)
+    return rows
+
+
+class IntervalWriter:
+    """Grava os intervalos em CSV ou JSON lines (com flush a cada intervalo),
+    imprime um resumo de uma linha por intervalo, alimenta o detector de
+    estado estacionário com a vazão total de cada intervalo e a atribuição de
+    WAL com os commits e o WAL de cada intervalo da medição."""
+
+    def __init__(self, path, output_format, phases, interval_secs, detector=None, wal_attribution=None):
+        self.phases = phases
+        self.interval_secs = interval_secs
+        self.detector = detector
+        self.wal_attribution = wal_attribution
+        self.output_format = output_format
+        self._file = open(path, "w", newline="") if path else None
+        self._csv = None
+        if self._file is not None and output_format == "CSV":
+            self._csv = csv.DictWriter(self._file, fieldnames=FIELDS)
+            self._csv.writeheader()
+
+    def emit(self, index, stats, server=None):
+        rows = interval_rows(index, self.phases, self.interval_secs, stats, server)
+        if self._file is not None and rows:
+            if self._csv is not None:
+                self._csv.writerows(rows)
+            else:
+                for row in rows:
+                    self._file.write(json.dumps(row) + "\n")
+            self._file.flush()
+
+        total = rows[-1] if rows else None
+        elapsed = (index + 1) * self.interval_secs
+        if self.detector is not None:
+            self.detector.observe(elapsed, total["tps"] if total else 0.0)
+        if self.wal_attribution is not None and server is not None and total["phase"] == MEASURE:
+            commits = {name: counters["success"] for name, counters in stats.items()}
+            self.wal_attribution.add(commits, server)
+        if total is None:
+            print(f"  [{elapsed:>6.1f}s] sem transações")
+        else:
+            wal = ""
+            if server is not None:
+                wal = f" | WAL: {server['wal_bytes'] / 2**20:.2f} MiB"
+                if server["checkpoints"]:
+                    wal += " | checkpoint"
+            errors = f" | erros: {total['errors']}" if total["errors"] else ""
+            print(f"  [{elapsed:>6.1f}s] {total['phase']:<8} | {total['tps']:>8.1f} tps | commits: {total['commits']:<6} | aborts: {total['aborts']:<4} | repetições: {total['retries']:<4} "
+                  f"| p50: {total['p50_ms']:.2f} ms | p99: {total['p99_ms']:.2f} ms | máx: {total['max_ms']:.2f} ms{errors}{wal}")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+class QueueSink:
+    """Destino dos processos filhos: envia (índice, agregados) ao processo pai."""
+
+    def __init__(self, shared_queue):
+        self.shared_queue = shared_queue
+
+    def emit(self, index, stats, server=None):
+        self.shared_queue.put((index, stats, server))
+
+    def close(self):
+        self.shared_queue.put(None)
+
+
+class IntervalReporter:
+    """Acumula os resultados do intervalo corrente e o fecha a cada interval_secs.
+
+    Os intervalos são contados a partir de start_time (relógio de parede), então
+    processos diferentes com o mesmo start_time produzem índices compatíveis.
+    Com um probe (WalProbe), cada intervalo leva também as diferenças do servidor.
+    """
+
+    def __init__(self, start_time, interval_secs, sink, probe=None):
+        self.start_time = start_time
+        self.interval_secs = interval_secs
+        self.sink = sink
+        self.probe = probe
+        self._lock = threading.Lock()
+        self._current = TransactionStats()
+        self._index = 0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def record(self, result):
+        with self._lock:
+            self._current.add(result)
+
+    def _close_interval(self):
+        with self._lock:
+            finished, self._current = self._current, TransactionStats()
+            index = self._index
+            self._index += 1
+        server = self.probe.delta() if self.probe is not None else None
+        self.sink.emit(index, finished, server)
+
+    def _run(self):
+        while True:
+            next_tick = self.start_time + (self._index + 1) * self.interval_secs
+            if self._stopped.wait(max(0.0, next_tick - time.time())):
+                return
+            self._close_interval()
+
+    def stop(self):
+        """Fecha o intervalo parcial em andamento e encerra a thread."""
+        self._stopped.set()
+        self._thread.join()
+        self._close_interval()
+        self.sink.close()
+
+
+class IntervalCollector:
+    """No processo pai do modo PROCESSES: une os intervalos de sources produtores
+    e grava cada um assim que todos os produtores o entregaram."""
+
+    def __init__(self, shared_queue, sources, writer):
+        self.shared_queue = shared_queue
+        self.sources = sources
+        self.writer = writer
+        self._pending = {}
+        self._finished_sources = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while self._finished_sources < self.sources:
+            try:
+                item = self.shared_queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            if item is None:
+                self._finished_sources += 1
+                continue
+            index, stats, server = item
+            merged, received, merged_server = self._pending.get(index, (TransactionStats(), 0, None))
+            merged.merge(stats)
+            # Só o reporter do processo pai lê o servidor.
+            self._pending[index] = (merged, received + 1, server if server is not None else merged_server)
+            # Intervalos completos saem em ordem; um produtor atrasado segura os seguintes.
+            while self._pending and self._pending[min(self._pending)][1] >= self.sources:
+                ready = min(self._pending)
+                merged, _, merged_server = self._pending.pop(ready)
+                self.writer.emit(ready, merged, merged_server)
+
+        for index in sorted(self._pending):
+            merged, _, merged_server = self._pending[index]
+            self.writer.emit(index, merged, merged_server)
+        self._pending.clear()
+
+    def stop(self):
+        """Espera todos os produtores encerrarem (QueueSink.close) e grava o restante."""
+        self._thread.join()
+        self.writer.close()
+
+
+_installed_reporter = None
+
+
+def install(reporter):
+    global _installed_reporter
+    _installed_reporter = reporter
+
+
+def get():
+    return _installed_reporter
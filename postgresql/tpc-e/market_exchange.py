@@ -0,0 +1,127 @@
+import threading
+from collections import deque
+
+
+class MarketExchange:
+    """Emulador do Market Exchange (MEE) do TPC-E, em memória no processo.
+
+    Recebe as trades submetidas (ordens a mercado do Trade-Order e ordens
+    limitadas disparadas pelo Market-Feed), entrega cada uma a exatamente um
+    Trade-Result e acumula os preços executados como ticks para o próximo
+    Market-Feed. Uma trade entregue volta para a fila se o Trade-Result abortar.
+    """
+
+    def __init__(self, max_pending_ticks=10000):
+        self._lock = threading.Lock()
+        # (trade_id, symbol, trade_qty, bid_price) aguardando um Trade-Result.
+        self._submitted = deque()
+        self._in_flight = {}
+        self._ticks = deque(maxlen=max_pending_ticks)
+
+        self.submitted_count = 0
+        self.settled_count = 0
+        self.requeued_count = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def seed(self, cur):
+        # Única varredura de TRADE: as trades já submetidas antes do início do teste.
+        cur.execute("""
+            SELECT t_id, t_s_symb, t_qty, t_bid_price
+            FROM TRADE
+            WHERE t_st_id = 'SBMT'
+            ORDER BY t_id
+            """)
+        with self._lock:
+            self._submitted.extend(cur.fetchall())
+
+    def split(self, count):
+        """Divide as trades pendentes entre count emuladores, um por processo."""
+        with self._lock:
+            pending = list(self._submitted)
+        exchanges = [MarketExchange(self._ticks.maxlen) for _ in range(count)]
+        for index, trade in enumerate(pending):
+            exchanges[index % count]._submitted.append(trade)
+        return exchanges
+
+    def submit(self, trade_id, symbol, trade_qty, bid_price):
+        with self._lock:
+            self._submitted.append((trade_id, symbol, trade_qty, bid_price))
+            self.submitted_count += 1
+
+    def take_trade(self):
+        """Retira uma trade submetida para um Trade-Result, ou None se não houver."""
+        with self._lock:
+            if not self._submitted:
+                return None
+            trade = self._submitted.popleft()
+            self._in_flight[trade[0]] = trade
+            return trade
+
+    def settle(self, trade_id, trade_price):
+        with self._lock:
+            trade = self._in_flight.pop(trade_id, None)
+            if trade is None:
+                return
+            _, symbol, trade_qty, _ = trade
+            self._ticks.append((symbol, trade_price, trade_qty))
+            self.settled_count += 1
+
+    def requeue(self, trade_id):
+        with self._lock:
+            trade = self._in_flight.pop(trade_id, None)
+            if trade is None:
+                return
+            self._submitted.appendleft(trade)
+            self.requeued_count += 1
+
+    def take_ticks(self, max_feed_len):
+        """Retira até max_feed_len ticks (symbol, price, qty), na ordem de execução."""
+        with self._lock:
+            count = min(max_feed_len, len(self._ticks))
+            return [self._ticks.popleft() for _ in range(count)]
+
+    def transaction_finished(self, transaction, status, transaction_inputs, outcome):
+        """Chamado pelo driver ao fim de cada transação, depois do commit ou rollback."""
+        if transaction == "trade_order":
+            if status == "success" and outcome["submitted"]:
+                self.submit(outcome["trade_id"], outcome["symbol"], outcome["trade_qty"], outcome["bid_price"])
+        elif transaction == "market_feed":
+            if status == "success":
+                for trade_id, symbol, trade_qty, bid_price in outcome:
+                    self.submit(trade_id, symbol, trade_qty, bid_price)
+        elif transaction == "trade_result":
+            trade_id = transaction_inputs["trade_id"]
+            if status == "success":
+                self.settle(trade_id, transaction_inputs["trade_price"])
+            else:
+                self.requeue(trade_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "submitted": self.submitted_count,
+                "settled": self.settled_count,
+                "requeued": self.requeued_count,
+                "pending_trades": len(self._submitted),
+                "pending_ticks": len(self._ticks),
+            }
+
+
+_installed_exchange = None
+
+
+def install(exchange):
+    global _installed_exchange
+    _installed_exchange = exchange
+
+
+def get():
+    return _installed_exchange
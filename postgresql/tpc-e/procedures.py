@@ -0,0 +1,924 @@
+import re
+
+from transactions import RollbackException
+
+
+# Versões server-side das transações: cada execute_* daqui tem a mesma assinatura
+# da equivalente em transactions.py, mas faz uma única chamada a uma função
+# PL/pgSQL, eliminando as idas e voltas entre cliente e banco dentro da transação.
+# As funções são criadas com install(), uma vez antes do benchmark.
+
+# Símbolos e códigos (tipo de trade, status) são CHAR(n) nas tabelas: os parâmetros
+# são bpchar para comparar sem o padding e continuar usando os índices.
+
+FUNCTIONS = [
+    """
+    CREATE OR REPLACE FUNCTION tpce_broker_volume(p_broker_list text[], p_sector_name text)
+    RETURNS TABLE (broker_name text, volume numeric) AS $$
+    BEGIN
+        RETURN QUERY
+            SELECT B.b_name::text, SUM(TR.tr_qty * TR.tr_bid_price)
+            FROM BROKER B
+            JOIN TRADE_REQUEST TR ON B.b_id = TR.tr_b_id
+            JOIN SECURITY S ON TR.tr_s_symb = S.s_symb
+            JOIN COMPANY C ON S.s_co_id = C.co_id
+            JOIN INDUSTRY I ON C.co_in_id = I.in_id
+            JOIN SECTOR SC ON I.in_sc_id = SC.sc_id
+            WHERE B.b_name = ANY(p_broker_list) AND SC.sc_name = p_sector_name
+            GROUP BY B.b_name
+            ORDER BY 2 DESC;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION tpce_customer_position(p_cust_id bigint, p_tax_id text, p_get_history boolean)
+    RETURNS boolean AS $$
+    DECLARE
+        v_cust_id bigint := p_cust_id;
+        v_accounts bigint[];
+        v_account_id bigint;
+    BEGIN
+        IF v_cust_id = 0 THEN
+            SELECT c_id INTO v_cust_id FROM CUSTOMER WHERE c_tax_id = p_tax_id;
+            IF NOT FOUND THEN
+                RETURN false;
+            END IF;
+        END IF;
+
+        PERFORM c_st_id, c_l_name, c_f_name, c_m_name, c_gndr, c_tier, c_dob,
+                c_ad_id, c_ctry_1, c_area_1, c_local_1, c_ext_1, c_ctry_2,
+                c_area_2, c_local_2, c_ext_2, c_ctry_3, c_area_3, c_local_3,
+                c_ext_3, c_email_1, c_email_2
+        FROM CUSTOMER
+        WHERE c_id = v_cust_id;
+
+        SELECT array_agg(A.ca_id) INTO v_accounts
+        FROM (
+            SELECT ca_id, ca_bal, COALESCE(SUM(hs_qty * lt_price), 0.0) AS assets_total
+            FROM CUSTOMER_ACCOUNT
+            LEFT JOIN HOLDING_SUMMARY ON hs_ca_id = ca_id
+            LEFT JOIN LAST_TRADE ON lt_s_symb = hs_s_symb
+            WHERE ca_c_id = v_cust_id
+            GROUP BY ca_id, ca_bal
+            ORDER BY assets_total ASC
+            LIMIT 10
+        ) AS A;
+
+        IF p_get_history AND v_accounts IS NOT NULL THEN
+            v_account_id := v_accounts[1 + floor(random() * array_length(v_accounts, 1))::int];
+
+            PERFORM T1.t_id, T1.t_s_symb, T1.t_qty, ST.st_name, TH.th_dts
+            FROM TRADE_HISTORY AS TH
+            JOIN STATUS_TYPE AS ST ON ST.st_id = TH.th_st_id
+            JOIN TRADE AS T1 ON TH.th_t_id = T1.t_id
+            JOIN (SELECT t_id FROM TRADE WHERE t_ca_id = v_account_id ORDER BY t_dts DESC LIMIT 10) AS T_RECENT
+            ON T1.t_id = T_RECENT.t_id
+            ORDER BY TH.th_dts DESC
+            LIMIT 30;
+        END IF;
+
+        RETURN true;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    # Como em transactions.py: um símbolo repetido na fita fica com o último preço e
+    # a soma dos volumes, e a fita é aplicada em ordem de símbolo (Market-Feeds
+    # concorrentes bloqueiam LAST_TRADE na mesma sequência), com um UPDATE ... FROM
+    # unnest e um DELETE ... RETURNING para a fita inteira.
+    """
+    CREATE OR REPLACE FUNCTION tpce_market_feed(
+        p_symbols bpchar[], p_price_quotes numeric[], p_trade_qtys integer[],
+        p_status_submitted bpchar, p_type_stop_loss bpchar, p_type_limit_sell bpchar, p_type_limit_buy bpchar)
+    RETURNS TABLE (trade_id bigint, symbol bpchar, trade_qty integer, bid_price numeric) AS $$
+    DECLARE
+        v_now timestamp := localtimestamp;
+        v_symbols bpchar[];
+        v_price_quotes numeric[];
+        v_trade_qtys integer[];
+    BEGIN
+        SELECT array_agg(F.f_symbol ORDER BY F.f_symbol), array_agg(F.f_price ORDER BY F.f_symbol),
+               array_agg(F.f_qty ORDER BY F.f_symbol)
+        INTO v_symbols, v_price_quotes, v_trade_qtys
+        FROM (
+            SELECT DISTINCT ON (T.f_symbol) T.f_symbol, T.f_price,
+                   (sum(T.f_qty) OVER (PARTITION BY T.f_symbol))::integer AS f_qty
+            FROM unnest(p_symbols, p_price_quotes, p_trade_qtys) WITH ORDINALITY AS T(f_symbol, f_price, f_qty, f_position)
+            ORDER BY T.f_symbol, T.f_position DESC
+        ) AS F;
+
+        IF v_symbols IS NULL THEN
+            RETURN;
+        END IF;
+
+        PERFORM 1 FROM LAST_TRADE WHERE lt_s_symb = ANY(v_symbols) ORDER BY lt_s_symb FOR UPDATE;
+
+        UPDATE LAST_TRADE LT
+        SET lt_price = F.f_price,
+            lt_vol = LT.lt_vol + F.f_qty,
+            lt_dts = v_now
+        FROM unnest(v_symbols, v_price_quotes, v_trade_qtys) AS F(f_symbol, f_price, f_qty)
+        WHERE LT.lt_s_symb = F.f_symbol;
+
+        RETURN QUERY
+        WITH triggered AS (
+            DELETE FROM TRADE_REQUEST TR
+            USING unnest(v_symbols, v_price_quotes) AS F(f_symbol, f_price)
+            WHERE TR.tr_s_symb = F.f_symbol AND (
+                (TR.tr_tt_id = p_type_stop_loss AND TR.tr_bid_price >= F.f_price) OR
+                (TR.tr_tt_id = p_type_limit_sell AND TR.tr_bid_price <= F.f_price) OR
+                (TR.tr_tt_id = p_type_limit_buy AND TR.tr_bid_price >= F.f_price)
+            )
+            RETURNING TR.tr_t_id, TR.tr_s_symb, TR.tr_qty, TR.tr_bid_price
+        ),
+        submitted AS (
+            UPDATE TRADE T
+            SET t_dts = v_now, t_st_id = p_status_submitted
+            FROM triggered
+            WHERE T.t_id = triggered.tr_t_id
+        ),
+        history AS (
+            INSERT INTO TRADE_HISTORY (th_t_id, th_dts, th_st_id)
+            SELECT triggered.tr_t_id, v_now, p_status_submitted FROM triggered
+        )
+        SELECT triggered.tr_t_id, triggered.tr_s_symb, triggered.tr_qty::integer, triggered.tr_bid_price::numeric
+        FROM triggered
+        ORDER BY triggered.tr_s_symb, triggered.tr_t_id;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION tpce_market_watch(p_cust_id bigint, p_industry_name text, p_acct_id bigint, p_start_date date)
+    RETURNS numeric AS $$
+    DECLARE
+        v_stock_list bpchar[];
+        v_symbol bpchar;
+        v_new_price numeric;
+        v_s_num_out bigint;
+        v_old_price numeric;
+        v_old_mkt_cap numeric := 0;
+        v_new_mkt_cap numeric := 0;
+    BEGIN
+        IF p_cust_id <> 0 THEN
+            SELECT array_agg(WI.wi_s_symb) INTO v_stock_list
+            FROM WATCH_ITEM WI
+            JOIN WATCH_LIST WL ON WI.wi_wl_id = WL.wl_id
+            WHERE WL.wl_c_id = p_cust_id;
+        ELSIF p_industry_name <> '' THEN
+            SELECT array_agg(S.s_symb) INTO v_stock_list
+            FROM INDUSTRY I
+            JOIN COMPANY C ON I.in_id = C.co_in_id
+            JOIN SECURITY S ON C.co_id = S.s_co_id
+            WHERE I.in_name = p_industry_name;
+        ELSIF p_acct_id <> 0 THEN
+            SELECT array_agg(hs_s_symb) INTO v_stock_list FROM HOLDING_SUMMARY WHERE hs_ca_id = p_acct_id;
+        END IF;
+
+        IF v_stock_list IS NULL THEN
+            RETURN 0;
+        END IF;
+
+        FOREACH v_symbol IN ARRAY v_stock_list LOOP
+            SELECT lt_price INTO v_new_price FROM LAST_TRADE WHERE lt_s_symb = v_symbol;
+            SELECT s_num_out INTO v_s_num_out FROM SECURITY WHERE s_symb = v_symbol;
+            SELECT dm_close INTO v_old_price FROM DAILY_MARKET WHERE dm_s_symb = v_symbol AND dm_date = p_start_date;
+
+            IF v_new_price IS NOT NULL AND v_s_num_out IS NOT NULL AND v_old_price IS NOT NULL THEN
+                v_old_mkt_cap := v_old_mkt_cap + v_s_num_out * v_old_price;
+                v_new_mkt_cap := v_new_mkt_cap + v_s_num_out * v_new_price;
+            END IF;
+        END LOOP;
+
+        IF v_old_mkt_cap <> 0 THEN
+            RETURN 100 * (v_new_mkt_cap / v_old_mkt_cap - 1);
+        END IF;
+        RETURN 0;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION tpce_security_detail(p_symbol bpchar, p_access_lob_flag boolean, p_max_rows_to_return integer, p_start_date date)
+    RETURNS boolean AS $$
+    DECLARE
+        v_details record;
+    BEGIN
+        SELECT
+            S.s_name, S.s_co_id, C.co_name, C.co_sp_rate, C.co_ceo, C.co_desc,
+            C.co_open_date, C.co_st_id, CA.ad_line1, CA.ad_line2, ZCA.zc_town,
+            ZCA.zc_div, CA.ad_zc_code, CA.ad_ctry, S.s_num_out, S.s_start_date,
+            S.s_exch_date, S.s_pe, S.s_52wk_high, S.s_52wk_high_date,
+            S.s_52wk_low, S.s_52wk_low_date, S.s_dividend, S.s_yield,
+            ZEA.zc_div, EA.ad_ctry, EA.ad_line1, EA.ad_line2, ZEA.zc_town,
+            EA.ad_zc_code, E.ex_close, E.ex_desc, E.ex_name, E.ex_num_symb, E.ex_open
+        INTO v_details
+        FROM
+            SECURITY S, COMPANY C, ADDRESS CA, ADDRESS EA,
+            ZIP_CODE ZCA, ZIP_CODE ZEA, EXCHANGE E
+        WHERE
+            S.s_symb = p_symbol AND C.co_id = S.s_co_id AND CA.ad_id = C.co_ad_id
+            AND EA.ad_id = E.ex_ad_id AND E.ex_id = S.s_ex_id
+            AND CA.ad_zc_code = ZCA.zc_code AND EA.ad_zc_code = ZEA.zc_code;
+
+        IF NOT FOUND THEN
+            RETURN false;
+        END IF;
+
+        PERFORM C.co_name, I.in_name
+        FROM COMPANY_COMPETITOR CC, COMPANY C, INDUSTRY I
+        WHERE CC.cp_co_id = v_details.s_co_id AND C.co_id = CC.cp_comp_co_id AND I.in_id = CC.cp_in_id
+        LIMIT 3;
+
+        PERFORM fi_year, fi_qtr, fi_qtr_start_date, fi_revenue, fi_net_earn,
+                fi_basic_eps, fi_dilut_eps, fi_margin, fi_inventory, fi_assets,
+                fi_liability, fi_out_basic, fi_out_dilut
+        FROM FINANCIAL
+        WHERE fi_co_id = v_details.s_co_id
+        ORDER BY fi_year ASC, fi_qtr ASC
+        LIMIT 20;
+
+        PERFORM dm_date, dm_close, dm_high, dm_low, dm_vol
+        FROM DAILY_MARKET
+        WHERE dm_s_symb = p_symbol AND dm_date >= p_start_date
+        ORDER BY dm_date ASC
+        LIMIT p_max_rows_to_return;
+
+        PERFORM lt_price, lt_open_price, lt_vol FROM LAST_TRADE WHERE lt_s_symb = p_symbol;
+
+        IF p_access_lob_flag THEN
+            PERFORM NI.ni_item, NI.ni_dts, NI.ni_source, NI.ni_author
+            FROM NEWS_XREF NX, NEWS_ITEM NI
+            WHERE NI.ni_id = NX.nx_ni_id AND NX.nx_co_id = v_details.s_co_id
+            LIMIT 2;
+        ELSE
+            PERFORM NI.ni_dts, NI.ni_source, NI.ni_author, NI.ni_headline, NI.ni_summary
+            FROM NEWS_XREF NX, NEWS_ITEM NI
+            WHERE NI.ni_id = NX.nx_ni_id AND NX.nx_co_id = v_details.s_co_id
+            LIMIT 2;
+        END IF;
+
+        RETURN true;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION tpce_trade_details(p_trade_ids bigint[])
+    RETURNS void AS $$
+    DECLARE
+        v_trade_id bigint;
+        v_is_cash boolean;
+    BEGIN
+        FOREACH v_trade_id IN ARRAY COALESCE(p_trade_ids, '{}') LOOP
+            PERFORM se_amt FROM SETTLEMENT WHERE se_t_id = v_trade_id;
+
+            SELECT t_is_cash INTO v_is_cash FROM TRADE WHERE t_id = v_trade_id;
+            IF v_is_cash THEN
+                PERFORM ct_amt FROM CASH_TRANSACTION WHERE ct_t_id = v_trade_id;
+            END IF;
+
+            PERFORM th_dts FROM TRADE_HISTORY WHERE th_t_id = v_trade_id ORDER BY th_dts LIMIT 3;
+        END LOOP;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION tpce_trade_lookup(
+        p_frame integer, p_trade_ids bigint[], p_acct_id bigint, p_symbol bpchar,
+        p_start_dts timestamp, p_end_dts timestamp, p_max_trades integer)
+    RETURNS boolean AS $$
+    DECLARE
+        v_trade_id bigint;
+        v_trade_ids bigint[];
+    BEGIN
+        IF p_frame = 1 THEN
+            FOREACH v_trade_id IN ARRAY COALESCE(p_trade_ids, '{}') LOOP
+                PERFORM T.t_bid_price, T.t_exec_name, T.t_is_cash, TT.tt_is_mrkt, T.t_trade_price
+                FROM TRADE T, TRADE_TYPE TT
+                WHERE T.t_id = v_trade_id AND T.t_tt_id = TT.tt_id;
+            END LOOP;
+            PERFORM tpce_trade_details(p_trade_ids);
+
+        ELSIF p_frame = 2 THEN
+            SELECT array_agg(t_id) INTO v_trade_ids
+            FROM (
+                SELECT t_id FROM TRADE
+                WHERE t_ca_id = p_acct_id AND t_dts >= p_start_dts AND t_dts <= p_end_dts
+                ORDER BY t_dts ASC LIMIT p_max_trades
+            ) AS T;
+            PERFORM tpce_trade_details(v_trade_ids);
+
+        ELSIF p_frame = 3 THEN
+            SELECT array_agg(t_id) INTO v_trade_ids
+            FROM (
+                SELECT t_id FROM TRADE
+                WHERE t_s_symb = p_symbol AND t_dts >= p_start_dts AND t_dts <= p_end_dts
+                ORDER BY t_dts ASC LIMIT p_max_trades
+            ) AS T;
+            PERFORM tpce_trade_details(v_trade_ids);
+
+        ELSIF p_frame = 4 THEN
+            SELECT t_id INTO v_trade_id FROM TRADE
+            WHERE t_ca_id = p_acct_id AND t_dts >= p_start_dts
+            ORDER BY t_dts ASC LIMIT 1;
+
+            IF FOUND THEN
+                PERFORM hh_h_t_id, hh_t_id, hh_before_qty, hh_after_qty
+                FROM HOLDING_HISTORY
+                WHERE hh_h_t_id IN (
+                    SELECT hh_h_t_id
+                    FROM HOLDING_HISTORY
+                    WHERE hh_t_id = v_trade_id
+                )
+                LIMIT 20;
+            END IF;
+        END IF;
+
+        RETURN true;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION tpce_trade_order(
+        p_acct_id bigint, p_exec_f_name text, p_exec_l_name text, p_exec_tax_id text,
+        p_symbol bpchar, p_co_name text, p_issue bpchar, p_trade_type_id bpchar,
+        p_st_pending_id bpchar, p_st_submitted_id bpchar, p_trade_qty integer,
+        p_is_lifo boolean, p_type_is_margin boolean)
+    RETURNS TABLE (trade_id bigint, symbol bpchar, bid_price numeric, submitted boolean) AS $$
+    DECLARE
+        v_broker_id bigint;
+        v_cust_id bigint;
+        v_tax_status smallint;
+        v_cust_f_name text;
+        v_cust_l_name text;
+        v_cust_tier smallint;
+        v_tax_id text;
+        v_co_id bigint;
+        v_exch_id bpchar;
+        v_symbol bpchar := p_symbol;
+        v_market_price numeric;
+        v_type_is_market boolean;
+        v_type_is_sell boolean;
+        v_requested_price numeric;
+        v_comm_rate numeric;
+        v_charge_amount numeric;
+        v_status_id bpchar;
+        v_now timestamp := localtimestamp;
+        v_trade_id bigint;
+    BEGIN
+        SELECT ca_b_id, ca_c_id, ca_tax_st INTO v_broker_id, v_cust_id, v_tax_status
+        FROM CUSTOMER_ACCOUNT WHERE ca_id = p_acct_id;
+
+        SELECT c_f_name, c_l_name, c_tier, c_tax_id INTO v_cust_f_name, v_cust_l_name, v_cust_tier, v_tax_id
+        FROM CUSTOMER WHERE c_id = v_cust_id;
+
+        IF p_exec_l_name <> v_cust_l_name OR p_exec_f_name <> v_cust_f_name OR p_exec_tax_id <> v_tax_id THEN
+            PERFORM ap_acl FROM ACCOUNT_PERMISSION
+            WHERE ap_ca_id = p_acct_id AND ap_f_name = p_exec_f_name AND ap_l_name = p_exec_l_name AND ap_tax_id = p_exec_tax_id;
+            IF NOT FOUND THEN
+                -- Mensagem em ASCII: o banco pode estar com client_encoding SQL_ASCII.
+                RAISE EXCEPTION 'Executor sem permissao para a conta %', p_acct_id;
+            END IF;
+        END IF;
+
+        IF p_symbol = '' THEN
+            SELECT co_id INTO v_co_id FROM COMPANY WHERE co_name = p_co_name;
+            SELECT s_ex_id, s_symb INTO v_exch_id, v_symbol FROM SECURITY WHERE s_co_id = v_co_id AND s_issue = p_issue;
+        ELSE
+            SELECT s_co_id, s_ex_id INTO v_co_id, v_exch_id FROM SECURITY WHERE s_symb = p_symbol;
+        END IF;
+
+        SELECT lt_price INTO v_market_price FROM LAST_TRADE WHERE lt_s_symb = v_symbol;
+
+        SELECT tt_is_mrkt, tt_is_sell INTO v_type_is_market, v_type_is_sell FROM TRADE_TYPE WHERE tt_id = p_trade_type_id;
+
+        IF v_type_is_market THEN
+            v_requested_price := v_market_price;
+        ELSE
+            v_requested_price := v_market_price * (0.95 + random() * 0.1)::numeric;
+        END IF;
+
+        SELECT cr_rate INTO v_comm_rate FROM COMMISSION_RATE
+        WHERE cr_c_tier = v_cust_tier AND cr_tt_id = p_trade_type_id AND cr_ex_id = v_exch_id
+          AND cr_from_qty <= p_trade_qty AND cr_to_qty >= p_trade_qty;
+        v_comm_rate := COALESCE(v_comm_rate, 0);
+
+        SELECT ch_chrg INTO v_charge_amount FROM CHARGE WHERE ch_c_tier = v_cust_tier AND ch_tt_id = p_trade_type_id;
+
+        v_status_id := CASE WHEN v_type_is_market THEN p_st_submitted_id ELSE p_st_pending_id END;
+
+        INSERT INTO TRADE (t_dts, t_st_id, t_tt_id, t_is_cash, t_s_symb, t_qty, t_bid_price, t_ca_id, t_exec_name, t_chrg, t_comm, t_tax, t_lifo)
+        VALUES (v_now, v_status_id, p_trade_type_id, NOT p_type_is_margin, v_symbol, p_trade_qty, v_requested_price, p_acct_id,
+                p_exec_f_name || ' ' || p_exec_l_name, v_charge_amount, (v_comm_rate / 100) * p_trade_qty * v_requested_price, 0, p_is_lifo)
+        RETURNING t_id INTO v_trade_id;
+
+        IF NOT v_type_is_market THEN
+            INSERT INTO TRADE_REQUEST (tr_t_id, tr_tt_id, tr_s_symb, tr_qty, tr_bid_price, tr_b_id)
+            VALUES (v_trade_id, p_trade_type_id, v_symbol, p_trade_qty, v_requested_price, v_broker_id);
+        END IF;
+
+        INSERT INTO TRADE_HISTORY (th_t_id, th_dts, th_st_id) VALUES (v_trade_id, v_now, v_status_id);
+
+        RETURN QUERY SELECT v_trade_id, v_symbol, v_requested_price, v_type_is_market;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION tpce_trade_result(p_trade_id bigint, p_trade_price numeric)
+    RETURNS boolean AS $$
+    DECLARE
+        v_acct_id bigint;
+        v_type_id bpchar;
+        v_symbol bpchar;
+        v_trade_qty integer;
+        v_charge numeric;
+        v_is_lifo boolean;
+        v_trade_is_cash boolean;
+        v_type_name text;
+        v_type_is_sell boolean;
+        v_hs_qty integer;
+        v_now timestamp := localtimestamp;
+        v_buy_value numeric := 0;
+        v_sell_value numeric := 0;
+        v_broker_id bigint;
+        v_cust_id bigint;
+        v_tax_status smallint;
+        v_tax_rates numeric;
+        v_tax_amount numeric := 0;
+        v_ex_id bpchar;
+        v_s_name text;
+        v_c_tier smallint;
+        v_comm_rate numeric;
+        v_comm_amount numeric;
+        v_se_amount numeric;
+    BEGIN
+        SELECT t_ca_id, t_tt_id, t_s_symb, t_qty, t_chrg, t_lifo, t_is_cash
+        INTO v_acct_id, v_type_id, v_symbol, v_trade_qty, v_charge, v_is_lifo, v_trade_is_cash
+        FROM TRADE WHERE t_id = p_trade_id;
+        IF NOT FOUND THEN
+            RETURN false;
+        END IF;
+
+        SELECT tt_name, tt_is_sell INTO v_type_name, v_type_is_sell FROM TRADE_TYPE WHERE tt_id = v_type_id;
+
+        SELECT hs_qty INTO v_hs_qty FROM HOLDING_SUMMARY WHERE hs_ca_id = v_acct_id AND hs_s_symb = v_symbol;
+        v_hs_qty := COALESCE(v_hs_qty, 0);
+
+        SELECT ca_b_id, ca_c_id, ca_tax_st INTO v_broker_id, v_cust_id, v_tax_status
+        FROM CUSTOMER_ACCOUNT WHERE ca_id = v_acct_id;
+
+        IF v_type_is_sell THEN
+            IF v_hs_qty > 0 THEN
+                PERFORM h_t_id, h_qty, h_price FROM HOLDING
+                WHERE h_ca_id = v_acct_id AND h_s_symb = v_symbol
+                ORDER BY CASE WHEN v_is_lifo THEN h_dts END DESC, CASE WHEN NOT v_is_lifo THEN h_dts END ASC;
+            END IF;
+
+            UPDATE HOLDING_SUMMARY SET hs_qty = hs_qty - v_trade_qty WHERE hs_ca_id = v_acct_id AND hs_s_symb = v_symbol;
+        ELSE
+            IF v_hs_qty < 0 THEN
+                PERFORM h_t_id, h_qty, h_price FROM HOLDING
+                WHERE h_ca_id = v_acct_id AND h_s_symb = v_symbol
+                ORDER BY CASE WHEN v_is_lifo THEN h_dts END DESC, CASE WHEN NOT v_is_lifo THEN h_dts END ASC;
+            END IF;
+
+            UPDATE HOLDING_SUMMARY SET hs_qty = hs_qty + v_trade_qty WHERE hs_ca_id = v_acct_id AND hs_s_symb = v_symbol;
+            INSERT INTO HOLDING (h_t_id, h_ca_id, h_s_symb, h_dts, h_price, h_qty)
+            VALUES (p_trade_id, v_acct_id, v_symbol, v_now, p_trade_price, v_trade_qty);
+        END IF;
+
+        IF v_sell_value > v_buy_value AND v_tax_status IN (1, 2) THEN
+            SELECT sum(tx_rate) INTO v_tax_rates FROM TAXRATE
+            WHERE tx_id IN (SELECT cx_tx_id FROM CUSTOMER_TAXRATE WHERE cx_c_id = v_cust_id);
+            IF v_tax_rates IS NOT NULL AND v_tax_rates <> 0 THEN
+                v_tax_amount := (v_sell_value - v_buy_value) * v_tax_rates;
+                UPDATE TRADE SET t_tax = v_tax_amount WHERE t_id = p_trade_id;
+            END IF;
+        END IF;
+
+        SELECT s_ex_id, s_name INTO v_ex_id, v_s_name FROM SECURITY WHERE s_symb = v_symbol;
+        SELECT c_tier INTO v_c_tier FROM CUSTOMER WHERE c_id = v_cust_id;
+
+        SELECT cr_rate INTO v_comm_rate FROM COMMISSION_RATE
+        WHERE cr_c_tier = v_c_tier AND cr_tt_id = v_type_id AND cr_ex_id = v_ex_id
+          AND cr_from_qty <= v_trade_qty AND cr_to_qty >= v_trade_qty;
+        v_comm_rate := COALESCE(v_comm_rate, 0);
+
+        v_comm_amount := (v_comm_rate / 100) * v_trade_qty * p_trade_price;
+
+        UPDATE TRADE SET t_comm = v_comm_amount, t_dts = v_now, t_st_id = 'CMPT', t_trade_price = p_trade_price
+        WHERE t_id = p_trade_id;
+
+        INSERT INTO TRADE_HISTORY (th_t_id, th_dts, th_st_id) VALUES (p_trade_id, v_now, 'CMPT');
+
+        UPDATE BROKER SET b_comm_total = b_comm_total + v_comm_amount, b_num_trades = b_num_trades + 1
+        WHERE b_id = v_broker_id;
+
+        IF v_type_is_sell THEN
+            v_se_amount := (v_trade_qty * p_trade_price) - v_charge - v_comm_amount;
+        ELSE
+            v_se_amount := -((v_trade_qty * p_trade_price) + v_charge + v_comm_amount);
+        END IF;
+        IF v_tax_status = 1 THEN
+            v_se_amount := v_se_amount - v_tax_amount;
+        END IF;
+
+        INSERT INTO SETTLEMENT (se_t_id, se_cash_type, se_cash_due_date, se_amt)
+        VALUES (p_trade_id, CASE WHEN v_trade_is_cash THEN 'Cash Account' ELSE 'Margin' END, v_now::date + 2, v_se_amount);
+
+        IF v_trade_is_cash THEN
+            UPDATE CUSTOMER_ACCOUNT SET ca_bal = ca_bal + v_se_amount WHERE ca_id = v_acct_id;
+            INSERT INTO CASH_TRANSACTION (ct_dts, ct_t_id, ct_amt, ct_name)
+            VALUES (v_now, p_trade_id, v_se_amount, v_type_name || ' ' || v_trade_qty || ' shares of ' || v_s_name);
+        END IF;
+
+        RETURN true;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION tpce_trade_status(p_acct_id bigint)
+    RETURNS boolean AS $$
+    BEGIN
+        PERFORM
+            T.t_id, T.t_dts, ST.st_name, TT.tt_name, T.t_s_symb, T.t_qty,
+            T.t_exec_name, T.t_chrg, S.s_name, E.ex_name
+        FROM
+            TRADE AS T,
+            STATUS_TYPE AS ST,
+            TRADE_TYPE AS TT,
+            SECURITY AS S,
+            EXCHANGE AS E
+        WHERE
+            T.t_ca_id = p_acct_id AND
+            ST.st_id = T.t_st_id AND
+            TT.tt_id = T.t_tt_id AND
+            S.s_symb = T.t_s_symb AND
+            E.ex_id = S.s_ex_id
+        ORDER BY
+            T.t_dts DESC
+        LIMIT 50;
+
+        PERFORM C.c_l_name, C.c_f_name, B.b_name
+        FROM
+            CUSTOMER_ACCOUNT AS CA,
+            CUSTOMER AS C,
+            BROKER AS B
+        WHERE
+            CA.ca_id = p_acct_id AND
+            C.c_id = CA.ca_c_id AND
+            B.b_id = CA.ca_b_id;
+
+        RETURN true;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION tpce_trade_update(
+        p_frame integer, p_trade_ids bigint[], p_acct_id bigint, p_symbol bpchar,
+        p_start_dts timestamp, p_end_dts timestamp, p_max_trades integer, p_max_updates integer)
+    RETURNS integer AS $$
+    DECLARE
+        v_num_updated integer := 0;
+        v_row_count integer;
+        v_trade_id bigint;
+        v_trade_ids bigint[] := '{}';
+        v_trade record;
+        v_exec_name text;
+        v_cash_type text;
+        v_ct_name text;
+    BEGIN
+        IF p_frame = 1 THEN
+            FOREACH v_trade_id IN ARRAY COALESCE(p_trade_ids, '{}') LOOP
+                IF v_num_updated < p_max_updates THEN
+                    SELECT t_exec_name INTO v_exec_name FROM TRADE WHERE t_id = v_trade_id;
+                    IF FOUND THEN
+                        IF strpos(v_exec_name, ' X ') > 0 THEN
+                            v_exec_name := replace(v_exec_name, ' X ', ' ');
+                        ELSE
+                            v_exec_name := replace(v_exec_name, ' ', ' X ');
+                        END IF;
+
+                        UPDATE TRADE SET t_exec_name = v_exec_name WHERE t_id = v_trade_id;
+                        GET DIAGNOSTICS v_row_count = ROW_COUNT;
+                        v_num_updated := v_num_updated + v_row_count;
+                    END IF;
+                END IF;
+            END LOOP;
+            PERFORM tpce_trade_details(p_trade_ids);
+
+        ELSIF p_frame = 2 THEN
+            FOR v_trade IN
+                SELECT t_id, t_is_cash FROM TRADE
+                WHERE t_ca_id = p_acct_id AND t_dts >= p_start_dts AND t_dts <= p_end_dts
+                ORDER BY t_dts ASC LIMIT p_max_trades
+            LOOP
+                v_trade_ids := v_trade_ids || v_trade.t_id;
+                IF v_num_updated < p_max_updates THEN
+                    SELECT se_cash_type INTO v_cash_type FROM SETTLEMENT WHERE se_t_id = v_trade.t_id;
+                    IF FOUND THEN
+                        IF v_trade.t_is_cash THEN
+                            v_cash_type := CASE WHEN v_cash_type = 'Cash Account' THEN 'Cash' ELSE 'Cash Account' END;
+                        ELSE
+                            v_cash_type := CASE WHEN v_cash_type = 'Margin Account' THEN 'Margin' ELSE 'Margin Account' END;
+                        END IF;
+
+                        UPDATE SETTLEMENT SET se_cash_type = v_cash_type WHERE se_t_id = v_trade.t_id;
+                        GET DIAGNOSTICS v_row_count = ROW_COUNT;
+                        v_num_updated := v_num_updated + v_row_count;
+                    END IF;
+                END IF;
+            END LOOP;
+            PERFORM tpce_trade_details(v_trade_ids);
+
+        ELSIF p_frame = 3 THEN
+            FOR v_trade IN
+                SELECT t.t_id, t.t_is_cash, t.t_qty, tt.tt_name, s.s_name
+                FROM TRADE t, TRADE_TYPE tt, SECURITY s
+                WHERE t.t_s_symb = p_symbol AND t.t_dts >= p_start_dts AND t.t_dts <= p_end_dts
+                AND t.t_tt_id = tt.tt_id AND t.t_s_symb = s.s_symb
+                ORDER BY t.t_dts ASC LIMIT p_max_trades
+            LOOP
+                v_trade_ids := v_trade_ids || v_trade.t_id;
+                IF v_trade.t_is_cash AND v_num_updated < p_max_updates THEN
+                    SELECT ct_name INTO v_ct_name FROM CASH_TRANSACTION WHERE ct_t_id = v_trade.t_id;
+                    IF FOUND THEN
+                        IF strpos(v_ct_name, ' shares of ') > 0 THEN
+                            v_ct_name := v_trade.tt_name || ' ' || v_trade.t_qty || ' Shares of ' || v_trade.s_name;
+                        ELSE
+                            v_ct_name := v_trade.tt_name || ' ' || v_trade.t_qty || ' shares of ' || v_trade.s_name;
+                        END IF;
+
+                        UPDATE CASH_TRANSACTION SET ct_name = v_ct_name WHERE ct_t_id = v_trade.t_id;
+                        GET DIAGNOSTICS v_row_count = ROW_COUNT;
+                        v_num_updated := v_num_updated + v_row_count;
+                    END IF;
+                END IF;
+            END LOOP;
+            PERFORM tpce_trade_details(v_trade_ids);
+        END IF;
+
+        RETURN v_num_updated;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION tpce_data_maintenance(
+        p_table_name text, p_acct_id bigint, p_c_id bigint, p_co_id bigint, p_symbol bpchar,
+        p_tx_id text, p_day_of_month integer, p_vol_incr integer)
+    RETURNS boolean AS $$
+    DECLARE
+        v_acl text;
+        v_ad_id bigint;
+        v_line2 text;
+        v_sp_rate text;
+        v_f_name text;
+        v_l_name text;
+        v_email_2 text;
+        v_tx_id text;
+        v_last integer;
+        v_count integer;
+        v_tx_name text;
+        v_wl_id bigint;
+        v_old_symbol bpchar;
+        v_new_symbol bpchar;
+    BEGIN
+        IF p_table_name = 'ACCOUNT_PERMISSION' THEN
+            SELECT ap_acl INTO v_acl FROM ACCOUNT_PERMISSION WHERE ap_ca_id = p_acct_id ORDER BY ap_acl DESC LIMIT 1;
+            IF FOUND THEN
+                UPDATE ACCOUNT_PERMISSION SET ap_acl = CASE WHEN v_acl = '1111' THEN '0011' ELSE '1111' END
+                WHERE ap_ca_id = p_acct_id AND ap_acl = v_acl;
+            END IF;
+
+        ELSIF p_table_name = 'ADDRESS' THEN
+            IF p_c_id <> 0 THEN
+                SELECT ad_id, ad_line2 INTO v_ad_id, v_line2 FROM ADDRESS, CUSTOMER WHERE ad_id = c_ad_id AND c_id = p_c_id;
+            ELSE
+                SELECT ad_id, ad_line2 INTO v_ad_id, v_line2 FROM ADDRESS, COMPANY WHERE ad_id = co_ad_id AND co_id = p_co_id;
+            END IF;
+            IF FOUND THEN
+                UPDATE ADDRESS SET ad_line2 = CASE WHEN v_line2 = 'Apt. 10C' THEN 'Apt. 22' ELSE 'Apt. 10C' END
+                WHERE ad_id = v_ad_id;
+            END IF;
+
+        ELSIF p_table_name = 'COMPANY' THEN
+            SELECT rtrim(co_sp_rate) INTO v_sp_rate FROM COMPANY WHERE co_id = p_co_id;
+            IF FOUND THEN
+                UPDATE COMPANY SET co_sp_rate = CASE WHEN v_sp_rate = 'ABA' THEN 'AAA' ELSE 'ABA' END
+                WHERE co_id = p_co_id;
+            END IF;
+
+        ELSIF p_table_name = 'CUSTOMER' THEN
+            SELECT c_f_name, c_l_name, c_email_2 INTO v_f_name, v_l_name, v_email_2 FROM CUSTOMER WHERE c_id = p_c_id;
+            IF FOUND THEN
+                UPDATE CUSTOMER
+                SET c_email_2 = left(v_f_name, 1) || v_l_name ||
+                    CASE WHEN strpos(COALESCE(v_email_2, ''), '@mindspring.com') > 0 THEN '@earthlink.com' ELSE '@mindspring.com' END
+                WHERE c_id = p_c_id;
+            END IF;
+
+        ELSIF p_table_name = 'CUSTOMER_TAXRATE' THEN
+            SELECT cx_tx_id INTO v_tx_id FROM CUSTOMER_TAXRATE
+            WHERE cx_c_id = p_c_id AND (cx_tx_id LIKE 'US%' OR cx_tx_id LIKE 'CN%')
+            ORDER BY cx_tx_id LIMIT 1;
+            IF FOUND THEN
+                v_last := CASE WHEN left(v_tx_id, 2) = 'US' THEN 5 ELSE 4 END;
+                UPDATE CUSTOMER_TAXRATE
+                SET cx_tx_id = left(v_tx_id, 2) || (substr(v_tx_id, 3)::integer % v_last + 1)
+                WHERE cx_c_id = p_c_id AND cx_tx_id = v_tx_id;
+            END IF;
+
+        ELSIF p_table_name = 'DAILY_MARKET' THEN
+            UPDATE DAILY_MARKET SET dm_vol = dm_vol + p_vol_incr
+            WHERE dm_s_symb = p_symbol AND EXTRACT(DAY FROM dm_date) = p_day_of_month;
+
+        ELSIF p_table_name = 'EXCHANGE' THEN
+            UPDATE EXCHANGE
+            SET ex_desc = regexp_replace(ex_desc, ' LAST UPDATED .*$', '') || ' LAST UPDATED ' || to_char(localtimestamp, 'YYYY-MM-DD HH24:MI:SS');
+
+        ELSIF p_table_name = 'FINANCIAL' THEN
+            SELECT count(*) INTO v_count FROM FINANCIAL
+            WHERE fi_co_id = p_co_id AND EXTRACT(DAY FROM fi_qtr_start_date) = 1;
+            UPDATE FINANCIAL
+            SET fi_qtr_start_date = fi_qtr_start_date + CASE WHEN v_count > 0 THEN 1 ELSE -1 END
+            WHERE fi_co_id = p_co_id;
+
+        ELSIF p_table_name = 'NEWS_ITEM' THEN
+            UPDATE NEWS_ITEM SET ni_dts = ni_dts + INTERVAL '1 day'
+            WHERE ni_id IN (SELECT nx_ni_id FROM NEWS_XREF WHERE nx_co_id = p_co_id);
+
+        ELSIF p_table_name = 'SECURITY' THEN
+            UPDATE SECURITY SET s_exch_date = s_exch_date + INTERVAL '1 day' WHERE s_symb = p_symbol;
+
+        ELSIF p_table_name = 'TAXRATE' THEN
+            SELECT tx_name INTO v_tx_name FROM TAXRATE WHERE tx_id = p_tx_id;
+            IF FOUND THEN
+                UPDATE TAXRATE
+                SET tx_name = CASE WHEN strpos(v_tx_name, ' Tax ') > 0
+                                   THEN replace(v_tx_name, ' Tax ', ' tax ')
+                                   ELSE replace(v_tx_name, ' tax ', ' Tax ') END
+                WHERE tx_id = p_tx_id;
+            END IF;
+
+        ELSIF p_table_name = 'WATCH_ITEM' THEN
+            SELECT wi_wl_id, wi_s_symb INTO v_wl_id, v_old_symbol
+            FROM WATCH_ITEM JOIN WATCH_LIST ON wi_wl_id = wl_id
+            WHERE wl_c_id = p_c_id
+            ORDER BY wi_s_symb
+            OFFSET (SELECT GREATEST((count(*) + 1) / 2 - 1, 0) FROM WATCH_ITEM JOIN WATCH_LIST ON wi_wl_id = wl_id WHERE wl_c_id = p_c_id)
+            LIMIT 1;
+            IF FOUND THEN
+                SELECT s_symb INTO v_new_symbol FROM SECURITY
+                WHERE s_symb > v_old_symbol
+                  AND s_symb NOT IN (SELECT wi_s_symb FROM WATCH_ITEM WHERE wi_wl_id = v_wl_id)
+                ORDER BY s_symb LIMIT 1;
+                IF FOUND THEN
+                    UPDATE WATCH_ITEM SET wi_s_symb = v_new_symbol WHERE wi_wl_id = v_wl_id AND wi_s_symb = v_old_symbol;
+                END IF;
+            END IF;
+
+        ELSE
+            RAISE EXCEPTION 'Tabela de Data-Maintenance desconhecida: %', p_table_name;
+        END IF;
+
+        RETURN true;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+]
+
+
+FUNCTION_NAMES = [re.search(r"CREATE OR REPLACE FUNCTION (\w+)\(", ddl).group(1) for ddl in FUNCTIONS]
+
+
+def install(conn):
+    with conn.cursor() as cur:
+        # Remove as versões instaladas antes: CREATE OR REPLACE não aceita mudança
+        # de assinatura ou de tipo de retorno. Só as funções deste módulo, no schema
+        # em que o CREATE FUNCTION as cria.
+        cur.execute("""
+            SELECT oid::regprocedure::text FROM pg_proc
+            WHERE proname = ANY(%s) AND pronamespace = current_schema()::regnamespace
+            """, (FUNCTION_NAMES,))
+        for (signature,) in cur.fetchall():
+            cur.execute(f"DROP FUNCTION IF EXISTS {signature}")
+        for ddl in FUNCTIONS:
+            cur.execute(ddl)
+    conn.commit()
+
+
+def execute_broker_volume(conn, broker_list, sector_name):
+    with conn.cursor() as cur:
+        cur.execute("SELECT broker_name, volume FROM tpce_broker_volume(%s::text[], %s)",
+                    (list(broker_list), sector_name))
+        results = cur.fetchall()
+    return results
+
+
+def execute_customer_position(conn, cust_id, tax_id, get_history):
+    with conn.cursor() as cur:
+        cur.execute("SELECT tpce_customer_position(%s, %s, %s)", (cust_id, tax_id, get_history))
+        return cur.fetchone()[0]
+
+
+def execute_market_feed(conn, ticker_tape, status_submitted, type_stop_loss, type_limit_sell, type_limit_buy):
+    # A função agrupa a fita por símbolo e a aplica em ordem de símbolo.
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT trade_id, symbol, trade_qty, bid_price
+            FROM tpce_market_feed(%s::bpchar[], %s::numeric[], %s::integer[], %s, %s, %s, %s)
+            """, (
+                [update["symbol"] for update in ticker_tape],
+                [update["price_quote"] for update in ticker_tape],
+                [update["trade_qty"] for update in ticker_tape],
+                status_submitted, type_stop_loss, type_limit_sell, type_limit_buy
+            ))
+        return cur.fetchall()
+
+
+def execute_market_watch(conn, cust_id, industry_name, acct_id, start_date):
+    with conn.cursor() as cur:
+        cur.execute("SELECT tpce_market_watch(%s, %s, %s, %s)", (cust_id, industry_name, acct_id, start_date))
+        cur.fetchone()
+    return True
+
+
+def execute_security_detail(conn, symbol, access_lob_flag, max_rows_to_return, start_date):
+    with conn.cursor() as cur:
+        cur.execute("SELECT tpce_security_detail(%s, %s, %s, %s)",
+                    (symbol, access_lob_flag, max_rows_to_return, start_date))
+        return cur.fetchone()[0]
+
+
+def execute_trade_lookup(conn, frame_to_execute, **kwargs):
+    with conn.cursor() as cur:
+        cur.execute("SELECT tpce_trade_lookup(%s, %s::bigint[], %s, %s, %s, %s, %s)", (
+            frame_to_execute,
+            kwargs.get("trade_id_list", []),
+            kwargs.get("acct_id"),
+            kwargs.get("symbol"),
+            kwargs.get("start_trade_dts"),
+            kwargs.get("end_trade_dts"),
+            kwargs.get("max_trades"),
+        ))
+        cur.fetchone()
+    return True
+
+
+def execute_trade_order(conn, acct_id, exec_f_name, exec_l_name, exec_tax_id,
+                        symbol, co_name, issue, trade_type_id, st_pending_id,
+                        st_submitted_id, trade_qty, is_lifo, type_is_margin, roll_it_back):
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT trade_id, symbol, bid_price, submitted
+            FROM tpce_trade_order(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, (
+            acct_id, exec_f_name, exec_l_name, exec_tax_id,
+            symbol, co_name, issue, trade_type_id, st_pending_id,
+            st_submitted_id, trade_qty, is_lifo, type_is_margin
+        ))
+        trade_id, symbol, bid_price, submitted = cur.fetchone()
+
+    # A função não controla a transação: o rollback intencional continua no cliente.
+    if roll_it_back:
+        raise RollbackException("Rollback intencional da transação.")
+
+    return {
+        "trade_id": trade_id,
+        "symbol": symbol,
+        "trade_qty": trade_qty,
+        "bid_price": bid_price,
+        "submitted": submitted,
+    }
+
+
+def execute_trade_result(conn, trade_id, trade_price):
+    with conn.cursor() as cur:
+        cur.execute("SELECT tpce_trade_result(%s, %s)", (trade_id, trade_price))
+        return cur.fetchone()[0]
+
+
+def execute_trade_status(conn, acct_id):
+    with conn.cursor() as cur:
+        cur.execute("SELECT tpce_trade_status(%s)", (acct_id,))
+        cur.fetchone()
+    return True
+
+
+def execute_trade_update(conn, frame_to_execute, **kwargs):
+    with conn.cursor() as cur:
+        cur.execute("SELECT tpce_trade_update(%s, %s::bigint[], %s, %s, %s, %s, %s, %s)", (
+            frame_to_execute,
+            kwargs.get("trade_id_list", []),
+            kwargs.get("acct_id"),
+            kwargs.get("symbol"),
+            kwargs.get("start_trade_dts"),
+            kwargs.get("end_trade_dts"),
+            kwargs.get("max_trades"),
+            kwargs.get("max_updates", 20),
+        ))
+        return cur.fetchone()[0]
+
+
+def execute_data_maintenance(conn, table_name, acct_id, c_id, co_id, symbol, tx_id, day_of_month, vol_incr):
+    with conn.cursor() as cur:
+        cur.execute("SELECT tpce_data_maintenance(%s, %s, %s, %s, %s, %s, %s, %s)",
+                    (table_name, acct_id, c_id, co_id, symbol, tx_id, day_of_month, vol_incr))
+        return cur.fetchone()[0]
@@ -0,0 +1,95 @@
+import bisect
+
+
+def _key(value):
+    # Colunas CHAR(n) voltam com padding; normaliza para que 'NYSE  ' e 'NYSE' coincidam.
+    return value.rstrip() if isinstance(value, str) else value
+
+
+class ReferenceCache:
+    """Tabelas de referência que não mudam durante a execução, lidas uma vez por processo.
+
+    Cobre TRADE_TYPE, STATUS_TYPE, CHARGE, COMMISSION_RATE, EXCHANGE e TAXRATE.
+    O cache é somente leitura depois de load(), então pode ser compartilhado
+    entre threads sem lock.
+    """
+
+    def load(self, cur):
+        cur.execute("SELECT tt_id, tt_name, tt_is_sell, tt_is_mrkt FROM TRADE_TYPE")
+        self.trade_types = {
+            _key(tt_id): (tt_name, tt_is_sell, tt_is_mrkt)
+            for tt_id, tt_name, tt_is_sell, tt_is_mrkt in cur.fetchall()
+        }
+        self.trade_type_ids = list(self.trade_types)
+
+        cur.execute("SELECT st_id, st_name FROM STATUS_TYPE")
+        self.status_types = {_key(st_id): st_name for st_id, st_name in cur.fetchall()}
+
+        cur.execute("SELECT ch_c_tier, ch_tt_id, ch_chrg FROM CHARGE")
+        self.charges = {
+            (c_tier, _key(tt_id)): charge
+            for c_tier, tt_id, charge in cur.fetchall()
+        }
+
+        cur.execute("SELECT ex_id, ex_name FROM EXCHANGE")
+        self.exchange_names = {_key(ex_id): ex_name for ex_id, ex_name in cur.fetchall()}
+
+        cur.execute("SELECT tx_id, tx_rate FROM TAXRATE")
+        self.tax_rates = {_key(tx_id): tx_rate for tx_id, tx_rate in cur.fetchall()}
+
+        # Índice por faixa: para cada (tier, tipo, bolsa), as faixas [from_qty, to_qty]
+        # ordenadas por from_qty, consultadas com busca binária.
+        cur.execute("""
+            SELECT cr_c_tier, cr_tt_id, cr_ex_id, cr_from_qty, cr_to_qty, cr_rate
+            FROM COMMISSION_RATE
+            ORDER BY cr_c_tier, cr_tt_id, cr_ex_id, cr_from_qty
+            """)
+        self.commission_rates = {}
+        for c_tier, tt_id, ex_id, from_qty, to_qty, rate in cur.fetchall():
+            from_qtys, brackets = self.commission_rates.setdefault((c_tier, _key(tt_id), _key(ex_id)), ([], []))
+            from_qtys.append(from_qty)
+            brackets.append((to_qty, rate))
+
+    def trade_type(self, tt_id):
+        """Retorna (tt_name, tt_is_sell, tt_is_mrkt)."""
+        return self.trade_types[_key(tt_id)]
+
+    def status_id(self, st_id):
+        st_id = _key(st_id)
+        return st_id if st_id in self.status_types else None
+
+    def status_name(self, st_id):
+        return self.status_types[_key(st_id)]
+
+    def charge(self, c_tier, tt_id):
+        return self.charges[(c_tier, _key(tt_id))]
+
+    def exchange_name(self, ex_id):
+        return self.exchange_names[_key(ex_id)]
+
+    def tax_rate_sum(self, tx_ids):
+        rates = [self.tax_rates[_key(tx_id)] for tx_id in tx_ids]
+        return sum(rates) if rates else None
+
+    def commission_rate(self, c_tier, tt_id, ex_id, qty):
+        entry = self.commission_rates.get((c_tier, _key(tt_id), _key(ex_id)))
+        if entry is None:
+            return None
+        from_qtys, brackets = entry
+        index = bisect.bisect_right(from_qtys, qty) - 1
+        if index < 0:
+            return None
+        to_qty, rate = brackets[index]
+        return rate if qty <= to_qty else None
+
+
+_installed_cache = None
+
+
+def install(cache):
+    global _installed_cache
+    _installed_cache = cache
+
+
+def get():
+    return _installed_cache
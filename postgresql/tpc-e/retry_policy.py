@@ -0,0 +1,63 @@
+import random
+
+from psycopg2 import errorcodes
+
+
+# SQLSTATEs que uma aplicação real repetiria: no SERIALIZABLE a maioria dos
+# aborts é falha de serialização (40001) ou deadlock (40P01), e a transação
+# repetida do início normalmente passa.
+SERIALIZATION_FAILURE = errorcodes.SERIALIZATION_FAILURE
+DEADLOCK_DETECTED = errorcodes.DEADLOCK_DETECTED
+RETRYABLE_SQLSTATES = (SERIALIZATION_FAILURE, DEADLOCK_DETECTED)
+
+# Erros sem SQLSTATE (conexão perdida, erro do próprio driver).
+UNKNOWN_SQLSTATE = "?????"
+
+
+def sqlstate_of(error):
+    return getattr(error, "pgcode", None) or UNKNOWN_SQLSTATE
+
+
+def sqlstate_label(sqlstate):
+    """Nome do SQLSTATE em minúsculas (ex.: 40P01 -> deadlock_detected)."""
+    if sqlstate == UNKNOWN_SQLSTATE:
+        return "sem_sqlstate"
+    try:
+        return errorcodes.lookup(sqlstate).lower()
+    except KeyError:
+        return sqlstate
+
+
+def sqlstate_class_label(sqlstate):
+    """Classe do SQLSTATE: os dois primeiros caracteres (ex.: 40 -> transaction_rollback)."""
+    if sqlstate == UNKNOWN_SQLSTATE:
+        return "sem_sqlstate"
+    code = sqlstate[:2]
+    try:
+        return errorcodes.lookup(code).replace("CLASS_", "").lower()
+    except KeyError:
+        return code
+
+
+class RetryPolicy:
+    """Quantas vezes repetir uma transação abortada e quanto esperar entre as tentativas.
+
+    A espera segue um backoff exponencial com jitter completo: antes da tentativa
+    n+1 espera-se um tempo uniforme entre 0 e min(max_backoff_ms, base_backoff_ms * 2**(n-1)),
+    o que espalha as repetições de terminais que conflitaram entre si.
+    """
+
+    def __init__(self, max_attempts, base_backoff_ms, max_backoff_ms, retryable_sqlstates=RETRYABLE_SQLSTATES):
+        if max_attempts < 1:
+            raise ValueError("max_attempts deve ser pelo menos 1.")
+        self.max_attempts = max_attempts
+        self.base_backoff_ms = base_backoff_ms
+        self.max_backoff_ms = max_backoff_ms
+        self.retryable_sqlstates = frozenset(retryable_sqlstates)
+
+    def should_retry(self, sqlstate, attempt):
+        return attempt < self.max_attempts and sqlstate in self.retryable_sqlstates
+
+    def backoff_secs(self, attempt):
+        ceiling_ms = min(self.max_backoff_ms, self.base_backoff_ms * 2 ** (attempt - 1))
+        return random.uniform(0, ceiling_ms) / 1000
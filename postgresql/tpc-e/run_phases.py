@@ -0,0 +1,61 @@
+import math
+from collections import deque
+
+
+WARMUP = "warmup"
+MEASURE = "measure"
+COOLDOWN = "cooldown"
+
+
+class RunPhases:
+    """Aquecimento, medição e resfriamento de uma execução, em relógio de parede.
+
+    Os terminais rodam de start_time até end_time; só as transações concluídas
+    dentro de [measure_start, measure_end) entram nos resultados finais.
+    """
+
+    def __init__(self, start_time, warmup_secs, measure_secs, cooldown_secs):
+        self.start_time = start_time
+        self.warmup_secs = warmup_secs
+        self.measure_secs = measure_secs
+        self.cooldown_secs = cooldown_secs
+        self.measure_start = start_time + warmup_secs
+        self.measure_end = self.measure_start + measure_secs
+        self.end_time = self.measure_end + cooldown_secs
+
+    def phase(self, timestamp):
+        if timestamp < self.measure_start:
+            return WARMUP
+        if timestamp < self.measure_end:
+            return MEASURE
+        return COOLDOWN
+
+
+class SteadyStateDetector:
+    """Detecta o estado estacionário pela variação da vazão em uma janela deslizante.
+
+    O estado estacionário é atingido no primeiro intervalo em que o coeficiente
+    de variação (desvio padrão / média) da vazão dos últimos window intervalos
+    fica abaixo de max_cv.
+    """
+
+    def __init__(self, window, max_cv):
+        self.window = window
+        self.max_cv = max_cv
+        self._tps = deque(maxlen=window)
+        self.reached_at_secs = None
+        self.reached_cv = None
+        self.last_cv = None
+
+    def observe(self, elapsed_secs, tps):
+        self._tps.append(tps)
+        if len(self._tps) < self.window:
+            return
+        mean = sum(self._tps) / len(self._tps)
+        if mean == 0:
+            return
+        variance = sum((value - mean) ** 2 for value in self._tps) / len(self._tps)
+        self.last_cv = math.sqrt(variance) / mean
+        if self.reached_at_secs is None and self.last_cv <= self.max_cv:
+            self.reached_at_secs = elapsed_secs
+            self.reached_cv = self.last_cv
@@ -0,0 +1,165 @@
+import re
+import threading
+import time
+
+from psycopg2 import extensions, sql
+
+
+_PLACEHOLDER = re.compile(r"%s|%%")
+
+
+def is_preparable(vars):
+    # Tuplas viram listas "(a, b, c)" na interpolação do psycopg2 (usadas com IN %s)
+    # e não têm equivalente como parâmetro de um statement preparado.
+    if not isinstance(vars, (list, tuple)):
+        return False
+    return not any(isinstance(value, tuple) for value in vars)
+
+
+class Statement:
+
+    def __init__(self, name, query):
+        self.name = name
+        self.query = query
+        self.executions = 0
+        self.prepares = 0
+        self.total_ms = 0.0
+
+        param_count = 0
+
+        def to_positional(match):
+            nonlocal param_count
+            if match.group(0) == "%%":
+                return "%"
+            param_count += 1
+            return f"${param_count}"
+
+        self.prepare_sql = f"PREPARE {name} AS {_PLACEHOLDER.sub(to_positional, query)}"
+        placeholders = ", ".join(["%s"] * param_count)
+        self.execute_sql = f"EXECUTE {name} ({placeholders})" if param_count else f"EXECUTE {name}"
+
+
+class StatementRegistry:
+    """Dá um nome a cada texto SQL distinto e acumula contadores por statement."""
+
+    def __init__(self, prefix="tpce"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._statements = {}
+
+    def get(self, query):
+        statement = self._statements.get(query)
+        if statement is None:
+            with self._lock:
+                statement = self._statements.get(query)
+                if statement is None:
+                    statement = Statement(f"{self.prefix}_{len(self._statements) + 1}", query)
+                    self._statements[query] = statement
+        return statement
+
+    def record(self, statement, elapsed_ms, prepared=False):
+        with self._lock:
+            statement.executions += 1
+            statement.total_ms += elapsed_ms
+            if prepared:
+                statement.prepares += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                query: {
+                    "executions": statement.executions,
+                    "prepares": statement.prepares,
+                    "total_ms": statement.total_ms,
+                }
+                for query, statement in self._statements.items()
+            }
+
+    def merge(self, snapshot):
+        for query, counters in snapshot.items():
+            statement = self.get(query)
+            with self._lock:
+                statement.executions += counters["executions"]
+                statement.prepares += counters["prepares"]
+                statement.total_ms += counters["total_ms"]
+
+    def statements(self):
+        with self._lock:
+            return list(self._statements.values())
+
+
+REGISTRY = StatementRegistry()
+
+
+class StatementCursor(extensions.cursor):
+    """Cursor que contabiliza cada statement e, se a conexão pedir, usa PREPARE/EXECUTE."""
+
+    def execute(self, query, vars=None):
+        if isinstance(query, sql.Composable):
+            query = query.as_string(self)
+
+        statement = REGISTRY.get(query)
+        connection = self.connection
+        prepare = connection.prepare_statements and is_preparable(vars)
+
+        # statement_ns soma todo o tempo em statements da conexão (com PREPAREs e
+        # statements que falharam); o worker_task o zera a cada tentativa. Com o
+        # rastreamento ligado, a transação corrente em connection.trace recebe o span.
+        prepare_start = time.perf_counter_ns()
+        try:
+            prepared_now = False
+            if prepare and statement.name not in connection.prepared_names:
+                super().execute(statement.prepare_sql)
+                connection.prepared_names.add(statement.name)
+                prepared_now = True
+
+            start_time = time.perf_counter_ns()
+            if prepare:
+                super().execute(statement.execute_sql, vars)
+            else:
+                super().execute(query, vars)
+            REGISTRY.record(statement, (time.perf_counter_ns() - start_time) / 1e6, prepared=prepared_now)
+        finally:
+            end_time = time.perf_counter_ns()
+            connection.statement_ns += end_time - prepare_start
+            if connection.trace is not None:
+                connection.trace.statement(statement, prepare_start, end_time, self.rowcount)
+
+
+class StatementConnection(extensions.connection):
+    """Conexão cujos cursores passam pelo registro de statements, sem preparar."""
+
+    prepare_statements = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cursor_factory = StatementCursor
+        # Statements preparados sobrevivem a ROLLBACK e RESET ALL; só somem com a sessão.
+        self.prepared_names = set()
+        self.application_name = None
+        self.statement_ns = 0
+        self.trace = None
+        self.trace_lane = None
+
+    def set_application_name(self, name):
+        # Fora do registro de statements: um SET não pode ser preparado.
+        if name == self.application_name:
+            return
+        with self.cursor(cursor_factory=extensions.cursor) as cur:
+            cur.execute("SET application_name = %s", (name,))
+        self.application_name = name
+
+    def reset(self):
+        # O reset() do psycopg2 emite DISCARD ALL, que também desalocaria os
+        # statements preparados; aqui desfazemos só a transação e os SETs.
+        self.application_name = None
+        self.rollback()
+        with self.cursor(cursor_factory=extensions.cursor) as cur:
+            cur.execute("RESET ALL")
+        self.commit()
+
+
+class PreparedStatementConnection(StatementConnection):
+    """Prepara cada statement uma vez por conexão e depois só envia EXECUTE."""
+
+    prepare_statements = True
@@ -0,0 +1,26 @@
+import os
+import sys
+
+import psycopg2
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from driver import DB_SETTINGS
+from statements import PreparedStatementConnection
+
+
+# Os testes rodam contra a base TPC-E de DB_SETTINGS e desfazem tudo no fim;
+# sem servidor, são pulados.
+
+@pytest.fixture
+def prepared_conn():
+    try:
+        conn = psycopg2.connect(**DB_SETTINGS, connection_factory=PreparedStatementConnection)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"Servidor PostgreSQL indisponível: {e}")
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+        conn.close()
@@ -0,0 +1,58 @@
+import pytest
+
+import transactions
+from input_generator import DATA_MAINTENANCE_TABLES, generate_data_maintenance_inputs
+
+
+DATA_MAINTENANCE_TABLE_NAMES = [next(DATA_MAINTENANCE_TABLES) for _ in range(12)]
+
+
+@pytest.mark.parametrize("table_name", DATA_MAINTENANCE_TABLE_NAMES)
+def test_data_maintenance_with_prepared_statements(prepared_conn, table_name):
+    # Cada statement passa por PREPARE sem tipos declarados: um parâmetro cujo
+    # tipo o servidor não consegue inferir faz a transação abortar aqui.
+    with prepared_conn.cursor() as cur:
+        inputs = generate_data_maintenance_inputs(cur)
+    inputs["table_name"] = table_name
+    transactions.execute_data_maintenance(prepared_conn, **inputs)
+    assert prepared_conn.prepared_names
+
+
+def test_data_maintenance_financial_shifts_quarter_start(prepared_conn):
+    with prepared_conn.cursor() as cur:
+        cur.execute("SELECT fi_co_id FROM FINANCIAL LIMIT 1")
+        co_id = cur.fetchone()[0]
+        cur.execute("SELECT fi_qtr_start_date FROM FINANCIAL WHERE fi_co_id = %s ORDER BY fi_year, fi_qtr", (co_id,))
+        before = [row[0] for row in cur.fetchall()]
+        inputs = generate_data_maintenance_inputs(cur)
+
+    inputs.update(table_name="FINANCIAL", co_id=co_id)
+    transactions.execute_data_maintenance(prepared_conn, **inputs)
+
+    with prepared_conn.cursor() as cur:
+        cur.execute("SELECT fi_qtr_start_date FROM FINANCIAL WHERE fi_co_id = %s ORDER BY fi_year, fi_qtr", (co_id,))
+        after = [row[0] for row in cur.fetchall()]
+    shift = 1 if any(day.day == 1 for day in before) else -1
+    assert [(a - b).days for a, b in zip(after, before)] == [shift] * len(before)
+
+
+def test_fetch_batch_keeps_column_types(prepared_conn):
+    # numeric, date, timestamp e char: as linhas do lote devem ser iguais às da
+    # consulta executada sozinha, com os mesmos tipos Python.
+    queries = [
+        ("SELECT fi_co_id, fi_qtr_start_date, fi_revenue FROM FINANCIAL ORDER BY fi_co_id, fi_year, fi_qtr LIMIT %s", (5,)),
+        ("SELECT t_id, t_dts, t_st_id, t_chrg FROM TRADE ORDER BY t_id LIMIT %s", (5,)),
+        ("SELECT c_id, c_l_name FROM CUSTOMER WHERE c_id < %s", (0,)),
+    ]
+    with prepared_conn.cursor() as cur:
+        expected = []
+        for query, params in queries:
+            cur.execute(query, params)
+            expected.append(cur.fetchall())
+        batched = transactions._fetch_batch(cur, queries)
+
+    assert batched == expected
+    assert batched[2] == []
+    for rows, expected_rows in zip(batched, expected):
+        for row, expected_row in zip(rows, expected_rows):
+            assert [type(value) for value in row] == [type(value) for value in expected_row]
@@ -0,0 +1,143 @@
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+# Rastreamento leve: spans de transação, de frame e de statement em um buffer
+# circular (os mais antigos são descartados), exportados no formato de trace
+# events do Chrome (abre em ui.perfetto.dev ou chrome://tracing).
+#
+# O span corrente fica na própria conexão (conn.trace), que só é usada por um
+# terminal de cada vez; assim vale igual para threads, corrotinas e processos.
+# Cada conexão é uma linha ("tid") do timeline. Sem Tracer instalado, o custo é
+# uma leitura de atributo por statement e por frame. Conexões psycopg2 comuns
+# (sem os atributos de StatementConnection) não são rastreadas.
+
+
+class TransactionTrace:
+    """Span de uma transação em andamento em uma conexão, com o frame corrente."""
+
+    __slots__ = ("tracer", "lane", "transaction", "transaction_id", "start_ns", "frame", "frame_start_ns")
+
+    def __init__(self, tracer, lane, transaction, transaction_id):
+        self.tracer = tracer
+        self.lane = lane
+        self.transaction = transaction
+        self.transaction_id = transaction_id
+        self.start_ns = time.perf_counter_ns()
+        self.frame = None
+        self.frame_start_ns = 0
+
+    def statement(self, statement, start_ns, end_ns, rows):
+        self.tracer.record(statement.name, "statement", start_ns, end_ns, self.lane, {
+            "transaction_id": self.transaction_id,
+            "sql_id": statement.name,
+            "rows": rows,
+            "query": " ".join(statement.query.split())[:100],
+        })
+
+    def begin_frame(self, number):
+        now = time.perf_counter_ns()
+        self.close_frame(now)
+        self.frame = number
+        self.frame_start_ns = now
+
+    def close_frame(self, now=None):
+        if self.frame is None:
+            return
+        self.tracer.record(f"{self.transaction} frame {self.frame}", "frame", self.frame_start_ns,
+                           now if now is not None else time.perf_counter_ns(), self.lane,
+                           {"transaction_id": self.transaction_id})
+        self.frame = None
+
+
+class Tracer:
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.pid = os.getpid()
+        # Tuplas (nome, categoria, início_ns, fim_ns, pid, linha, args); deque.append é atômico.
+        self._events = deque(maxlen=capacity)
+        self._lane_names = {}
+        self._lanes = itertools.count(1)
+        self._transaction_ids = itertools.count(1)
+
+    def record(self, name, category, start_ns, end_ns, lane, args):
+        self._events.append((name, category, start_ns, end_ns, self.pid, lane, args))
+
+    def begin(self, conn, transaction):
+        if not hasattr(conn, "trace_lane"):
+            return
+        if conn.trace_lane is None:
+            conn.trace_lane = next(self._lanes)
+            self._lane_names[(self.pid, conn.trace_lane)] = f"conexão {conn.trace_lane}"
+        conn.trace = TransactionTrace(self, conn.trace_lane, transaction, next(self._transaction_ids))
+
+    def end(self, conn, status, attempts):
+        trace = getattr(conn, "trace", None)
+        if trace is None:
+            return
+        conn.trace = None
+        end_ns = time.perf_counter_ns()
+        trace.close_frame(end_ns)
+        self.record(trace.transaction, "transaction", trace.start_ns, end_ns, trace.lane, {
+            "transaction_id": trace.transaction_id,
+            "status": status,
+            "attempts": attempts,
+            "thread": threading.current_thread().name,
+        })
+
+    def snapshot(self):
+        """Eventos e nomes das linhas, para enviar ao processo pai."""
+        return list(self._events), dict(self._lane_names)
+
+    def merge(self, snapshot):
+        events, lane_names = snapshot
+        self._events.extend(events)
+        self._lane_names.update(lane_names)
+
+    def export(self, path):
+        """Grava o JSON de trace events e devolve o número de spans gravados."""
+        trace_events = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": lane, "args": {"name": name}}
+            for (pid, lane), name in sorted(self._lane_names.items())
+        ]
+        events = list(self._events)
+        for name, category, start_ns, end_ns, pid, lane, args in events:
+            # perf_counter_ns é o relógio monotônico do sistema: comparável entre processos.
+            trace_events.append({
+                "name": name, "cat": category, "ph": "X",
+                "ts": start_ns / 1000, "dur": (end_ns - start_ns) / 1000,
+                "pid": pid, "tid": lane, "args": args,
+            })
+        with open(path, "w") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+        return len(events)
+
+
+def frame(conn, number):
+    """Marca o início do frame number da transação em conn (e o fim do anterior)."""
+    trace = getattr(conn, "trace", None)
+    if trace is not None:
+        trace.begin_frame(number)
+
+
+def close_frame(conn):
+    trace = getattr(conn, "trace", None)
+    if trace is not None:
+        trace.close_frame()
+
+
+_installed_tracer = None
+
+
+def install(tracer):
+    global _installed_tracer
+    _installed_tracer = tracer
+
+
+def get():
+    return _installed_tracer
@@ -0,0 +1,88 @@
+from datetime import datetime
+
+
+# Trade-Cleanup: cancela as ordens pendentes (TRADE_REQUEST) e as submetidas que
+# ficaram sem Trade-Result em execuções anteriores. Cada lote é um único comando
+# (DELETE/UPDATE/INSERT encadeados em CTEs) e um commit, então nem o número de
+# comandos nem o tamanho da transação crescem com a quantidade de trades.
+
+def _cancel_pending_chunk(cur, chunk_size, st_canceled_id, st_submitted_id):
+    now_dts = datetime.now()
+    cur.execute("""
+        WITH chunk AS (
+            DELETE FROM TRADE_REQUEST
+            WHERE tr_t_id IN (
+                SELECT tr_t_id FROM TRADE_REQUEST ORDER BY tr_t_id LIMIT %s
+            )
+            RETURNING tr_t_id
+        ),
+        canceled AS (
+            UPDATE TRADE T
+            SET t_st_id = %s, t_dts = %s
+            FROM chunk
+            WHERE T.t_id = chunk.tr_t_id
+        ),
+        history AS (
+            INSERT INTO TRADE_HISTORY (th_t_id, th_dts, th_st_id)
+            SELECT chunk.tr_t_id, %s, S.st_id
+            FROM chunk CROSS JOIN (VALUES (%s::bpchar), (%s::bpchar)) AS S(st_id)
+        )
+        SELECT count(*) FROM chunk
+        """, (chunk_size, st_canceled_id, now_dts, now_dts, st_submitted_id, st_canceled_id))
+    return cur.fetchone()[0]
+
+
+def _cancel_submitted_chunk(cur, start_trade_id, chunk_size, st_canceled_id, st_submitted_id):
+    now_dts = datetime.now()
+    cur.execute("""
+        WITH chunk AS (
+            SELECT t_id FROM TRADE
+            WHERE t_id >= %s AND t_st_id = %s
+            ORDER BY t_id
+            LIMIT %s
+            FOR UPDATE
+        ),
+        canceled AS (
+            UPDATE TRADE T
+            SET t_st_id = %s, t_dts = %s
+            FROM chunk
+            WHERE T.t_id = chunk.t_id
+        ),
+        history AS (
+            INSERT INTO TRADE_HISTORY (th_t_id, th_dts, th_st_id)
+            SELECT t_id, %s, %s FROM chunk
+        )
+        SELECT count(*), max(t_id) FROM chunk
+        """, (start_trade_id, st_submitted_id, chunk_size, st_canceled_id, now_dts, now_dts, st_canceled_id))
+    return cur.fetchone()
+
+
+def trade_cleanup(conn, start_trade_id=0, st_canceled_id='CNCL', st_submitted_id='SBMT', chunk_size=10000):
+    """Cancela, em lotes de chunk_size trades, as ordens pendentes e as submetidas
+    a partir de start_trade_id. Cada lote é confirmado antes do próximo.
+    Retorna (pendentes canceladas, submetidas canceladas)."""
+
+    canceled_pending = 0
+    canceled_submitted = 0
+
+    with conn.cursor() as cur:
+        while True:
+            count = _cancel_pending_chunk(cur, chunk_size, st_canceled_id, st_submitted_id)
+            conn.commit()
+            if count == 0:
+                break
+            canceled_pending += count
+            print(f"  [Trade-Cleanup] {canceled_pending} ordens pendentes canceladas...")
+
+        # Paginação por t_id: cada lote continua de onde o anterior parou.
+        next_trade_id = start_trade_id
+        while True:
+            count, last_trade_id = _cancel_submitted_chunk(cur, next_trade_id, chunk_size, st_canceled_id, st_submitted_id)
+            conn.commit()
+            if count == 0:
+                break
+            canceled_submitted += count
+            next_trade_id = last_trade_id + 1
+            print(f"  [Trade-Cleanup] {canceled_submitted} ordens submetidas canceladas...")
+
+    return canceled_pending, canceled_submitted
@@ -0,0 +1,109 @@
+import threading
+
+from latency_histogram import HistogramGroup
+
+
+# "error": a transação foi interrompida por uma exceção que não é do banco (bug,
+# falha na geração das entradas, timeout no pool); não tem duração medida.
+STATUSES = ("success", "rollback_ok", "abort", "error")
+
+# Tempos por fase somados por tipo; espera pelo pool e geração ficam fora de duration_ns.
+PHASES = ("acquire_ns", "generation_ns", "statement_ns", "commit_ns", "rollback_retry_ns")
+
+
+class TransactionStats:
+    """Agregados por tipo de transação, em memória constante.
+
+    Substitui a lista com um dicionário por transação executada: cada resultado
+    de worker_task é somado aqui (contagens por status, repetições e o tempo de
+    cada fase: espera pelo pool, geração, statements, commit e rollback ou
+    repetição) e a duração vai para o histograma do tipo.
+    A duração também é separada entre transações resolvidas na primeira
+    tentativa e transações repetidas, e cada tentativa que falhou é contada
+    pelo seu SQLSTATE em errors. Resultados sem duração (duration_ns None: falha
+    ao obter a conexão ou status "error") ficam fora dos histogramas; os de
+    status "error" são contados em exceptions por tipo de transação e de
+    exceção, com a primeira mensagem vista.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = HistogramGroup()
+        self.first_try_latency = HistogramGroup()
+        self.retried_latency = HistogramGroup()
+        self.by_type = {}
+        self.errors = {}
+        self.exceptions = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _empty_counters():
+        counters = dict.fromkeys(STATUSES, 0)
+        counters["retried"] = 0
+        counters["retries"] = 0
+        for phase in PHASES:
+            counters[phase] = 0
+        return counters
+
+    def add(self, result):
+        transaction = result["transaction"]
+        with self._lock:
+            counters = self.by_type.get(transaction)
+            if counters is None:
+                counters = self.by_type[transaction] = self._empty_counters()
+            counters[result["status"]] += 1
+            if result["attempts"] > 1:
+                counters["retried"] += 1
+                counters["retries"] += result["attempts"] - 1
+            for phase in PHASES:
+                counters[phase] += result[phase]
+            for sqlstate in result["sqlstates"]:
+                self.errors[sqlstate] = self.errors.get(sqlstate, 0) + 1
+            if result["status"] == "error":
+                key = (transaction, result["exception"])
+                count, message = self.exceptions.get(key, (0, result["error"]))
+                self.exceptions[key] = (count + 1, message)
+        if result["duration_ns"] is None:
+            return
+        self.latency.record(transaction, result["duration_ns"])
+        if result["attempts"] > 1:
+            self.retried_latency.record(transaction, result["duration_ns"])
+        else:
+            self.first_try_latency.record(transaction, result["duration_ns"])
+
+    def merge(self, other):
+        with self._lock:
+            for transaction, other_counters in other.by_type.items():
+                counters = self.by_type.get(transaction)
+                if counters is None:
+                    counters = self.by_type[transaction] = self._empty_counters()
+                for key, value in other_counters.items():
+                    counters[key] += value
+            for sqlstate, count in other.errors.items():
+                self.errors[sqlstate] = self.errors.get(sqlstate, 0) + count
+            for key, (other_count, other_message) in other.exceptions.items():
+                count, message = self.exceptions.get(key, (0, other_message))
+                self.exceptions[key] = (count + other_count, message)
+        self.latency.merge(other.latency)
+        self.first_try_latency.merge(other.first_try_latency)
+        self.retried_latency.merge(other.retried_latency)
+
+    def totals(self):
+        totals = self._empty_counters()
+        with self._lock:
+            for counters in self.by_type.values():
+                for key, value in counters.items():
+                    totals[key] += value
+        return totals
+
+    def items(self):
+        with self._lock:
+            return sorted((transaction, dict(counters)) for transaction, counters in self.by_type.items())
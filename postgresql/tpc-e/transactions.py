@@ -4,8 +4,71 @@ from datetime import datetime, timedelta
 import random
 import decimal
 
+import reference_cache
+import tracing
+
+
+# Envia as consultas independentes de um mesmo frame juntas, em um único SELECT
+# (ver _fetch_batch). Ajustado pelo driver; False executa uma consulta por vez.
+BATCH_INDEPENDENT_STATEMENTS = False
+
+# Market-Watch calcula a capitalização de todos os símbolos em uma única consulta
+# agregada; False mantém as três consultas por símbolo.
+SET_BASED_MARKET_WATCH = False
+
+# Trade-Update aplica as alterações de cada frame com um único UPDATE ... FROM,
+# em vez de um SELECT e um UPDATE por linha.
+BULK_TRADE_UPDATE = False
+
+
+# Número de colunas de cada consulta usada em _fetch_batch, por texto SQL.
+_BATCH_COLUMN_COUNTS = {}
+
+
+def _batch_column_count(cur, query, params):
+    count = _BATCH_COLUMN_COUNTS.get(query)
+    if count is None:
+        # Uma única vez por consulta (e processo): LIMIT 0 só devolve a descrição.
+        cur.execute(f"SELECT * FROM ({query}) AS batch_row LIMIT 0", params)
+        count = _BATCH_COLUMN_COUNTS[query] = len(cur.description)
+    return count
+
+
+def _fetch_batch(cur, statements):
+    """Executa consultas independentes em uma única ida e volta ao banco.
+
+    O psycopg2 não tem pipeline mode e, com vários comandos separados por ';',
+    só devolve o resultado do último. Por isso cada (query, params) vira uma
+    subconsulta com um array_agg por coluna, todas no mesmo SELECT. Os arrays
+    mantêm o tipo de cada coluna (numeric, date, timestamp...), e o psycopg2 os
+    converte como faria com as linhas da consulta executada sozinha. Retorna, na
+    ordem dada, a lista de linhas (tuplas) de cada consulta.
+    """
+    aggregates = []
+    params = []
+    column_counts = []
+    for index, (query, query_params) in enumerate(statements):
+        count = _batch_column_count(cur, query, query_params)
+        aliases = [f"c{column}" for column in range(count)]
+        aggregated = ", ".join(f"array_agg({alias})" for alias in aliases)
+        aggregates.append(f"(SELECT {aggregated} FROM ({query}) AS batch_row({', '.join(aliases)})) AS batch_{index}")
+        params.extend(query_params)
+        column_counts.append(count)
+    cur.execute("SELECT * FROM " + ", ".join(aggregates), params)
+    row = cur.fetchone()
+
+    results = []
+    offset = 0
+    for count in column_counts:
+        arrays = row[offset:offset + count]
+        offset += count
+        # Sem linhas, array_agg devolve NULL.
+        results.append(list(zip(*arrays)) if arrays[0] is not None else [])
+    return results
+
 
 def execute_broker_volume(conn, broker_list, sector_name):
+    tracing.frame(conn, 1)
     with conn.cursor() as cur:
         broker_list_tuple = tuple(broker_list)
         
@@ -41,6 +104,7 @@ def execute_broker_volume(conn, broker_list, sector_name):
 
 def execute_customer_position(conn, cust_id, tax_id, get_history):
 
+    tracing.frame(conn, 1)
     with conn.cursor() as cur:
 
         
@@ -52,18 +116,16 @@ def execute_customer_position(conn, cust_id, tax_id, get_history):
                 return False 
             cust_id = cust_id_result[0]
             
-        cur.execute("""
+        query_customer_details = """
             SELECT c_st_id, c_l_name, c_f_name, c_m_name, c_gndr, c_tier, c_dob,
                    c_ad_id, c_ctry_1, c_area_1, c_local_1, c_ext_1, c_ctry_2,
                    c_area_2, c_local_2, c_ext_2, c_ctry_3, c_area_3, c_local_3,
                    c_ext_3, c_email_1, c_email_2
             FROM CUSTOMER
             WHERE c_id = %s
-            """, (cust_id,))
-        customer_details = cur.fetchone() 
-
+            """
 
-        query_frame1_assets = sql.SQL("""
+        query_frame1_assets = """
             SELECT
                 ca_id,
                 ca_bal,
@@ -81,14 +143,26 @@ def execute_customer_position(conn, cust_id, tax_id, get_history):
             ORDER BY
                 assets_total ASC
             LIMIT 10
-        """)
-        cur.execute(query_frame1_assets, (cust_id,))
-        accounts = cur.fetchall()
+        """
+
+        if BATCH_INDEPENDENT_STATEMENTS:
+            customer_rows, accounts = _fetch_batch(cur, [
+                (query_customer_details, (cust_id,)),
+                (query_frame1_assets, (cust_id,)),
+            ])
+            customer_details = customer_rows[0] if customer_rows else None
+        else:
+            cur.execute(query_customer_details, (cust_id,))
+            customer_details = cur.fetchone()
+
+            cur.execute(query_frame1_assets, (cust_id,))
+            accounts = cur.fetchall()
 
         
         if get_history and accounts:
 
             
+            tracing.frame(conn, 2)
             selected_account_id = random.choice(accounts)[0]
             
             query_frame2_history = sql.SQL("""
@@ -113,70 +187,83 @@ def execute_customer_position(conn, cust_id, tax_id, get_history):
 
 def execute_market_feed(conn, ticker_tape, status_submitted, type_stop_loss, type_limit_sell, type_limit_buy):
 
+    # A fita inteira é aplicada em uma única transação (o commit fica com o driver).
+    # Um símbolo repetido na fita fica com o último preço e a soma dos volumes,
+    # como na aplicação sequencial.
+    feed = {}
+    for update in ticker_tape:
+        _, trade_qty = feed.get(update["symbol"], (None, 0))
+        feed[update["symbol"]] = (update["price_quote"], trade_qty + update["trade_qty"])
+    if not feed:
+        return []
+
+    # Símbolos em ordem: Market-Feeds concorrentes bloqueiam LAST_TRADE na mesma
+    # sequência e não entram em deadlock.
+    symbols = sorted(feed)
+    price_quotes = [feed[symbol][0] for symbol in symbols]
+    trade_qtys = [feed[symbol][1] for symbol in symbols]
+
+    tracing.frame(conn, 1)
     with conn.cursor() as cur:
         now_dts = datetime.now()
-        for update in ticker_tape:
-            symbol = update["symbol"]
-            price_quote = update["price_quote"]
-            trade_qty = update["trade_qty"]
-            
-            cur.execute("""
-                UPDATE LAST_TRADE
-                SET lt_price = %s,
-                    lt_vol = lt_vol + %s,
-                    lt_dts = %s
-                WHERE lt_s_symb = %s
-                """, (price_quote, trade_qty, now_dts, symbol))
-
-            query_find_triggers = sql.SQL("""
-                SELECT tr_t_id, tr_bid_price, tr_tt_id, tr_qty
-                FROM TRADE_REQUEST
-                WHERE tr_s_symb = %s AND (
-                    (tr_tt_id = %s AND tr_bid_price >= %s) OR
-                    (tr_tt_id = %s AND tr_bid_price <= %s) OR
-                    (tr_tt_id = %s AND tr_bid_price >= %s)
-                )
-            """)
-            cur.execute(query_find_triggers, (
-                symbol,
-                type_stop_loss, price_quote,
-                type_limit_sell, price_quote,
-                type_limit_buy, price_quote
-            ))
-            
-            triggered_trades = cur.fetchall()
-            
-            if triggered_trades:
-                for req_trade_id, req_price_quote, req_trade_type, req_trade_qty in triggered_trades:
-                    cur.execute(
-                        "UPDATE TRADE SET t_dts = %s, t_st_id = %s WHERE t_id = %s",
-                        (now_dts, status_submitted, req_trade_id)
-                    )
-                    
-                    cur.execute(
-                        "INSERT INTO TRADE_HISTORY (th_t_id, th_dts, th_st_id) VALUES (%s, %s, %s)",
-                        (req_trade_id, now_dts, status_submitted)
-                    )
-
-                triggered_ids = [t[0] for t in triggered_trades]
-                cur.execute(
-                    "DELETE FROM TRADE_REQUEST WHERE tr_t_id IN %s",
-                    (tuple(triggered_ids),)
-                )
-
-            conn.commit()
 
+        cur.execute("""
+            SELECT lt_s_symb FROM LAST_TRADE
+            WHERE lt_s_symb = ANY(%s::bpchar[])
+            ORDER BY lt_s_symb
+            FOR UPDATE
+            """, (symbols,))
+        cur.fetchall()
 
-            if triggered_trades:
-                print(f"  [Market-Feed] {len(triggered_trades)} ordens para o símbolo {symbol} foram desencadeadas e enviadas para o mercado.")
-
-    return True
+        cur.execute("""
+            UPDATE LAST_TRADE LT
+            SET lt_price = F.price_quote,
+                lt_vol = LT.lt_vol + F.trade_qty,
+                lt_dts = %s
+            FROM unnest(%s::bpchar[], %s::numeric[], %s::integer[]) AS F(symbol, price_quote, trade_qty)
+            WHERE LT.lt_s_symb = F.symbol
+            """, (now_dts, symbols, price_quotes, trade_qtys))
+
+        # Uma consulta acha as ordens disparadas de todos os símbolos; as mesmas
+        # linhas saem de TRADE_REQUEST e são submetidas em TRADE e TRADE_HISTORY.
+        cur.execute("""
+            WITH triggered AS (
+                DELETE FROM TRADE_REQUEST TR
+                USING unnest(%s::bpchar[], %s::numeric[]) AS F(symbol, price_quote)
+                WHERE TR.tr_s_symb = F.symbol AND (
+                    (TR.tr_tt_id = %s AND TR.tr_bid_price >= F.price_quote) OR
+                    (TR.tr_tt_id = %s AND TR.tr_bid_price <= F.price_quote) OR
+                    (TR.tr_tt_id = %s AND TR.tr_bid_price >= F.price_quote)
+                )
+                RETURNING TR.tr_t_id, TR.tr_s_symb, TR.tr_qty, TR.tr_bid_price
+            ),
+            submitted AS (
+                UPDATE TRADE T
+                SET t_dts = %s, t_st_id = %s
+                FROM triggered
+                WHERE T.t_id = triggered.tr_t_id
+            ),
+            history AS (
+                INSERT INTO TRADE_HISTORY (th_t_id, th_dts, th_st_id)
+                SELECT tr_t_id, %s, %s FROM triggered
+            )
+            SELECT tr_t_id, tr_s_symb, tr_qty, tr_bid_price FROM triggered ORDER BY tr_s_symb, tr_t_id
+            """, (
+                symbols, price_quotes,
+                type_stop_loss, type_limit_sell, type_limit_buy,
+                now_dts, status_submitted,
+                now_dts, status_submitted
+            ))
+        # Nada de console com a transação aberta: as ordens disparadas voltam no
+        # resultado, e o Market Exchange (se ativo) as conta como submetidas.
+        return cur.fetchall()
 
 
 
 
 def execute_market_watch(conn, cust_id, industry_name, acct_id, start_date):
 
+    tracing.frame(conn, 1)
     with conn.cursor() as cur:
         stock_list = []
         
@@ -207,29 +294,42 @@ def execute_market_watch(conn, cust_id, industry_name, acct_id, start_date):
         if not stock_list:
             return True
 
-        old_mkt_cap = 0.0
-        new_mkt_cap = 0.0
+        if SET_BASED_MARKET_WATCH:
+            # unnest preserva símbolos repetidos, como o laço por símbolo.
+            cur.execute("""
+                SELECT
+                    COALESCE(SUM(S.s_num_out * DM.dm_close), 0),
+                    COALESCE(SUM(S.s_num_out * LT.lt_price), 0)
+                FROM unnest(%s::bpchar[]) AS W(symbol)
+                JOIN LAST_TRADE LT ON LT.lt_s_symb = W.symbol
+                JOIN SECURITY S ON S.s_symb = W.symbol
+                JOIN DAILY_MARKET DM ON DM.dm_s_symb = W.symbol AND DM.dm_date = %s
+                """, (stock_list, start_date))
+            old_mkt_cap, new_mkt_cap = cur.fetchone()
+        else:
+            old_mkt_cap = decimal.Decimal(0)
+            new_mkt_cap = decimal.Decimal(0)
 
-        for symbol in stock_list:
-            cur.execute("SELECT lt_price FROM LAST_TRADE WHERE lt_s_symb = %s", (symbol,))
-            new_price_res = cur.fetchone()
-            
-            cur.execute("SELECT s_num_out FROM SECURITY WHERE s_symb = %s", (symbol,))
-            s_num_out_res = cur.fetchone()
-            
-            cur.execute(
-                "SELECT dm_close FROM DAILY_MARKET WHERE dm_s_symb = %s AND dm_date = %s",
-                (symbol, start_date)
-            )
-            old_price_res = cur.fetchone()
-            
-            if new_price_res and s_num_out_res and old_price_res:
-                new_price = new_price_res[0]
-                s_num_out = s_num_out_res[0]
-                old_price = old_price_res[0]
-                
-                old_mkt_cap += s_num_out * old_price
-                new_mkt_cap += s_num_out * new_price
+            for symbol in stock_list:
+                cur.execute("SELECT lt_price FROM LAST_TRADE WHERE lt_s_symb = %s", (symbol,))
+                new_price_res = cur.fetchone()
+
+                cur.execute("SELECT s_num_out FROM SECURITY WHERE s_symb = %s", (symbol,))
+                s_num_out_res = cur.fetchone()
+
+                cur.execute(
+                    "SELECT dm_close FROM DAILY_MARKET WHERE dm_s_symb = %s AND dm_date = %s",
+                    (symbol, start_date)
+                )
+                old_price_res = cur.fetchone()
+
+                if new_price_res and s_num_out_res and old_price_res:
+                    new_price = new_price_res[0]
+                    s_num_out = s_num_out_res[0]
+                    old_price = old_price_res[0]
+
+                    old_mkt_cap += s_num_out * old_price
+                    new_mkt_cap += s_num_out * new_price
 
         if old_mkt_cap != 0:
             pct_change = 100 * (new_mkt_cap / old_mkt_cap - 1)
@@ -244,6 +344,7 @@ def execute_market_watch(conn, cust_id, industry_name, acct_id, start_date):
 
 def execute_security_detail(conn, symbol, access_lob_flag, max_rows_to_return, start_date):
 
+    tracing.frame(conn, 1)
     with conn.cursor() as cur:
         cur.execute("""
             SELECT
@@ -269,15 +370,13 @@ def execute_security_detail(conn, symbol, access_lob_flag, max_rows_to_return, s
         
         co_id = main_details[1] 
 
-        cur.execute("""
+        query_competitors = """
             SELECT C.co_name, I.in_name
             FROM COMPANY_COMPETITOR CC, COMPANY C, INDUSTRY I
             WHERE CC.cp_co_id = %s AND C.co_id = CC.cp_comp_co_id AND I.in_id = CC.cp_in_id
             LIMIT 3
-            """, (co_id,))
-        cur.fetchall() 
-
-        cur.execute("""
+            """
+        query_financials = """
             SELECT fi_year, fi_qtr, fi_qtr_start_date, fi_revenue, fi_net_earn,
                    fi_basic_eps, fi_dilut_eps, fi_margin, fi_inventory, fi_assets,
                    fi_liability, fi_out_basic, fi_out_dilut
@@ -285,67 +384,109 @@ def execute_security_detail(conn, symbol, access_lob_flag, max_rows_to_return, s
             WHERE fi_co_id = %s
             ORDER BY fi_year ASC, fi_qtr ASC
             LIMIT 20
-            """, (co_id,))
-        cur.fetchall() 
-
-        cur.execute("""
+            """
+        query_daily_market = """
             SELECT dm_date, dm_close, dm_high, dm_low, dm_vol
             FROM DAILY_MARKET
             WHERE dm_s_symb = %s AND dm_date >= %s
             ORDER BY dm_date ASC
             LIMIT %s
-            """, (symbol, start_date, max_rows_to_return))
-        cur.fetchall()
-
-        cur.execute("SELECT lt_price, lt_open_price, lt_vol FROM LAST_TRADE WHERE lt_s_symb = %s", (symbol,))
-        cur.fetchone()
-
+            """
+        query_last_trade = "SELECT lt_price, lt_open_price, lt_vol FROM LAST_TRADE WHERE lt_s_symb = %s"
         if access_lob_flag:
-            cur.execute("""
+            query_news = """
                 SELECT NI.ni_item, NI.ni_dts, NI.ni_source, NI.ni_author
                 FROM NEWS_XREF NX, NEWS_ITEM NI
                 WHERE NI.ni_id = NX.nx_ni_id AND NX.nx_co_id = %s
                 LIMIT 2
-                """, (co_id,))
+                """
         else:
-            cur.execute("""
+            query_news = """
                 SELECT NI.ni_dts, NI.ni_source, NI.ni_author, NI.ni_headline, NI.ni_summary
                 FROM NEWS_XREF NX, NEWS_ITEM NI
                 WHERE NI.ni_id = NX.nx_ni_id AND NX.nx_co_id = %s
                 LIMIT 2
-                """, (co_id,))
-        cur.fetchall() 
+                """
+
+        if BATCH_INDEPENDENT_STATEMENTS:
+            _fetch_batch(cur, [
+                (query_competitors, (co_id,)),
+                (query_financials, (co_id,)),
+                (query_daily_market, (symbol, start_date, max_rows_to_return)),
+                (query_last_trade, (symbol,)),
+                (query_news, (co_id,)),
+            ])
+        else:
+            cur.execute(query_competitors, (co_id,))
+            cur.fetchall() 
+
+            cur.execute(query_financials, (co_id,))
+            cur.fetchall() 
+
+            cur.execute(query_daily_market, (symbol, start_date, max_rows_to_return))
+            cur.fetchall()
+
+            cur.execute(query_last_trade, (symbol,))
+            cur.fetchone()
+
+            cur.execute(query_news, (co_id,))
+            cur.fetchall() 
 
     return True
 
 
 
 def _get_trade_details(cur, trade_id_list):
-    for trade_id in trade_id_list:
-        cur.execute("SELECT se_amt FROM SETTLEMENT WHERE se_t_id = %s", (trade_id,))
-        settlement_info = cur.fetchone()
-
-        cur.execute("SELECT is_cash FROM TRADE WHERE t_id = %s", (trade_id,))
-        is_cash = cur.fetchone()
-        if is_cash and is_cash[0]:
-            cur.execute("SELECT ct_amt FROM CASH_TRANSACTION WHERE ct_t_id = %s", (trade_id,))
-            cur.fetchone()
-        
-        cur.execute("SELECT th_dts FROM TRADE_HISTORY WHERE th_t_id = %s ORDER BY th_dts LIMIT 3", (trade_id,))
+    # Um número constante de consultas para a lista inteira, em vez de 3-4 por trade.
+    if not trade_id_list:
+        return
+    trade_ids = list(trade_id_list)
+
+    query_settlements = "SELECT se_t_id, se_amt FROM SETTLEMENT WHERE se_t_id = ANY(%s::bigint[])"
+    query_cash_transactions = """
+        SELECT CT.ct_t_id, CT.ct_amt
+        FROM TRADE T
+        JOIN CASH_TRANSACTION CT ON CT.ct_t_id = T.t_id
+        WHERE T.t_id = ANY(%s::bigint[]) AND T.t_is_cash
+        """
+    query_trade_history = """
+        SELECT TH.th_t_id, TH.th_dts
+        FROM unnest(%s::bigint[]) AS L(t_id)
+        CROSS JOIN LATERAL (
+            SELECT th_t_id, th_dts FROM TRADE_HISTORY
+            WHERE th_t_id = L.t_id
+            ORDER BY th_dts LIMIT 3
+        ) AS TH
+        """
+
+    if BATCH_INDEPENDENT_STATEMENTS:
+        _fetch_batch(cur, [
+            (query_settlements, (trade_ids,)),
+            (query_cash_transactions, (trade_ids,)),
+            (query_trade_history, (trade_ids,)),
+        ])
+    else:
+        cur.execute(query_settlements, (trade_ids,))
+        cur.fetchall()
+
+        cur.execute(query_cash_transactions, (trade_ids,))
+        cur.fetchall()
+
+        cur.execute(query_trade_history, (trade_ids,))
         cur.fetchall()
 
 def execute_trade_lookup(conn, frame_to_execute, **kwargs):
 
+    tracing.frame(conn, frame_to_execute)
     with conn.cursor() as cur:
         if frame_to_execute == 1:
             trade_id_list = kwargs.get("trade_id_list", [])
-            for trade_id in trade_id_list:
-                cur.execute("""
-                    SELECT T.t_bid_price, T.t_exec_name, T.t_is_cash, TT.tt_is_mrkt, T.t_trade_price
-                    FROM TRADE T, TRADE_TYPE TT
-                    WHERE T.t_id = %s AND T.t_tt_id = TT.tt_id
-                    """, (trade_id,))
-                cur.fetchone()
+            cur.execute("""
+                SELECT T.t_id, T.t_bid_price, T.t_exec_name, T.t_is_cash, TT.tt_is_mrkt, T.t_trade_price
+                FROM TRADE T, TRADE_TYPE TT
+                WHERE T.t_id = ANY(%s::bigint[]) AND T.t_tt_id = TT.tt_id
+                """, (list(trade_id_list),))
+            cur.fetchall()
             _get_trade_details(cur, trade_id_list)
 
         elif frame_to_execute == 2:
@@ -411,6 +552,7 @@ def execute_trade_order(conn, acct_id, exec_f_name, exec_l_name, exec_tax_id,
                         symbol, co_name, issue, trade_type_id, st_pending_id, 
                         st_submitted_id, trade_qty, is_lifo, type_is_margin, roll_it_back):
 
+    tracing.frame(conn, 1)
     with conn.cursor() as cur:
 
         cur.execute("""
@@ -426,6 +568,7 @@ def execute_trade_order(conn, acct_id, exec_f_name, exec_l_name, exec_tax_id,
         cust_f_name, cust_l_name, cust_tier, tax_id = cur.fetchone()
 
 
+        tracing.frame(conn, 2)
         if exec_l_name != cust_l_name or exec_f_name != cust_f_name or exec_tax_id != tax_id:
             cur.execute("""
                 SELECT ap_acl FROM ACCOUNT_PERMISSION
@@ -437,6 +580,7 @@ def execute_trade_order(conn, acct_id, exec_f_name, exec_l_name, exec_tax_id,
                 raise ValueError("Executor não tem permissão para esta conta.")
         
 
+        tracing.frame(conn, 3)
         if symbol == "":
             cur.execute("SELECT co_id FROM COMPANY WHERE co_name = %s", (co_name,))
             co_id = cur.fetchone()[0]
@@ -449,21 +593,32 @@ def execute_trade_order(conn, acct_id, exec_f_name, exec_l_name, exec_tax_id,
         cur.execute("SELECT lt_price FROM LAST_TRADE WHERE lt_s_symb = %s", (symbol,))
         market_price = cur.fetchone()[0]
         
-        cur.execute("SELECT tt_is_mrkt, tt_is_sell FROM TRADE_TYPE WHERE tt_id = %s", (trade_type_id,))
-        type_is_market, type_is_sell = cur.fetchone()
+        reference = reference_cache.get()
+        if reference is not None:
+            _, type_is_sell, type_is_market = reference.trade_type(trade_type_id)
+        else:
+            cur.execute("SELECT tt_is_mrkt, tt_is_sell FROM TRADE_TYPE WHERE tt_id = %s", (trade_type_id,))
+            type_is_market, type_is_sell = cur.fetchone()
 
         requested_price = market_price if type_is_market else random.uniform(float(market_price) * 0.95, float(market_price) * 1.05)
         
 
 
-        cur.execute("SELECT cr_rate FROM COMMISSION_RATE WHERE cr_c_tier = %s AND cr_tt_id = %s AND cr_ex_id = %s AND cr_from_qty <= %s AND cr_to_qty >= %s",
-                    (cust_tier, trade_type_id, exch_id, trade_qty, trade_qty))
-        comm_rate_res = cur.fetchone()
-        comm_rate = comm_rate_res[0] if comm_rate_res else 0.0
+        if reference is not None:
+            comm_rate = reference.commission_rate(cust_tier, trade_type_id, exch_id, trade_qty)
+            if comm_rate is None:
+                comm_rate = 0.0
+            charge_amount = reference.charge(cust_tier, trade_type_id)
+        else:
+            cur.execute("SELECT cr_rate FROM COMMISSION_RATE WHERE cr_c_tier = %s AND cr_tt_id = %s AND cr_ex_id = %s AND cr_from_qty <= %s AND cr_to_qty >= %s",
+                        (cust_tier, trade_type_id, exch_id, trade_qty, trade_qty))
+            comm_rate_res = cur.fetchone()
+            comm_rate = comm_rate_res[0] if comm_rate_res else 0.0
 
-        cur.execute("SELECT ch_chrg FROM CHARGE WHERE ch_c_tier = %s AND ch_tt_id = %s", (cust_tier, trade_type_id))
-        charge_amount = cur.fetchone()[0]
+            cur.execute("SELECT ch_chrg FROM CHARGE WHERE ch_c_tier = %s AND ch_tt_id = %s", (cust_tier, trade_type_id))
+            charge_amount = cur.fetchone()[0]
         
+        tracing.frame(conn, 4)
         status_id = st_submitted_id if type_is_market else st_pending_id
 
         now_dts = datetime.now()
@@ -489,13 +644,21 @@ def execute_trade_order(conn, acct_id, exec_f_name, exec_l_name, exec_tax_id,
         if roll_it_back:
             raise RollbackException("Rollback intencional da transação.")
 
-        
-    return True
+    # Ordens a mercado saem submetidas e seguem para o Market Exchange Emulator;
+    # as limitadas esperam em TRADE_REQUEST até um Market-Feed dispará-las.
+    return {
+        "trade_id": trade_id,
+        "symbol": symbol,
+        "trade_qty": trade_qty,
+        "bid_price": requested_price,
+        "submitted": bool(type_is_market),
+    }
 
 
 
 def execute_trade_result(conn, trade_id, trade_price):
 
+    tracing.frame(conn, 1)
     with conn.cursor() as cur:
 
         cur.execute("""
@@ -506,8 +669,12 @@ def execute_trade_result(conn, trade_id, trade_price):
         if not trade_info: return False 
         acct_id, type_id, symbol, trade_qty, charge, is_lifo, trade_is_cash = trade_info
 
-        cur.execute("SELECT tt_name, tt_is_sell FROM TRADE_TYPE WHERE tt_id = %s", (type_id,))
-        type_name, type_is_sell = cur.fetchone()
+        reference = reference_cache.get()
+        if reference is not None:
+            type_name, type_is_sell, _ = reference.trade_type(type_id)
+        else:
+            cur.execute("SELECT tt_name, tt_is_sell FROM TRADE_TYPE WHERE tt_id = %s", (type_id,))
+            type_name, type_is_sell = cur.fetchone()
 
         cur.execute("SELECT hs_qty FROM HOLDING_SUMMARY WHERE hs_ca_id = %s AND hs_s_symb = %s", (acct_id, symbol))
         hs_qty_res = cur.fetchone()
@@ -517,6 +684,7 @@ def execute_trade_result(conn, trade_id, trade_price):
         buy_value = decimal.Decimal('0.0')
         sell_value = decimal.Decimal('0.0')
 
+        tracing.frame(conn, 2)
         cur.execute("SELECT ca_b_id, ca_c_id, ca_tax_st FROM CUSTOMER_ACCOUNT WHERE ca_id = %s", (acct_id,))
         broker_id, cust_id, tax_status = cur.fetchone()
 
@@ -537,25 +705,37 @@ def execute_trade_result(conn, trade_id, trade_price):
                         (trade_id, acct_id, symbol, now_dts, trade_price, trade_qty))
         
 
+        tracing.frame(conn, 3)
         tax_amount = decimal.Decimal('0.0')
         if sell_value > buy_value and tax_status in (1, 2):
-            cur.execute("SELECT sum(tx_rate) FROM TAXRATE WHERE tx_id IN (SELECT cx_tx_id FROM CUSTOMER_TAXRATE WHERE cx_c_id = %s)", (cust_id,))
-            tax_rates = cur.fetchone()[0]
+            if reference is not None:
+                cur.execute("SELECT cx_tx_id FROM CUSTOMER_TAXRATE WHERE cx_c_id = %s", (cust_id,))
+                tax_rates = reference.tax_rate_sum(row[0] for row in cur.fetchall())
+            else:
+                cur.execute("SELECT sum(tx_rate) FROM TAXRATE WHERE tx_id IN (SELECT cx_tx_id FROM CUSTOMER_TAXRATE WHERE cx_c_id = %s)", (cust_id,))
+                tax_rates = cur.fetchone()[0]
             if tax_rates:
                 tax_amount = (sell_value - buy_value) * tax_rates
                 cur.execute("UPDATE TRADE SET t_tax = %s WHERE t_id = %s", (tax_amount, trade_id))
 
 
+        tracing.frame(conn, 4)
         cur.execute("SELECT s_ex_id, s_name FROM SECURITY WHERE s_symb = %s", (symbol,))
         s_ex_id, s_name = cur.fetchone()
         cur.execute("SELECT c_tier FROM CUSTOMER WHERE c_id = %s", (cust_id,))
         c_tier = cur.fetchone()[0]
-        cur.execute("SELECT cr_rate FROM COMMISSION_RATE WHERE cr_c_tier = %s AND cr_tt_id = %s AND cr_ex_id = %s AND cr_from_qty <= %s AND cr_to_qty >= %s",
-                    (c_tier, type_id, s_ex_id, trade_qty, trade_qty))
-        comm_rate_res = cur.fetchone()
-        comm_rate = comm_rate_res[0] if comm_rate_res else decimal.Decimal('0.0')
+        if reference is not None:
+            comm_rate = reference.commission_rate(c_tier, type_id, s_ex_id, trade_qty)
+            if comm_rate is None:
+                comm_rate = decimal.Decimal('0.0')
+        else:
+            cur.execute("SELECT cr_rate FROM COMMISSION_RATE WHERE cr_c_tier = %s AND cr_tt_id = %s AND cr_ex_id = %s AND cr_from_qty <= %s AND cr_to_qty >= %s",
+                        (c_tier, type_id, s_ex_id, trade_qty, trade_qty))
+            comm_rate_res = cur.fetchone()
+            comm_rate = comm_rate_res[0] if comm_rate_res else decimal.Decimal('0.0')
 
 
+        tracing.frame(conn, 5)
         comm_amount = (comm_rate / 100) * trade_qty * trade_price
         st_completed_id = 'CMPT'
         
@@ -569,6 +749,7 @@ def execute_trade_result(conn, trade_id, trade_price):
                     (comm_amount, broker_id))
 
 
+        tracing.frame(conn, 6)
         due_date = now_dts.date() + timedelta(days=2)
         se_amount = (decimal.Decimal(trade_qty) * trade_price) - charge - comm_amount if type_is_sell else -((decimal.Decimal(trade_qty) * trade_price) + charge + comm_amount)
         if tax_status == 1:
@@ -591,32 +772,49 @@ def execute_trade_result(conn, trade_id, trade_price):
 
 def execute_trade_status(conn, acct_id):
 
+    tracing.frame(conn, 1)
     with conn.cursor() as cur:
 
-        cur.execute("""
-            SELECT
-                T.t_id, T.t_dts, ST.st_name, TT.tt_name, T.t_s_symb, T.t_qty,
-                T.t_exec_name, T.t_chrg, S.s_name, E.ex_name
-            FROM
-                TRADE AS T,
-                STATUS_TYPE AS ST,
-                TRADE_TYPE AS TT,
-                SECURITY AS S,
-                EXCHANGE AS E
-            WHERE
-                T.t_ca_id = %s AND
-                ST.st_id = T.t_st_id AND
-                TT.tt_id = T.t_tt_id AND
-                S.s_symb = T.t_s_symb AND
-                E.ex_id = S.s_ex_id
-            ORDER BY
-                T.t_dts DESC
-            LIMIT 50
-            """, (acct_id,))
-        
-        trade_history = cur.fetchall()
+        reference = reference_cache.get()
+        if reference is not None:
+            # STATUS_TYPE, TRADE_TYPE e EXCHANGE vêm do cache em vez de entrarem no join.
+            query_trade_history = """
+                SELECT
+                    T.t_id, T.t_dts, T.t_st_id, T.t_tt_id, T.t_s_symb, T.t_qty,
+                    T.t_exec_name, T.t_chrg, S.s_name, S.s_ex_id
+                FROM
+                    TRADE AS T,
+                    SECURITY AS S
+                WHERE
+                    T.t_ca_id = %s AND
+                    S.s_symb = T.t_s_symb
+                ORDER BY
+                    T.t_dts DESC
+                LIMIT 50
+                """
+        else:
+            query_trade_history = """
+                SELECT
+                    T.t_id, T.t_dts, ST.st_name, TT.tt_name, T.t_s_symb, T.t_qty,
+                    T.t_exec_name, T.t_chrg, S.s_name, E.ex_name
+                FROM
+                    TRADE AS T,
+                    STATUS_TYPE AS ST,
+                    TRADE_TYPE AS TT,
+                    SECURITY AS S,
+                    EXCHANGE AS E
+                WHERE
+                    T.t_ca_id = %s AND
+                    ST.st_id = T.t_st_id AND
+                    TT.tt_id = T.t_tt_id AND
+                    S.s_symb = T.t_s_symb AND
+                    E.ex_id = S.s_ex_id
+                ORDER BY
+                    T.t_dts DESC
+                LIMIT 50
+                """
 
-        cur.execute("""
+        query_customer = """
             SELECT C.c_l_name, C.c_f_name, B.b_name
             FROM
                 CUSTOMER_ACCOUNT AS CA,
@@ -626,9 +824,27 @@ def execute_trade_status(conn, acct_id):
                 CA.ca_id = %s AND
                 C.c_id = CA.ca_c_id AND
                 B.b_id = CA.ca_b_id
-            """, (acct_id,))
-            
-        cur.fetchone()
+            """
+
+        if BATCH_INDEPENDENT_STATEMENTS:
+            trade_history, customer_rows = _fetch_batch(cur, [
+                (query_trade_history, (acct_id,)),
+                (query_customer, (acct_id,)),
+            ])
+            customer = customer_rows[0] if customer_rows else None
+        else:
+            cur.execute(query_trade_history, (acct_id,))
+            trade_history = cur.fetchall()
+
+            cur.execute(query_customer, (acct_id,))
+            customer = cur.fetchone()
+
+        if reference is not None:
+            trade_history = [
+                (t_id, t_dts, reference.status_name(st_id), reference.trade_type(tt_id)[0], symbol,
+                 qty, exec_name, charge, s_name, reference.exchange_name(ex_id))
+                for t_id, t_dts, st_id, tt_id, symbol, qty, exec_name, charge, s_name, ex_id in trade_history
+            ]
 
     return True
 
@@ -636,23 +852,46 @@ def execute_trade_status(conn, acct_id):
 
 def execute_trade_update(conn, frame_to_execute, **kwargs):
 
+    tracing.frame(conn, frame_to_execute)
     with conn.cursor() as cur:
         max_updates = kwargs.get("max_updates", 20)
         
         if frame_to_execute == 1:
 
             trade_id_list = kwargs.get("trade_id_list", [])
-            num_updated = 0
-            for trade_id in trade_id_list:
-                if num_updated < max_updates:
-                    cur.execute("SELECT t_exec_name FROM TRADE WHERE t_id = %s", (trade_id,))
-                    exec_name_res = cur.fetchone()
-                    if exec_name_res:
-                        exec_name = exec_name_res[0]
-                        new_exec_name = exec_name.replace(" X ", " ") if " X " in exec_name else exec_name.replace(" ", " X ")
-                        
-                        cur.execute("UPDATE TRADE SET t_exec_name = %s WHERE t_id = %s", (new_exec_name, trade_id))
-                        num_updated += cur.rowcount
+            if BULK_TRADE_UPDATE:
+                # As primeiras max_updates trades existentes, na ordem da lista
+                # (um id repetido conta só na primeira ocorrência).
+                cur.execute("""
+                    WITH targets AS (
+                        SELECT T.t_id
+                        FROM unnest(%s::bigint[]) WITH ORDINALITY AS L(t_id, ord)
+                        JOIN TRADE T ON T.t_id = L.t_id
+                        GROUP BY T.t_id
+                        ORDER BY min(L.ord)
+                        LIMIT %s
+                    )
+                    UPDATE TRADE T
+                    SET t_exec_name = CASE
+                        WHEN strpos(T.t_exec_name, ' X ') > 0 THEN replace(T.t_exec_name, ' X ', ' ')
+                        ELSE replace(T.t_exec_name, ' ', ' X ')
+                    END
+                    FROM targets
+                    WHERE T.t_id = targets.t_id
+                    """, (list(trade_id_list), max_updates))
+                num_updated = cur.rowcount
+            else:
+                num_updated = 0
+                for trade_id in trade_id_list:
+                    if num_updated < max_updates:
+                        cur.execute("SELECT t_exec_name FROM TRADE WHERE t_id = %s", (trade_id,))
+                        exec_name_res = cur.fetchone()
+                        if exec_name_res:
+                            exec_name = exec_name_res[0]
+                            new_exec_name = exec_name.replace(" X ", " ") if " X " in exec_name else exec_name.replace(" ", " X ")
+                            
+                            cur.execute("UPDATE TRADE SET t_exec_name = %s WHERE t_id = %s", (new_exec_name, trade_id))
+                            num_updated += cur.rowcount
             _get_trade_details(cur, trade_id_list)
 
         elif frame_to_execute == 2:
@@ -667,23 +906,45 @@ def execute_trade_update(conn, frame_to_execute, **kwargs):
                 ORDER BY t_dts ASC LIMIT %s
                 """, (acct_id, start_dts, end_dts, max_trades))
             trades_to_update = cur.fetchall()
+            trade_id_list = [t[0] for t in trades_to_update]
             
-            num_updated = 0
-            for trade_id, is_cash in trades_to_update:
-                if num_updated < max_updates:
-                    cur.execute("SELECT se_cash_type FROM SETTLEMENT WHERE se_t_id = %s", (trade_id,))
-                    cash_type_res = cur.fetchone()
-                    if cash_type_res:
-                        cash_type = cash_type_res[0]
-                        if is_cash:
-                            new_cash_type = "Cash" if cash_type == "Cash Account" else "Cash Account"
-                        else:
-                            new_cash_type = "Margin" if cash_type == "Margin Account" else "Margin Account"
-                        
-                        cur.execute("UPDATE SETTLEMENT SET se_cash_type = %s WHERE se_t_id = %s", (new_cash_type, trade_id))
-                        num_updated += cur.rowcount
+            if BULK_TRADE_UPDATE:
+                cur.execute("""
+                    WITH targets AS (
+                        SELECT T.t_id, T.t_is_cash
+                        FROM unnest(%s::bigint[]) WITH ORDINALITY AS L(t_id, ord)
+                        JOIN TRADE T ON T.t_id = L.t_id
+                        JOIN SETTLEMENT SE ON SE.se_t_id = L.t_id
+                        ORDER BY L.ord
+                        LIMIT %s
+                    )
+                    UPDATE SETTLEMENT SE
+                    SET se_cash_type = CASE
+                        WHEN targets.t_is_cash THEN
+                            CASE WHEN SE.se_cash_type = 'Cash Account' THEN 'Cash' ELSE 'Cash Account' END
+                        ELSE
+                            CASE WHEN SE.se_cash_type = 'Margin Account' THEN 'Margin' ELSE 'Margin Account' END
+                    END
+                    FROM targets
+                    WHERE SE.se_t_id = targets.t_id
+                    """, (trade_id_list, max_updates))
+                num_updated = cur.rowcount
+            else:
+                num_updated = 0
+                for trade_id, is_cash in trades_to_update:
+                    if num_updated < max_updates:
+                        cur.execute("SELECT se_cash_type FROM SETTLEMENT WHERE se_t_id = %s", (trade_id,))
+                        cash_type_res = cur.fetchone()
+                        if cash_type_res:
+                            cash_type = cash_type_res[0]
+                            if is_cash:
+                                new_cash_type = "Cash" if cash_type == "Cash Account" else "Cash Account"
+                            else:
+                                new_cash_type = "Margin" if cash_type == "Margin Account" else "Margin Account"
+                            
+                            cur.execute("UPDATE SETTLEMENT SET se_cash_type = %s WHERE se_t_id = %s", (new_cash_type, trade_id))
+                            num_updated += cur.rowcount
             
-            trade_id_list = [t[0] for t in trades_to_update]
             _get_trade_details(cur, trade_id_list)
 
         elif frame_to_execute == 3:
@@ -700,20 +961,187 @@ def execute_trade_update(conn, frame_to_execute, **kwargs):
                 ORDER BY t.t_dts ASC LIMIT %s
                 """, (symbol, start_dts, end_dts, max_trades))
             trades_to_update = cur.fetchall()
+            trade_id_list = [t[0] for t in trades_to_update]
 
-            num_updated = 0
-            for trade_id, is_cash, qty, type_name, s_name in trades_to_update:
-                if is_cash and num_updated < max_updates:
-                    cur.execute("SELECT ct_name FROM CASH_TRANSACTION WHERE ct_t_id = %s", (trade_id,))
-                    ct_name_res = cur.fetchone()
-                    if ct_name_res:
-                        ct_name = ct_name_res[0]
-                        new_ct_name = f"{type_name} {qty} Shares of {s_name}" if " shares of " in ct_name else f"{type_name} {qty} shares of {s_name}"
-                        
-                        cur.execute("UPDATE CASH_TRANSACTION SET ct_name = %s WHERE ct_t_id = %s", (new_ct_name, trade_id))
-                        num_updated += cur.rowcount
+            if BULK_TRADE_UPDATE:
+                cur.execute("""
+                    WITH targets AS (
+                        SELECT T.t_id, T.t_qty, TT.tt_name, S.s_name
+                        FROM unnest(%s::bigint[]) WITH ORDINALITY AS L(t_id, ord)
+                        JOIN TRADE T ON T.t_id = L.t_id
+                        JOIN TRADE_TYPE TT ON TT.tt_id = T.t_tt_id
+                        JOIN SECURITY S ON S.s_symb = T.t_s_symb
+                        JOIN CASH_TRANSACTION CT ON CT.ct_t_id = L.t_id
+                        WHERE T.t_is_cash
+                        ORDER BY L.ord
+                        LIMIT %s
+                    )
+                    UPDATE CASH_TRANSACTION CT
+                    SET ct_name = targets.tt_name || ' ' || targets.t_qty
+                        || CASE WHEN strpos(CT.ct_name, ' shares of ') > 0 THEN ' Shares of ' ELSE ' shares of ' END
+                        || targets.s_name
+                    FROM targets
+                    WHERE CT.ct_t_id = targets.t_id
+                    """, (trade_id_list, max_updates))
+                num_updated = cur.rowcount
+            else:
+                num_updated = 0
+                for trade_id, is_cash, qty, type_name, s_name in trades_to_update:
+                    if is_cash and num_updated < max_updates:
+                        cur.execute("SELECT ct_name FROM CASH_TRANSACTION WHERE ct_t_id = %s", (trade_id,))
+                        ct_name_res = cur.fetchone()
+                        if ct_name_res:
+                            ct_name = ct_name_res[0]
+                            new_ct_name = f"{type_name} {qty} Shares of {s_name}" if " shares of " in ct_name else f"{type_name} {qty} shares of {s_name}"
+                            
+                            cur.execute("UPDATE CASH_TRANSACTION SET ct_name = %s WHERE ct_t_id = %s", (new_ct_name, trade_id))
+                            num_updated += cur.rowcount
 
-            trade_id_list = [t[0] for t in trades_to_update]
             _get_trade_details(cur, trade_id_list)
+
+        else:
+            num_updated = 0
             
-    return True
\ No newline at end of file
+    return num_updated
+
+
+
+def execute_data_maintenance(conn, table_name, acct_id, c_id, co_id, symbol, tx_id, day_of_month, vol_incr):
+
+    # Cada execução altera uma única tabela, alternando entre dois valores para
+    # que as execuções sucessivas não façam a base divergir.
+    tracing.frame(conn, 1)
+    with conn.cursor() as cur:
+
+        if table_name == "ACCOUNT_PERMISSION":
+            cur.execute("""
+                SELECT ap_acl FROM ACCOUNT_PERMISSION
+                WHERE ap_ca_id = %s
+                ORDER BY ap_acl DESC LIMIT 1
+                """, (acct_id,))
+            row = cur.fetchone()
+            if row:
+                old_acl = row[0]
+                new_acl = "0011" if old_acl == "1111" else "1111"
+                cur.execute("UPDATE ACCOUNT_PERMISSION SET ap_acl = %s WHERE ap_ca_id = %s AND ap_acl = %s",
+                            (new_acl, acct_id, old_acl))
+
+        elif table_name == "ADDRESS":
+            if c_id != 0:
+                cur.execute("""
+                    SELECT ad_id, ad_line2 FROM ADDRESS, CUSTOMER
+                    WHERE ad_id = c_ad_id AND c_id = %s
+                    """, (c_id,))
+            else:
+                cur.execute("""
+                    SELECT ad_id, ad_line2 FROM ADDRESS, COMPANY
+                    WHERE ad_id = co_ad_id AND co_id = %s
+                    """, (co_id,))
+            row = cur.fetchone()
+            if row:
+                ad_id, line2 = row
+                new_line2 = "Apt. 22" if line2 == "Apt. 10C" else "Apt. 10C"
+                cur.execute("UPDATE ADDRESS SET ad_line2 = %s WHERE ad_id = %s", (new_line2, ad_id))
+
+        elif table_name == "COMPANY":
+            cur.execute("SELECT co_sp_rate FROM COMPANY WHERE co_id = %s", (co_id,))
+            row = cur.fetchone()
+            if row:
+                new_sp_rate = "AAA" if row[0].rstrip() == "ABA" else "ABA"
+                cur.execute("UPDATE COMPANY SET co_sp_rate = %s WHERE co_id = %s", (new_sp_rate, co_id))
+
+        elif table_name == "CUSTOMER":
+            cur.execute("SELECT c_f_name, c_l_name, c_email_2 FROM CUSTOMER WHERE c_id = %s", (c_id,))
+            row = cur.fetchone()
+            if row:
+                f_name, l_name, email_2 = row
+                domain = "@earthlink.com" if email_2 and "@mindspring.com" in email_2 else "@mindspring.com"
+                cur.execute("UPDATE CUSTOMER SET c_email_2 = %s WHERE c_id = %s", (f"{f_name[:1]}{l_name}{domain}", c_id))
+
+        elif table_name == "CUSTOMER_TAXRATE":
+            cur.execute("""
+                SELECT cx_tx_id FROM CUSTOMER_TAXRATE
+                WHERE cx_c_id = %s AND (cx_tx_id LIKE 'US%%' OR cx_tx_id LIKE 'CN%%')
+                ORDER BY cx_tx_id LIMIT 1
+                """, (c_id,))
+            row = cur.fetchone()
+            if row:
+                old_tx_id = row[0]
+                # US1..US5 e CN1..CN4: troca pela próxima taxa da mesma região.
+                prefix, number = old_tx_id[:2], int(old_tx_id[2:])
+                last = 5 if prefix == "US" else 4
+                new_tx_id = f"{prefix}{number % last + 1}"
+                cur.execute("UPDATE CUSTOMER_TAXRATE SET cx_tx_id = %s WHERE cx_c_id = %s AND cx_tx_id = %s",
+                            (new_tx_id, c_id, old_tx_id))
+
+        elif table_name == "DAILY_MARKET":
+            cur.execute("""
+                UPDATE DAILY_MARKET SET dm_vol = dm_vol + %s
+                WHERE dm_s_symb = %s AND EXTRACT(DAY FROM dm_date) = %s
+                """, (vol_incr, symbol, day_of_month))
+
+        elif table_name == "EXCHANGE":
+            # Só ex_desc muda; ex_name, guardado no cache de referência, continua válido.
+            cur.execute("""
+                UPDATE EXCHANGE
+                SET ex_desc = regexp_replace(ex_desc, ' LAST UPDATED .*$', '') || ' LAST UPDATED ' || %s
+                """, (datetime.now().isoformat(sep=' ', timespec='seconds'),))
+
+        elif table_name == "FINANCIAL":
+            cur.execute("""
+                SELECT count(*) FROM FINANCIAL
+                WHERE fi_co_id = %s AND EXTRACT(DAY FROM fi_qtr_start_date) = 1
+                """, (co_id,))
+            starts_on_first_day = cur.fetchone()[0] > 0
+            # Deslocamento em dias calculado no SQL, como em tpce_data_maintenance: com
+            # um parâmetro sem tipo, o PREPARE de "date + $1" é ambíguo (date + int,
+            # interval, time...).
+            cur.execute("""
+                UPDATE FINANCIAL
+                SET fi_qtr_start_date = fi_qtr_start_date + CASE WHEN %s THEN 1 ELSE -1 END
+                WHERE fi_co_id = %s
+                """, (starts_on_first_day, co_id))
+
+        elif table_name == "NEWS_ITEM":
+            cur.execute("""
+                UPDATE NEWS_ITEM SET ni_dts = ni_dts + INTERVAL '1 day'
+                WHERE ni_id IN (SELECT nx_ni_id FROM NEWS_XREF WHERE nx_co_id = %s)
+                """, (co_id,))
+
+        elif table_name == "SECURITY":
+            cur.execute("UPDATE SECURITY SET s_exch_date = s_exch_date + INTERVAL '1 day' WHERE s_symb = %s", (symbol,))
+
+        elif table_name == "TAXRATE":
+            # Só tx_name muda; tx_rate, guardado no cache de referência, continua válido.
+            cur.execute("SELECT tx_name FROM TAXRATE WHERE tx_id = %s", (tx_id,))
+            row = cur.fetchone()
+            if row:
+                tx_name = row[0]
+                new_tx_name = tx_name.replace(" Tax ", " tax ") if " Tax " in tx_name else tx_name.replace(" tax ", " Tax ")
+                cur.execute("UPDATE TAXRATE SET tx_name = %s WHERE tx_id = %s", (new_tx_name, tx_id))
+
+        elif table_name == "WATCH_ITEM":
+            cur.execute("""
+                SELECT WI.wi_wl_id, WI.wi_s_symb
+                FROM WATCH_ITEM WI JOIN WATCH_LIST WL ON WI.wi_wl_id = WL.wl_id
+                WHERE WL.wl_c_id = %s
+                ORDER BY WI.wi_s_symb
+                """, (c_id,))
+            items = cur.fetchall()
+            if items:
+                wl_id, old_symbol = items[(len(items) + 1) // 2 - 1]
+                cur.execute("""
+                    SELECT s_symb FROM SECURITY
+                    WHERE s_symb > %s
+                      AND s_symb NOT IN (SELECT wi_s_symb FROM WATCH_ITEM WHERE wi_wl_id = %s)
+                    ORDER BY s_symb LIMIT 1
+                    """, (old_symbol, wl_id))
+                row = cur.fetchone()
+                if row:
+                    cur.execute("UPDATE WATCH_ITEM SET wi_s_symb = %s WHERE wi_wl_id = %s AND wi_s_symb = %s",
+                                (row[0], wl_id, old_symbol))
+
+        else:
+            raise ValueError(f"Tabela de Data-Maintenance desconhecida: {table_name}")
+
+    return True
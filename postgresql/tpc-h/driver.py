@@ -1,12 +1,18 @@
 import psycopg2
+import os
+import sys
 import time
 import math
 import random
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from collections import defaultdict
 from input_generator import INPUT_GENERATORS
 from queries import QUERIES
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+import server_stats
+from latency_histogram import HistogramGroup, PERCENTILES
+from wait_sampler import WaitSampler, print_wait_profile
+
 # --- Configurações do Benchmark ---
 DB_SETTINGS = {
     "dbname": "tpc-h", 
@@ -22,15 +28,31 @@ ISOLATION_LEVEL = "READ COMMITTED"
 
 BENCHMARK_MODE = "SIMPLIFIED"
 
+# Fotografias de pg_stat_database e (se instalada) pg_stat_statements antes e
+# depois da medição (Throughput Test no modo oficial); as diferenças entram no
+# relatório final, ao lado do tempo de resposta por query.
+CAPTURE_SERVER_STATS = True
+
+# Amostragem opcional de eventos de espera (pg_stat_activity e pg_locks) a cada
+# WAIT_SAMPLE_INTERVAL_MS no mesmo período, separada por query: cada backend
+# recebe application_name = WAIT_SAMPLER_APPLICATION_PREFIX + "Q<n>".
+RUN_WAIT_SAMPLER = False
+WAIT_SAMPLE_INTERVAL_MS = 100
+WAIT_SAMPLER_APPLICATION_PREFIX = "tpch:"
+
 # =============================================================================
 # WORKERS E LÓGICA DE EXECUÇÃO
 # =============================================================================
 
+def application_tag(query_num):
+    return f"{WAIT_SAMPLER_APPLICATION_PREFIX}Q{query_num}"
+
+
 def execute_single_query(worker_id, query_num):
     """Worker para o MODO SIMPLIFICADO: executa uma única query aleatória."""
     conn = None
     try:
-        conn = psycopg2.connect(**DB_SETTINGS)
+        conn = psycopg2.connect(**DB_SETTINGS, application_name=application_tag(query_num))
         conn.set_session(isolation_level=ISOLATION_LEVEL, readonly=True)
         cur = conn.cursor()
 
@@ -52,12 +74,12 @@ def execute_single_query(worker_id, query_num):
             
         formatted_sql = query_sql.format(**inputs)
 
-        start_time = time.time()
+        start_time = time.perf_counter_ns()
         cur.execute(formatted_sql)
         cur.fetchall()
-        duration = time.time() - start_time
+        duration_ns = time.perf_counter_ns() - start_time
         
-        return {"query": f"Q{query_num}", "duration": duration, "worker_id": worker_id}
+        return {"query": f"Q{query_num}", "duration_ns": duration_ns, "worker_id": worker_id}
 
     except psycopg2.Error as e:
         print(f"!!! ERRO no Worker {worker_id} ao executar Q{query_num}: {e}")
@@ -66,7 +88,7 @@ def execute_single_query(worker_id, query_num):
         if conn:
             conn.close()
 
-def run_query_stream(stream_id):
+def run_query_stream(stream_id, latencies=None):
     """Worker para o MODO OFICIAL: executa uma stream completa (22 queries)."""
     conn = None
     timings = {}
@@ -91,13 +113,18 @@ def run_query_stream(stream_id):
             # --- FIM DA CORREÇÃO ---
             
             formatted_sql = query_sql.format(**inputs)
+            if RUN_WAIT_SAMPLER:
+                cur.execute("SET application_name = %s", (application_tag(i),))
             
-            start_time = time.time()
+            start_time = time.perf_counter_ns()
             cur.execute(formatted_sql)
             cur.fetchall()
-            duration = time.time() - start_time
+            duration_ns = time.perf_counter_ns() - start_time
+            duration = duration_ns / 1e9
             
             timings[f'Q{i}'] = duration
+            if latencies is not None:
+                latencies.record(f'Q{i}', duration_ns)
             print(f"Stream {stream_id}: Q{i} concluída em {duration:.2f}s")
             cur.close()
 
@@ -112,9 +139,55 @@ def run_query_stream(stream_id):
     return timings
 
 # =============================================================================
-# FUNÇÕES DE CÁLCULO E EXECUÇÃO DOS BENCHMARKS (sem alterações)
+# FUNÇÕES DE CÁLCULO E EXECUÇÃO DOS BENCHMARKS
 # =============================================================================
 
+def _query_order(name):
+    return int(name[1:])
+
+
+def print_latency_table(latencies):
+    """Tempo de resposta por query: média e percentis, a partir dos histogramas."""
+    percentile_headers = " | ".join(f"{'p' + format(p, 'g'):>8}" for p in PERCENTILES)
+    print(f"  {'Query':<7} | {'Execuções':<11} | {'Médio (ms)':>10} | {percentile_headers} | {'Máx':>8}")
+    print(f"  {'-'*7} | {'-'*11} | {'-'*10} | {' | '.join(['-'*8] * len(PERCENTILES))} | {'-'*8}")
+    for query_name, histogram in sorted(latencies.items(), key=lambda item: _query_order(item[0])):
+        values = histogram.percentiles_ms()
+        percentile_values = " | ".join(f"{values[p]:>8.2f}" for p in PERCENTILES)
+        print(f"  {query_name:<7} | {histogram.count:<11} | {histogram.mean_ns() / 1e6:>10.2f} | {percentile_values} | {histogram.max_ns / 1e6:>8.2f}")
+
+
+def take_server_snapshot():
+    if not CAPTURE_SERVER_STATS:
+        return None
+    conn = server_stats.connect(DB_SETTINGS)
+    try:
+        return server_stats.take_snapshot(conn)
+    finally:
+        conn.close()
+
+
+def start_wait_sampler():
+    if not RUN_WAIT_SAMPLER:
+        return None
+    return WaitSampler(DB_SETTINGS, WAIT_SAMPLE_INTERVAL_MS / 1000, WAIT_SAMPLER_APPLICATION_PREFIX).start()
+
+
+def stop_wait_sampler(sampler):
+    if sampler is not None:
+        sampler.stop()
+
+
+def print_wait_sampler(sampler):
+    if sampler is not None:
+        print_wait_profile(sampler)
+
+
+def print_server_stats(before, after):
+    if before is not None and after is not None:
+        server_stats.print_server_report(server_stats.ServerStatsDelta(before, after))
+
+
 def run_official_benchmark():
     """Executa o benchmark TPC-H seguindo as fases Power e Throughput."""
     print("\n--- Executando Modo: FIEL À ESPECIFICAÇÃO TPC-H ---")
@@ -139,14 +212,19 @@ def run_official_benchmark():
 
     # --- 2. THROUGHPUT TEST ---
     print(f"\n--- Fase 2: Throughput Test ({NUM_WORKERS} Streams) ---")
+    server_before = take_server_snapshot()
+    wait_sampler = start_wait_sampler()
     throughput_start_time = time.time()
     all_stream_timings = []
+    throughput_latencies = HistogramGroup()
     with ThreadPoolExecutor(max_workers=NUM_WORKERS) as executor:
-        futures = [executor.submit(run_query_stream, i + 1) for i in range(NUM_WORKERS)]
+        futures = [executor.submit(run_query_stream, i + 1, throughput_latencies) for i in range(NUM_WORKERS)]
         for future in as_completed(futures):
             result = future.result()
             if result: all_stream_timings.append(result)
     throughput_end_time = time.time()
+    server_after = take_server_snapshot()
+    stop_wait_sampler(wait_sampler)
     
     throughput_metric = 0
     total_throughput_duration = throughput_end_time - throughput_start_time
@@ -170,11 +248,19 @@ def run_official_benchmark():
     else:
         print("Não foi possível calcular a métrica final.")
 
+    print("\nTempo de resposta por query (Throughput Test)")
+    print_latency_table(throughput_latencies)
+    print_server_stats(server_before, server_after)
+    print_wait_sampler(wait_sampler)
+
 def run_simplified_benchmark():
     """Executa o benchmark TPC-H seguindo o modelo simplificado do trabalho."""
     print("\n--- Executando Modo: SIMPLIFICADO (SUGERIDO NO SLIDE) ---")
     
-    all_results = []
+    # Histogramas em memória fixa, em vez de uma lista com cada execução.
+    latencies = HistogramGroup()
+    server_before = take_server_snapshot()
+    wait_sampler = start_wait_sampler()
     with ThreadPoolExecutor(max_workers=NUM_WORKERS) as executor:
         start_test_time = time.time()
         futures = {executor.submit(execute_single_query, i + 1, random.randint(1, 22)): (i + 1) for i in range(NUM_WORKERS)}
@@ -185,36 +271,32 @@ def run_simplified_benchmark():
                     worker_id = futures.pop(future)
                     result = future.result()
                     if result:
-                        all_results.append(result)
-                        print(f"  {result['query']:<5} | Worker {result['worker_id']} | {result['duration']:.2f}s")
+                        latencies.record(result['query'], result['duration_ns'])
+                        print(f"  {result['query']:<5} | Worker {result['worker_id']} | {result['duration_ns'] / 1e9:.2f}s")
                     
                     new_query = random.randint(1, 22)
                     new_future = executor.submit(execute_single_query, worker_id, new_query)
                     futures[new_future] = worker_id
             except Exception:
                 continue
+    server_after = take_server_snapshot()
+    stop_wait_sampler(wait_sampler)
     
     print("\n" + "="*50)
     print("📊 RESULTADOS FINAIS (MODO SIMPLIFICADO)")
     print("="*50)
     
-    total_queries = len(all_results)
+    total_queries = sum(histogram.count for _, histogram in latencies.items())
     throughput = total_queries / TEST_DURATION_SECS
     print(f"MÉTRICA 1 - VAZÃO")
     print(f"  - Tempo Total do Teste:      {TEST_DURATION_SECS} segundos")
     print(f"  - Total de Queries Executadas: {total_queries}")
     print(f"  - Vazão (Throughput):        {throughput:.2f} queries/segundo")
 
-    print("\nMÉTRICA 2 - TEMPO DE RESPOSTA (médio por query)")
-    by_query = defaultdict(list)
-    for res in all_results:
-        by_query[res['query']].append(res['duration'])
-    
-    print(f"  {'Query':<7} | {'Execuções':<11} | {'Tempo Médio (ms)':<15}")
-    print(f"  {'-'*7} | {'-'*11} | {'-'*15}")
-    for query_name, durations in sorted(by_query.items()):
-        avg_time_ms = (sum(durations) / len(durations)) * 1000
-        print(f"  {query_name:<7} | {len(durations):<11} | {avg_time_ms:<15.2f}")
+    print("\nMÉTRICA 2 - TEMPO DE RESPOSTA (por query)")
+    print_latency_table(latencies)
+    print_server_stats(server_before, server_after)
+    print_wait_sampler(wait_sampler)
 
 if __name__ == "__main__":
     if BENCHMARK_MODE == "OFFICIAL":